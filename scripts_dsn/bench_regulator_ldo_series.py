@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmark of the series LDO designer.
+
+Runs bag2_analog__regulator_ldo_series_dsn.meet_spec on representative spec
+sets against SyntheticMOSDB, a deterministic analytic stand-in for the
+characterized transistor databases, so no characterization data or simulator
+is needed. SyntheticMOSDB and the database cache work without BAG and
+span_ion_proj; running the design module still needs both. Reports wall time,
+database query and small-signal analysis counts and peak traced memory per
+spec set.
+
+    python scripts_dsn/bench_regulator_ldo_series.py [--sets small medium large]
+        [--repeat N] [--param KEY=VALUE ...] [--vectorized] [--json FILE]
+"""
+
+from typing import Any, Dict, List, Mapping, Tuple
+
+import argparse
+from argparse import Namespace
+from pathlib import Path
+import io, json, time, tracemalloc
+import contextlib
+
+import numpy as np
+import yaml
+
+from scripts_dsn.mos_db import get_db_cache
+from scripts_dsn.profiling import Profiler, set_profiler
+
+# Thermal voltage at room temperature, in volts
+_UT = 0.0259
+
+# Spec sets, as updates of ldo_params.yaml, from a coarse sweep to a fine one
+BENCH_SETS = {
+    'small': dict(v_res=0.05, err=0.01, psrr=20, psrr_fbw=10, pm=45, loadreg=0.01),
+    'medium': dict(v_res=0.02, err=0.01, psrr=20, psrr_fbw=10, pm=85, loadreg=0.01),
+    'large': dict(v_res=0.005, err=0.01, psrr=20, psrr_fbw=10, pm=60, loadreg=0.01),
+    'nser': dict(v_res=0.01, err=0.05, psrr=10, psrr_fbw=10, pm=45, loadreg=0.05, ser_type='n'),
+    'tail': dict(v_res=0.02, err=0.01, psrr=20, psrr_fbw=500, pm=5, loadreg=0.01,
+                 load_pole=True, iamp_max=1e-4),
+}
+
+
+class SyntheticMOSDB(object):
+    """Deterministic analytic transistor database with the interface of the characterized ones.
+
+    Currents follow an EKV-style interpolation between weak and strong
+    inversion, with channel length modulation, a drain saturation factor and
+    body effect. Small-signal conductances are the exact derivatives of the
+    current; capacitances are constant per unit device. As in the characterized
+    databases, currents and conductances are positive for both device types
+    and PMOS voltages are negative.
+
+    Parameters
+    ----------
+    is_nch : bool
+        True for an NMOS, False for a PMOS.
+    vth0 : float
+        zero-bias threshold voltage magnitude, in volts.
+    vectorized : bool
+        True to let query accept arrays of bias voltages.
+    """
+
+    def __init__(self, is_nch: bool, vth0: float = 0.4, vectorized: bool = False) -> None:
+        self.is_nch = is_nch
+        self.vth0 = vth0
+        self.vectorized = vectorized
+        self.width_list = [0.5e-6]
+        self._sign = 1.0 if is_nch else -1.0
+        self._k = 2e-4 if is_nch else 8e-5
+        self._n = 1.3
+        self._lam = 0.15
+        self._gamma = 0.3
+        self._phi = 0.8
+        self._cgg = 2e-15
+
+    def get_fun_arg_index(self, name: str) -> int:
+        return ('vbs', 'vds', 'vgs').index(name)
+
+    def get_function(self, name: str) -> '_SyntheticFunction':
+        return _SyntheticFunction(self, name)
+
+    def query(self, **kwargs: Any) -> Dict[str, Any]:
+        vgs = np.asarray(kwargs['vgs'], dtype=float)
+        vds = np.asarray(kwargs['vds'], dtype=float)
+        vbs = np.asarray(kwargs.get('vbs', 0), dtype=float)
+        if not self.vectorized and (vgs.ndim or vds.ndim or vbs.ndim):
+            raise TypeError('SyntheticMOSDB.query takes scalar bias voltages')
+        ans = self.evaluate(vgs, vds, vbs)
+        if ans['ibias'].ndim == 0:
+            return {k: float(v) for k, v in ans.items()}
+        return ans
+
+    def evaluate(self, vgs: np.ndarray, vds: np.ndarray, vbs: np.ndarray) -> Dict[str, np.ndarray]:
+        """Returns the operating point over broadcast arrays of bias voltages."""
+        # Evaluate as an NMOS with the voltages flipped for a PMOS
+        vg, vd, vb = self._sign*vgs, self._sign*vds, self._sign*vbs
+        vb = np.minimum(vb, self._phi/2)
+        vth = self.vth0 + self._gamma*(np.sqrt(self._phi - vb) - np.sqrt(self._phi))
+        x = (vg - vth)/(2*self._n*_UT)
+        f = np.logaddexp(0, x)
+        sig = 1/(1 + np.exp(-x))
+        sat = -np.expm1(-np.maximum(vd, 0)/_UT)
+        dsat = np.where(vd > 0, np.exp(-np.maximum(vd, 0)/_UT)/_UT, 0)
+        clm = 1 + self._lam*vd
+
+        i0 = 2*self._n*self._k*_UT**2*f**2
+        ibias = i0*clm*sat
+        gm = 2*self._k*_UT*f*sig*clm*sat
+        gds = i0*(self._lam*sat + clm*dsat)
+        gb = gm*self._gamma/(2*np.sqrt(self._phi - vb))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vstar = 2*ibias/gm
+
+        cgg = self._cgg + 0*ibias
+        return dict(ibias=ibias, gm=gm, gds=gds, gb=gb, vstar=vstar,
+                    cgg=cgg, cgs=0.6*cgg, cgd=0.2*cgg, cgb=0.05*cgg,
+                    cds=0.05*cgg, cdb=0.2*cgg, csb=0.25*cgg, cdd=0.45*cgg, css=0.9*cgg)
+
+
+class _SyntheticFunction(object):
+    """Single output of a SyntheticMOSDB, over (vbs, vds, vgs) as the database interpolators."""
+
+    def __init__(self, db: SyntheticMOSDB, name: str) -> None:
+        self._db = db
+        self._name = name
+
+    def get_input_range(self, idx: int) -> Tuple[float, float]:
+        return -2.0, 2.0
+
+    def __call__(self, arg: Any) -> Any:
+        arg = np.asarray(arg, dtype=float)
+        return self._db.evaluate(arg[..., 2], arg[..., 1], arg[..., 0])[self._name]
+
+
+def get_bench_params(set_name: str) -> Dict[str, Any]:
+    """Returns the design parameters of a spec set, with synthetic database spec files."""
+    specs_fname = Path(__file__).parent / 'ldo_params.yaml'
+    with open(specs_fname, 'r') as f:
+        params = yaml.load(f, Loader=yaml.SafeLoader)['params']
+    params.update(BENCH_SETS[set_name])
+    type_dict = dict(amp_in='n', amp_load='p', amp_tail='n', amp_mir='n', ser=params['ser_type'])
+    params['specfile_dict'] = {k: f'synthetic/{v}ch.yaml' for k, v in type_dict.items()}
+    return params
+
+
+def seed_db_cache(params: Mapping[str, Any], vectorized: bool) -> None:
+    """Supplies synthetic databases for the spec files of params to the database cache."""
+    db_cache = get_db_cache()
+    for key, spec_file in params['specfile_dict'].items():
+        db = SyntheticMOSDB(is_nch=spec_file.endswith('nch.yaml'), vectorized=vectorized)
+        db_cache.put(spec_file, params['th_dict'][key], params['sim_env'], db)
+
+
+def _get_dsn_class() -> type:
+    """Returns the series LDO design module, raising a clear ImportError without BAG or span_ion_proj."""
+    try:
+        from scripts_dsn.regulator_ldo_series import bag2_analog__regulator_ldo_series_dsn
+    except ImportError as ex:
+        raise ImportError(f'Running the series LDO design module needs BAG and span_ion_proj '
+                          f'({ex}); only SyntheticMOSDB and the database cache work without them') from ex
+    return bag2_analog__regulator_ldo_series_dsn
+
+
+def run_bench(set_name: str, params: Dict[str, Any], vectorized: bool,
+              trace_mem: bool = False) -> Dict[str, Any]:
+    """Runs meet_spec once. Tracing memory slows the run down, so it is opt-in."""
+    seed_db_cache(params, vectorized)
+    dsn = _get_dsn_class()()
+    profiler = Profiler()
+    set_profiler(profiler)
+    if trace_mem:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            best_op = dsn.meet_spec(**params)[0]
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_mem else None
+    finally:
+        if trace_mem:
+            tracemalloc.stop()
+        set_profiler(None)
+
+    totals = profiler.report()['totals']
+    info = dict(set=set_name, time=elapsed, peak_mem=peak, ibias=float(best_op['ibias']))
+    for name in ('db_query', 'lti_build', 'lti_solve', 'stability_margin'):
+        info[name] = totals.get(name, dict(count=0))['count']
+    info['db_points'] = totals.get('db_query', dict(num=0))['num']
+    return info
+
+
+def parse_args() -> Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sets', nargs='+', default=['small', 'medium', 'large'],
+                        choices=list(BENCH_SETS.keys()), help='spec sets to run')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of timed runs per spec set; the fastest is reported. '
+                             'Peak memory comes from one more, traced run')
+    parser.add_argument('--param', nargs='*', default=[],
+                        help='design parameter overrides as KEY=VALUE (VALUE parsed as yaml)')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='let the synthetic databases answer array queries')
+    parser.add_argument('--json', default='',
+                        help='If given will also write the results to that file as JSON')
+    return parser.parse_args()
+
+
+def run_main(args: Namespace) -> List[Dict[str, Any]]:
+    overrides = dict()
+    for kv in args.param:
+        key, val = kv.split('=', 1)
+        overrides[key] = yaml.safe_load(val)
+
+    result_list = []
+    print(f"{'set':8s} {'time (s)':>10s} {'peak (MB)':>10s} {'queries':>9s} {'points':>9s} "
+          f"{'builds':>7s} {'solves':>7s} {'stb':>6s}  ibias")
+    for set_name in args.sets:
+        params = get_bench_params(set_name)
+        params.update(overrides)
+        runs = [run_bench(set_name, dict(params), args.vectorized) for _ in range(max(args.repeat, 1))]
+        info = min(runs, key=lambda run: run['time'])
+        info['peak_mem'] = run_bench(set_name, dict(params), args.vectorized, trace_mem=True)['peak_mem']
+        result_list.append(info)
+        print(f"{set_name:8s} {info['time']:10.3f} {info['peak_mem']/1024**2:10.2f} {info['db_query']:9d} "
+              f"{info['db_points']:9d} {info['lti_build']:7d} {info['lti_solve']:7d} "
+              f"{info['stability_margin']:6d}  {info['ibias']:.4g}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result_list, f, indent=2)
+    return result_list
+
+
+if __name__ == '__main__':
+    run_main(parse_args())
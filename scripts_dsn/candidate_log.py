@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, List, Mapping, Optional
+
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class CandidateLog(object):
+    """Streaming JSON lines log of the candidates evaluated by a design sweep.
+
+    append() only queues a record; a background thread writes the queue once
+    buffer_size records are pending or every flush_interval seconds. Use as a
+    context manager, or call close(), to write the rest.
+
+    A sweep resumed from a checkpoint passes the size flush() returned when the
+    checkpoint was saved, so that records written after it are dropped rather
+    than logged twice.
+    """
+
+    def __init__(self, fname: str, buffer_size: int = 256, flush_interval: float = 1.0,
+                 size: Optional[int] = None) -> None:
+        self._fname = Path(fname)
+        self._fname.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._fname, 'a')
+        if size is not None and self._file.tell() > size:
+            self._file.truncate(size)
+            self._file.seek(size)
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._pending = []  # type: List[Mapping[str, Any]]
+        self._cond = threading.Condition()
+        # Held while taking records off the queue and writing them, so they are written in order
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._error = None  # type: Optional[BaseException]
+        self.num_records = 0
+        self._writer = threading.Thread(target=self._run_writer, name='CandidateLog', daemon=True)
+        self._writer.start()
+
+    @property
+    def fname(self) -> Path:
+        return self._fname
+
+    def __enter__(self) -> 'CandidateLog':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def append(self, record: Mapping[str, Any]) -> None:
+        """Queues one record. It must not be modified afterwards, as it is serialized later."""
+        if self._error is not None:
+            raise IOError(f'Writing candidate log {self._fname} failed') from self._error
+        with self._cond:
+            if self._closed:
+                raise ValueError(f'Candidate log {self._fname} is closed')
+            self._pending.append(record)
+            self.num_records += 1
+            if len(self._pending) >= self._buffer_size:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """Writes the pending records and returns the size of the log in bytes."""
+        with self._write_lock:
+            with self._cond:
+                record_list, self._pending = self._pending, []
+            self._write(record_list)
+            if self._error is not None:
+                raise IOError(f'Writing candidate log {self._fname} failed') from self._error
+            return self._file.tell()
+
+    def close(self) -> None:
+        """Writes the pending records and closes the file."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+        self._file.close()
+        if self._error is not None:
+            raise IOError(f'Writing candidate log {self._fname} failed') from self._error
+
+    def _run_writer(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self._buffer_size:
+                    self._cond.wait(self._flush_interval)
+            with self._write_lock:
+                with self._cond:
+                    record_list, self._pending = self._pending, []
+                    closed = self._closed
+                self._write(record_list)
+            if closed:
+                return
+
+    def _write(self, record_list: List[Mapping[str, Any]]) -> None:
+        if record_list and self._error is None:
+            try:
+                self._file.write(''.join(json.dumps(record, separators=(',', ':'), default=_to_json) + '\n'
+                                         for record in record_list))
+                self._file.flush()
+            except BaseException as ex:
+                self._error = ex
+
+
+def _to_json(val: Any) -> Any:
+    """Converts the numpy values of design results for json.dumps."""
+    if isinstance(val, np.generic):
+        return val.item()
+    if isinstance(val, np.ndarray):
+        return val.tolist()
+    if isinstance(val, Mapping):
+        return dict(val)
+    return repr(val)
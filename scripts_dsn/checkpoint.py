@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Callable, Dict, Mapping, Optional
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import warnings
+from pathlib import Path
+
+
+class SweepCheckpoint(object):
+    """Periodic on-disk snapshot of the progress of a design sweep.
+
+    The pickled state is tagged with a fingerprint of the design parameters, so
+    it is never resumed into a different design, and is written atomically.
+    update() saves at most once every interval seconds.
+    """
+
+    def __init__(self, fname: str, fingerprint: str, interval: float = 60) -> None:
+        self._fname = Path(fname)
+        self._fingerprint = fingerprint
+        self._interval = interval
+        self._last_save = time.perf_counter()
+        self.num_saves = 0
+        self.save_time = 0.0
+
+    @property
+    def fname(self) -> Path:
+        return self._fname
+
+    @staticmethod
+    def get_fingerprint(params: Mapping[str, Any],
+                        ignore=('checkpoint', 'checkpoint_interval', 'resume', 'candidate_log', 'progress_interval')) -> str:
+        """Returns the SHA-256 of the design parameters, leaving out those in ignore."""
+        params = {k: v for k, v in params.items() if k not in ignore}
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Returns the saved state, or None if there is no checkpoint of this design."""
+        try:
+            with open(self._fname, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError) as ex:
+            warnings.warn(f'Ignoring unreadable checkpoint {self._fname}: {ex}')
+            return None
+        if entry.get('fingerprint') != self._fingerprint:
+            warnings.warn(f'Ignoring checkpoint {self._fname} of different design parameters')
+            return None
+        return entry['state']
+
+    def update(self, get_state: Callable[[], Dict[str, Any]], force: bool = False) -> bool:
+        '''
+        Returns:
+            saved: True if the save interval had passed and get_state() was saved
+        '''
+        if not force and time.perf_counter() - self._last_save < self._interval:
+            return False
+        self.save(get_state())
+        return True
+
+    def save(self, state: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        self._fname.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_fname = tempfile.mkstemp(dir=str(self._fname.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(dict(fingerprint=self._fingerprint, state=state), f)
+            os.replace(tmp_fname, self._fname)
+        except BaseException:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+            raise
+        self._last_save = time.perf_counter()
+        self.num_saves += 1
+        self.save_time += self._last_save - start
+
+    def remove(self) -> None:
+        """Deletes the checkpoint, e.g. once the sweep has finished."""
+        try:
+            os.remove(self._fname)
+        except FileNotFoundError:
+            pass
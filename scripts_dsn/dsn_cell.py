@@ -1,12 +1,17 @@
 import argparse
 from argparse import Namespace
 from pathlib import Path
-import sys, pdb, traceback
+import sys, pdb, traceback, time
+import json, cProfile
 from pprint import pprint
 
 from bag.io.file import Pickle, Yaml
 from bag.core import BagProject
 
+from scripts_dsn.result_cache import ResultCache, get_source_files
+from scripts_dsn.mos_db import get_db_cache
+from scripts_dsn.profiling import Profiler, set_profiler
+
 io_cls_dict = {
     'pickle': Pickle,
     'yaml': Yaml,
@@ -15,37 +20,171 @@ io_cls_dict = {
 
 def parse_args() -> Namespace:
     parser = argparse.ArgumentParser()
-    parser.add_argument('specs_fname', help='specs yaml file')
+    parser.add_argument('specs_fname', nargs='+',
+                        help='specs yaml file(s). A spec file may hold a list of parameter '
+                             'sets under params; all runs share one process')
     parser.add_argument('--format', default='yaml',
                         help='format of spec file (yaml, json, pickle)')
     parser.add_argument('-dump', '--dump', default='',
                         help='If given will dump output of script into that '
-                             'file according to the format specified')
+                             'file according to the format specified. With several '
+                             'runs, run i is dumped to <stem>_<i><suffix> and the '
+                             'timing summary to <stem>_timing<suffix>')
+    parser.add_argument('--dump-op', default='',
+                        help='If given will also pickle the best operating point of each run '
+                             'into that file, named per run as for --dump. Design modules '
+                             'supporting warm_start can start from it')
+    parser.add_argument('--cache', action='store_true',
+                        help='read and write the design result cache, in '
+                             '~/.cache/bag2_analog/dsn_cell unless --cache-dir is given')
+    parser.add_argument('--cache-dir', default='',
+                        help='If given will read and write the design result cache in that directory')
+    parser.add_argument('--cache-size', type=float, default=512,
+                        help='maximum size of the design result cache, in MB')
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help='with the cache on, rerun every design and overwrite its cached result')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='with the cache on, empty the design result cache before running')
+    parser.add_argument('--profile', default='',
+                        help='If given will profile the runs and write <profile>.json '
+                             '(per-stage counts and times of database queries, small-signal '
+                             'builds and solves and stability margin calls) and '
+                             '<profile>.prof (cProfile stats)')
+    parser.add_argument('--checkpoint', default='',
+                        help='If given will periodically save the sweep progress of design '
+                             'modules supporting it to that file. With several runs, run i '
+                             'is saved to <stem>_<i><suffix>')
+    parser.add_argument('--checkpoint-interval', type=float, default=60,
+                        help='minimum time between checkpoint saves, in seconds')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue each run from its checkpoint, if it has one')
     args = parser.parse_args()
     return args
 
 
+def get_runs(specs_fname_list, io_cls):
+    '''
+    Returns:
+        run_list: (spec file name, design module name, design class name, params)
+            for every parameter set in the spec files, in order
+    '''
+    run_list = []
+    for specs_fname in specs_fname_list:
+        specs_info = io_cls.load(str(specs_fname))
+        params_list = specs_info['params']
+        if not isinstance(params_list, list):
+            params_list = [params_list]
+        for specs in params_list:
+            run_list.append((str(specs_fname), specs_info['dsn_mod'], specs_info['dsn_cls'], specs))
+    return run_list
+
+
+def get_dump_fname(dump_fname, idx, num_runs):
+    if num_runs == 1:
+        return Path(dump_fname)
+    dump_path = Path(dump_fname)
+    return dump_path.with_name(f'{dump_path.stem}_{idx}{dump_path.suffix}')
+
+
 def run_main(args: Namespace):
-    specs_fname = Path(args.specs_fname)
     io_cls = io_cls_dict[args.format]
-    specs_info = io_cls.load(str(specs_fname))
+    run_list = get_runs(args.specs_fname, io_cls)
+    num_runs = len(run_list)
+
+    result_cache = None
+    if args.cache or args.cache_dir:
+        cache_dir = args.cache_dir or str(Path.home() / '.cache' / 'bag2_analog' / 'dsn_cell')
+        result_cache = ResultCache(cache_dir, int(args.cache_size*1024**2))
+        if args.clear_cache:
+            print(f"Clearing design result cache {result_cache.cache_dir}")
+            result_cache.clear()
+
+    cprof = None
+    if args.profile:
+        cprof = cProfile.Profile()
+        cprof.enable()
+
+    # Design modules are reused across runs, and with them the loaded transistor databases
+    dsn_module_dict = dict()
+    timing_list = []
+    profile_list = []
+    for idx, (specs_fname, dsn_mod_name, dsn_cls_name, specs) in enumerate(run_list):
+        # Import design module
+        if (dsn_mod_name, dsn_cls_name) not in dsn_module_dict:
+            dsn_mod = __import__(dsn_mod_name, fromlist=[dsn_cls_name])
+            dsn_cls = getattr(dsn_mod, dsn_cls_name)
+            dsn_module_dict[(dsn_mod_name, dsn_cls_name)] = dsn_cls()
+        dsn_module = dsn_module_dict[(dsn_mod_name, dsn_cls_name)]
 
-    # Import design module
-    dsn_mod = __import__(specs_info['dsn_mod'], fromlist=[specs_info['dsn_cls']])
-    dsn_cls = getattr(dsn_mod, specs_info['dsn_cls'])
+        # Design
+        if num_runs > 1:
+            print(f"Designing run {idx+1}/{num_runs} ({specs_fname})...")
+        else:
+            print("Designing...")
+        start = time.perf_counter()
+        cached = None
+        if result_cache is not None:
+            cache_key = result_cache.get_key(dsn_mod_name, dsn_cls_name, specs,
+                                             get_source_files(sys.modules[dsn_mod_name].__file__))
+            if not args.refresh_cache:
+                cached = result_cache.load(cache_key)
+        # Checkpointing does not change the design, so it stays out of the cache key
+        if args.checkpoint:
+            specs = dict(specs, checkpoint=str(get_dump_fname(args.checkpoint, idx, num_runs)),
+                         checkpoint_interval=args.checkpoint_interval, resume=args.resume)
+        if cached is not None:
+            print(f"Using cached result {cache_key}")
+            sch_params, best_op = cached
+        elif cprof is not None:
+            profiler = Profiler()
+            set_profiler(profiler)
+            try:
+                with profiler.stage('design'):
+                    sch_params, best_op = dsn_module.design(**specs)
+            finally:
+                set_profiler(None)
+            profile_list.append(dict(run=idx, specs_fname=specs_fname, **profiler.report()))
+        else:
+            sch_params, best_op = dsn_module.design(**specs)
+        if cached is None and result_cache is not None:
+            result_cache.save(cache_key, sch_params, best_op)
+        elapsed = time.perf_counter() - start
+        # Design modules report a failed design as a message instead of parameters
+        timing_list.append(dict(run=idx, specs_fname=specs_fname, time=elapsed,
+                                solved=isinstance(sch_params, dict), cached=cached is not None))
 
-    # Get spec
-    dsn_module = dsn_cls()
-    specs = specs_info['params']
+        if sch_params is not None and args.dump:
+            out_tmp_file = get_dump_fname(args.dump, idx, num_runs)
+            print(f"Saving results to {out_tmp_file}")
+            io_cls.save(sch_params, out_tmp_file)
+        if best_op is not None and args.dump_op:
+            op_file = get_dump_fname(args.dump_op, idx, num_runs)
+            print(f"Saving best operating point to {op_file}")
+            Pickle.save(best_op, op_file)
 
-    # Design
-    print("Designing...")
-    sch_params, best_op = dsn_module.design(**specs)
+    if num_runs > 1:
+        print("Timing summary:")
+        for info in timing_list:
+            print(f"  {info['run']:4d}  {info['time']:10.3f} s  {'ok' if info['solved'] else '--'}"
+                  f"  {'cached' if info['cached'] else '      '}  {info['specs_fname']}")
+        print(f"  total {sum(info['time'] for info in timing_list):10.3f} s")
+        if args.dump:
+            dump_path = Path(args.dump)
+            timing_file = dump_path.with_name(f'{dump_path.stem}_timing{dump_path.suffix}')
+            print(f"Saving timing summary to {timing_file}")
+            io_cls.save(timing_list, timing_file)
 
-    if sch_params is not None and args.dump:
-        out_tmp_file = Path(args.dump)
-        print(f"Saving results to {out_tmp_file}")
-        io_cls.save(sch_params, out_tmp_file)
+    if cprof is not None:
+        cprof.disable()
+        profile_file = Path(f'{args.profile}.json')
+        print(f"Saving profile to {profile_file} and {args.profile}.prof")
+        report = dict(runs=[dict(info, **timing_list[info['run']]) for info in profile_list],
+                      db_cache=get_db_cache().stats())
+        if result_cache is not None:
+            report['result_cache'] = result_cache.stats()
+        with open(profile_file, 'w') as f:
+            json.dump(report, f, indent=2, default=float)
+        cprof.dump_stats(f'{args.profile}.prof')
 
 if __name__ == '__main__':
     args = parse_args()
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from bag.data.lti import get_w_3db, get_stability_margins
+
+from scripts_dsn.lti_batch import get_w_3db_batch, get_phase_margin_batch, trim_poly
+from scripts_dsn.profiling import event, event_start, event_end
+
+# Nodes of the series LDO small-signal model. 'fb' is the gate of the amplifier
+# input device that closes the loop: it is tied to 'reg' for closed-loop
+# analyses and driven as the input for open-loop ones.
+_NODES = ('vdd', 'out', 'outx', 'tail', 'reg', 'fb')
+_NODE_IDX = {name: idx for idx, name in enumerate(_NODES)}
+
+# Relative magnitude below which an eigenvalue of the det polynomial is a
+# numerical zero (i.e. a dropped polynomial order), not a physical time constant
+_EIG_RTOL = 1e-13
+
+# Time points per decade of the step response grid, and of its refinement around the peak
+_STEP_PER_DECADE = 40
+_STEP_REFINE = 32
+
+
+def get_instances(ser_type: str, amp_in: str) -> List[Tuple[str, str, str, str]]:
+    """Returns the (device, drain, gate, source) connections of the LDO for the given device types."""
+    n_ser = ser_type == 'n'
+    n_amp = amp_in == 'n'
+    ser_d = 'vdd' if n_ser else 'reg'
+    ser_s = 'reg' if n_ser else 'vdd'
+    tail_rail = 'gnd' if n_amp else 'vdd'
+    load_rail = 'vdd' if n_amp else 'gnd'
+    inp_conn = 'gnd' if n_ser else 'fb'
+    inn_conn = 'fb' if n_ser else 'gnd'
+    return [('ser', ser_d, 'out', ser_s),
+            ('amp_in', 'outx', inp_conn, 'tail'),
+            ('amp_in', 'out', inn_conn, 'tail'),
+            ('amp_tail', 'tail', 'gnd', tail_rail),
+            ('amp_load', 'outx', 'outx', load_rail),
+            ('amp_load', 'out', 'outx', load_rail)]
+
+
+class LDOSmallSignalBatch(object):
+    """Small-signal model of the series LDO over a stack of operating points.
+
+    Each candidate's transistors are stamped into one layer of conductance and
+    capacitance arrays, as LTICircuit.add_transistor would (without negative
+    capacitances). op_dict and nf_dict values may be scalars or arrays over the
+    candidates. inst_scale optionally scales the conductances of each instance
+    of get_instances, e.g. for mismatch.
+    """
+
+    def __init__(self, op_dict: Mapping[str, Mapping[str, Any]], nf_dict: Mapping[str, Any],
+                 ser_type: str, amp_in: str, rsource: float, inst_scale: Optional[Any] = None) -> None:
+        build_start = event_start()
+        self._inst_list = get_instances(ser_type, amp_in)
+        dev_list = sorted({inst[0] for inst in self._inst_list})
+        if inst_scale is None:
+            inst_scale = np.ones(len(self._inst_list))
+        inst_scale = np.asarray(inst_scale, dtype=float)
+        self._num = int(np.broadcast(*(np.asarray(nf_dict[dev]) for dev in dev_list),
+                                     *(np.asarray(op_dict[dev]['gm']) for dev in dev_list),
+                                     inst_scale[..., 0]).size)
+        self._rsource = rsource
+        self._gmat = np.zeros((self._num, len(_NODES), len(_NODES)))
+        self._cmat = np.zeros((self._num, len(_NODES), len(_NODES)))
+        # Transconductance of each instance, for the threshold shifts of get_dc_shift
+        self._inst_gm = []  # type: List[np.ndarray]
+        for idx, (dev, d_name, g_name, s_name) in enumerate(self._inst_list):
+            self._add_transistor(op_dict[dev], d_name, g_name, s_name, nf_dict[dev], inst_scale[..., idx])
+        event_end('lti_build', build_start, self._num)
+
+    @property
+    def num(self) -> int:
+        """Number of candidates."""
+        return self._num
+
+    def get_loopgain(self) -> np.ndarray:
+        '''
+        Returns:
+            A: DC loop gain (amplifier input -> regulated output, loop broken) per candidate
+        '''
+        return self._get_dc_gain('fb', 'reg', 'v', closed=False)
+
+    def get_psrr(self, cload: Any, cdecap_amp: Any, grid: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns:
+            psrr: PSRR (dB) per candidate
+            fbw: Power supply -> output 3dB bandwidth (Hz) per candidate, NaN where
+                bag.data.lti.get_w_3db finds none
+        With grid, the bandwidths of all candidates are found at once by lti_batch
+        rather than one at a time by bag.data.lti.
+        '''
+        num_sup, den_sup = self.get_num_den('vdd', 'reg', 'v', True, cload, cdecap_amp)
+        gain_sup = num_sup[:, -1]/den_sup[:, -1]
+        psrr = np.full(len(gain_sup), float('inf'))
+        fbw = np.full(len(gain_sup), float('inf'))
+        rows = np.flatnonzero(gain_sup != 0)
+        psrr[rows] = 10*np.log10((1/gain_sup[rows])**2)
+        if grid:
+            with event('w_3db', len(rows)):
+                wbw_sup = get_w_3db_batch(den_sup[rows], num_sup[rows])
+            fbw[rows] = wbw_sup / (2*np.pi)
+            return psrr, fbw
+        for idx in rows:
+            with event('w_3db'):
+                wbw_sup = get_w_3db(trim_poly(den_sup[idx]), trim_poly(num_sup[idx]))
+            fbw[idx] = float('nan') if wbw_sup is None else wbw_sup / (2*np.pi)
+        return psrr, fbw
+
+    def get_stb(self, cload: Any, cdecap_amp: Any, grid: bool = False) -> np.ndarray:
+        '''
+        Returns:
+            pm: Phase margin (degrees) per candidate
+        With grid, the margins of all candidates are found at once by lti_batch
+        rather than one at a time by bag.data.lti.
+        '''
+        num_vec, den_vec = self.get_num_den('fb', 'reg', 'v', False, cload, cdecap_amp)
+        if grid:
+            with event('stability_margin', len(num_vec)):
+                return get_phase_margin_batch(-num_vec, den_vec)
+        pm = np.empty(len(num_vec))
+        for idx in range(len(num_vec)):
+            with event('stability_margin'):
+                pm[idx], _ = get_stability_margins(-trim_poly(num_vec[idx]), trim_poly(den_vec[idx]))
+        return pm
+
+    def get_loadreg(self, cload: Any, cdecap_amp: Any, vout: float, iout: float) -> np.ndarray:
+        '''
+        Returns:
+            loadreg: Load regulation for peak-to-peak load current variation of 20% (V/V)
+                per candidate. This is a DC quantity, so the capacitances do not affect it.
+        '''
+        return self._get_dc_gain('reg', 'reg', 'i', closed=True)*0.2*iout/vout
+
+    def get_droop(self, cload: Any, cdecap_amp: Any, vout: float, iout: float) -> np.ndarray:
+        '''
+        Returns:
+            droop: Peak output deviation after a load current step of 20% of iout (V/V) per
+                candidate, from the closed-loop step response; inf if the loop is unstable.
+                It settles to the load regulation, so it is never below it.
+        '''
+        with event('step_response', self._num):
+            gmat, cmat, b0, _, out_idx, _ = self._get_system('reg', 'reg', 'i', True, cload, cdecap_amp)
+            return _get_step_peak(gmat, cmat, b0, out_idx)*0.2*iout/vout
+
+    def get_dc_shift(self, dvth: Any) -> np.ndarray:
+        '''
+        Returns:
+            dv: Closed-loop DC shift of the regulated output per candidate, given threshold
+                voltage shifts dvth of each transistor instance, in the order of get_instances,
+                of shape (num_inst,) or (num, num_inst)
+        '''
+        dvth = np.broadcast_to(np.asarray(dvth, dtype=float), (self._num, len(self._inst_list)))
+        inj = np.zeros((self._num, len(_NODES)))
+        for idx, (_, d_name, _, s_name) in enumerate(self._inst_list):
+            # A threshold shift is a source in series with the gate, so the device
+            # sinks gm*dvth less current from its drain into its source
+            cur = self._inst_gm[idx]*dvth[:, idx]
+            if d_name in _NODE_IDX:
+                inj[:, _NODE_IDX[d_name]] += cur
+            if s_name in _NODE_IDX:
+                inj[:, _NODE_IDX[s_name]] -= cur
+        # The gate of the feedback input device is merged into the output
+        inj[:, _NODE_IDX['reg']] += inj[:, _NODE_IDX['fb']]
+        with event('lti_solve', self._num):
+            gmat, _, _, _, out_idx, keep = self._get_system('reg', 'reg', 'i', True, 0, 0)
+            return np.linalg.solve(gmat, inj[:, keep, np.newaxis])[:, out_idx, 0]
+
+    def get_num_den(self, in_name: str, out_name: str, in_type: str, closed: bool,
+                    cload: Any, cdecap_amp: Any) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns:
+            num, den: Transfer functions as in LDOSmallSignal.get_num_den, one row per
+                candidate padded with leading zeros. The capacitances may be arrays.
+        '''
+        solve_start = event_start()
+        gmat, cmat, b0, b1, out_idx, _ = self._get_system(in_name, out_name, in_type, closed,
+                                                       cload, cdecap_amp)
+        num_row, num_dim = gmat.shape[0], gmat.shape[-1]
+        m0 = np.zeros((num_row, num_dim+1, num_dim+1))
+        m1 = np.zeros((num_row, num_dim+1, num_dim+1))
+        m0[:, :num_dim, :num_dim] = gmat
+        m1[:, :num_dim, :num_dim] = cmat
+        m0[:, :num_dim, num_dim] = b0
+        m1[:, :num_dim, num_dim] = b1
+        m0[:, num_dim, out_idx] = 1
+
+        den = _get_det_poly_batch(gmat, cmat)
+        num = -_get_det_poly_batch(m0, m1)
+        scale = np.max(np.abs(den), axis=-1, keepdims=True)
+        event_end('lti_solve', solve_start, num_row)
+        return num/scale, den/scale
+
+    def _get_dc_gain(self, in_name: str, out_name: str, in_type: str, closed: bool) -> np.ndarray:
+        with event('lti_solve', self._num):
+            gmat, _, b0, _, out_idx, _ = self._get_system(in_name, out_name, in_type, closed, 0, 0)
+            return np.linalg.solve(gmat, b0[..., np.newaxis])[:, out_idx, 0]
+
+    def _get_system(self, in_name: str, out_name: str, in_type: str, closed: bool,
+                    cload: Any, cdecap_amp: Any):
+        num_row = np.broadcast(np.empty(self._num), np.asarray(cload), np.asarray(cdecap_amp)).size
+        gmat = np.broadcast_to(self._gmat, (num_row,) + self._gmat.shape[1:]).copy()
+        cmat = np.broadcast_to(self._cmat, (num_row,) + self._cmat.shape[1:]).copy()
+        _add_element(cmat, cload, 'reg', 'gnd')
+        _add_element(cmat, cdecap_amp, 'out', 'reg')
+
+        vdd_idx = _NODE_IDX['vdd']
+        fb_idx = _NODE_IDX['fb']
+        in_idx = _NODE_IDX[in_name]
+        b0 = np.zeros((num_row, len(_NODES)))
+        b1 = np.zeros((num_row, len(_NODES)))
+        # The amplifier input is either merged into the output or driven
+        drop = {fb_idx}
+
+        if self._rsource != 0:
+            gmat[:, vdd_idx, vdd_idx] += 1/self._rsource
+        elif in_name != 'vdd':
+            drop.add(vdd_idx)
+
+        if closed:
+            reg_idx = _NODE_IDX['reg']
+            for mat in (gmat, cmat):
+                mat[:, reg_idx, :] += mat[:, fb_idx, :]
+                mat[:, :, reg_idx] += mat[:, :, fb_idx]
+
+        if in_type == 'i':
+            b0[:, in_idx] = 1
+        elif in_idx == vdd_idx and self._rsource != 0:
+            # Ideal source behind rsource
+            b0[:, vdd_idx] = 1/self._rsource
+        else:
+            b0 = -gmat[:, :, in_idx]
+            b1 = -cmat[:, :, in_idx]
+            drop.add(in_idx)
+
+        keep = [idx for idx in range(len(_NODES)) if idx not in drop]
+        out_idx = keep.index(_NODE_IDX[out_name])
+        sub = np.ix_(keep, keep)
+        return gmat[:, sub[0], sub[1]], cmat[:, sub[0], sub[1]], b0[:, keep], b1[:, keep], out_idx, keep
+
+    def _add_transistor(self, tran_info: Mapping[str, Any], d_name: str, g_name: str,
+                        s_name: str, fg: Any, scale: Any = 1) -> None:
+        # Mirrors LTICircuit.add_transistor(..., b_name='gnd', neg_cap=False)
+        fg = np.asarray(fg)
+        gm = np.asarray(tran_info['gm'])*fg*scale
+        self._inst_gm.append(np.broadcast_to(gm, (self._num,)))
+        _add_vccs(self._gmat, gm, d_name, s_name, g_name, s_name)
+        _add_element(self._gmat, np.asarray(tran_info['gds'])*fg*scale, d_name, s_name)
+        if 'gb' in tran_info:
+            _add_vccs(self._gmat, np.asarray(tran_info['gb'])*fg*scale, d_name, s_name, 'gnd', s_name)
+        for cap_name, p_name, n_name in (('cgd', g_name, d_name),
+                                         ('cgs', g_name, s_name),
+                                         ('cds', d_name, s_name),
+                                         ('cgb', g_name, 'gnd'),
+                                         ('cdb', d_name, 'gnd'),
+                                         ('csb', s_name, 'gnd')):
+            cap = np.maximum(np.asarray(tran_info.get(cap_name, 0))*fg, 0)
+            _add_element(self._cmat, cap, p_name, n_name)
+
+
+class LDOSmallSignal(object):
+    """Small-signal model of the series LDO for one operating point.
+
+    Single-candidate front end of LDOSmallSignalBatch, memoizing results per capacitor pair.
+    """
+
+    def __init__(self, op_dict: Mapping[str, Mapping[str, float]], nf_dict: Mapping[str, int],
+                 ser_type: str, amp_in: str, rsource: float) -> None:
+        self._batch = LDOSmallSignalBatch(op_dict, nf_dict, ser_type, amp_in, rsource)
+        self._cache = dict()  # type: Dict[Tuple[Any, ...], Any]
+
+    @property
+    def batch(self) -> LDOSmallSignalBatch:
+        """The underlying model, e.g. to evaluate a capacitor sweep in one call."""
+        return self._batch
+
+    def get_loopgain(self) -> float:
+        '''
+        Returns:
+            A: DC loop gain (amplifier input -> regulated output, loop broken)
+        '''
+        key = ('loopgain',)
+        if key not in self._cache:
+            self._cache[key] = self._batch.get_loopgain()[0]
+        return self._cache[key]
+
+    def get_psrr(self, cload: float, cdecap_amp: float) -> Tuple[float, float]:
+        '''
+        Returns:
+            psrr: PSRR (dB)
+            fbw: Power supply -> output 3dB bandwidth (Hz), NaN if bag.data.lti.get_w_3db finds none
+        '''
+        key = ('psrr', cload, cdecap_amp)
+        if key not in self._cache:
+            psrr, fbw = self._batch.get_psrr(cload, cdecap_amp)
+            self._cache[key] = psrr[0], fbw[0]
+        return self._cache[key]
+
+    def get_stb(self, cload: float, cdecap_amp: float) -> float:
+        '''
+        Returns:
+            pm: Phase margin (degrees)
+        '''
+        key = ('stb', cload, cdecap_amp)
+        if key not in self._cache:
+            self._cache[key] = self._batch.get_stb(cload, cdecap_amp)[0]
+        return self._cache[key]
+
+    def get_loadreg(self, cload: float, cdecap_amp: float, vout: float, iout: float) -> float:
+        '''
+        Returns:
+            loadreg: Load regulation for peak-to-peak load current variation of 20% (V/V).
+                This is a DC quantity, so the capacitances do not affect it.
+        '''
+        key = ('loadreg', vout, iout)
+        if key not in self._cache:
+            self._cache[key] = self._batch.get_loadreg(cload, cdecap_amp, vout, iout)[0]
+        return self._cache[key]
+
+    def get_droop(self, cload: float, cdecap_amp: float, vout: float, iout: float) -> float:
+        '''
+        Returns:
+            droop: Peak output deviation after a load current step of 20% of iout (V/V)
+        '''
+        key = ('droop', cload, cdecap_amp, vout, iout)
+        if key not in self._cache:
+            self._cache[key] = self._batch.get_droop(cload, cdecap_amp, vout, iout)[0]
+        return self._cache[key]
+
+    def get_num_den(self, in_name: str, out_name: str, in_type: str, closed: bool,
+                    cload: float, cdecap_amp: float) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns:
+            num, den: Transfer function from in_name ('fb', 'vdd', or 'reg' for a current
+                input) to out_name, highest order first. in_type is 'v' or 'i'; closed ties
+                the amplifier input to the regulated output.
+        '''
+        num, den = self._batch.get_num_den(in_name, out_name, in_type, closed, cload, cdecap_amp)
+        return trim_poly(num[0]), trim_poly(den[0])
+
+
+def _add_element(mat: np.ndarray, val: Any, p_name: str, n_name: str) -> None:
+    p_idx = _NODE_IDX.get(p_name)
+    n_idx = _NODE_IDX.get(n_name)
+    if p_idx is not None:
+        mat[..., p_idx, p_idx] += val
+    if n_idx is not None:
+        mat[..., n_idx, n_idx] += val
+    if p_idx is not None and n_idx is not None:
+        mat[..., p_idx, n_idx] -= val
+        mat[..., n_idx, p_idx] -= val
+
+
+def _add_vccs(mat: np.ndarray, gm: Any, p_name: str, n_name: str,
+              cp_name: str, cn_name: str) -> None:
+    # Current gm*(v(cp) - v(cn)) flowing out of p and into n
+    for row_name, sign in ((p_name, 1), (n_name, -1)):
+        row = _NODE_IDX.get(row_name)
+        if row is None:
+            continue
+        for col_name, col_sign in ((cp_name, 1), (cn_name, -1)):
+            col = _NODE_IDX.get(col_name)
+            if col is not None:
+                mat[..., row, col] += sign*col_sign*gm
+
+
+def _get_step_peak(gmat: np.ndarray, cmat: np.ndarray, b: np.ndarray, out_idx: int) -> np.ndarray:
+    """Returns the peak magnitude of the unit step response of cmat*v' + gmat*v = b at out_idx, per row.
+
+    The modal response is sampled on a log time grid and refined around its
+    largest sample. Rows with a growing mode get inf.
+    """
+    num_row = gmat.shape[0]
+    a_mat = np.linalg.solve(gmat, cmat)
+    x_dc = np.linalg.solve(gmat, b[..., np.newaxis])
+    lam, vec = np.linalg.eig(a_mat)
+    gain = np.empty(lam.shape, dtype=complex)
+    try:
+        gain[:] = vec[:, out_idx, :]*np.linalg.solve(vec, x_dc.astype(complex))[..., 0]
+    except np.linalg.LinAlgError:
+        # Defective rows: least squares modal weights
+        for idx in range(num_row):
+            weight = np.linalg.lstsq(vec[idx], x_dc[idx].astype(complex), rcond=None)[0][:, 0]
+            gain[idx] = vec[idx, out_idx, :]*weight
+
+    lam_max = np.max(np.abs(lam), axis=-1, keepdims=True, initial=0)
+    dynamic = np.abs(lam) > _EIG_RTOL*lam_max
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(dynamic, 1/np.where(dynamic, lam, 1), np.inf)
+    unstable = np.any(dynamic & (rate.real <= 0), axis=-1)
+    ans = np.full(num_row, np.inf)
+    rows = np.flatnonzero(~unstable & np.any(dynamic, axis=-1))
+    # A purely resistive response is flat
+    static = ~unstable & ~np.any(dynamic, axis=-1)
+    ans[static] = np.abs(np.sum(gain[static], axis=-1).real)
+    if len(rows) == 0:
+        return ans
+
+    rate, gain, dynamic = rate[rows], gain[rows], dynamic[rows]
+    def get_response(t_vec):
+        decay = np.where(dynamic[:, np.newaxis, :], np.exp(-rate[:, np.newaxis, :]*t_vec[..., np.newaxis]), 0)
+        return np.abs(np.sum(gain[:, np.newaxis, :]*(1 - decay), axis=-1).real)
+
+    abs_rate = np.where(dynamic, np.abs(rate), np.nan)
+    log_lo = np.log10(0.01/np.nanmax(abs_rate, axis=-1))
+    log_hi = np.log10(10/np.nanmin(np.where(dynamic, rate.real, np.nan), axis=-1))
+    num_grid = int(np.ceil(_STEP_PER_DECADE*np.max(log_hi - log_lo))) + 1
+    log_t = log_lo[:, np.newaxis] + np.linspace(0, 1, num_grid)*(log_hi - log_lo)[:, np.newaxis]
+    resp = get_response(10**log_t)
+    pos = np.argmax(resp, axis=-1)
+    peak = resp[np.arange(len(rows)), pos]
+
+    # Refine between the neighbours of the largest sample
+    step = (log_hi - log_lo)/(num_grid - 1)
+    log_t = log_t[np.arange(len(rows)), pos][:, np.newaxis] + np.linspace(-1, 1, _STEP_REFINE)*step[:, np.newaxis]
+    ans[rows] = np.maximum(peak, np.max(get_response(10**log_t), axis=-1))
+    return ans
+
+
+def _get_det_poly(m0: np.ndarray, m1: np.ndarray, s0: Optional[float] = None) -> np.ndarray:
+    """Returns the coefficients of det(m0 + s*m1), highest order first.
+
+    Uses det(m0 + s*m1) = det(m0)*prod(1 + s*lambda_i), with lambda_i the
+    eigenvalues of inv(m0)*m1. If m0 is singular the polynomial is expanded
+    around a shifted point s0 instead and shifted back.
+    """
+    if s0 is not None:
+        poly = _get_det_poly(m0 + s0*m1, m1)
+        return np.poly1d(poly)(np.poly1d([1, -s0])).coeffs
+
+    try:
+        lam = np.linalg.eigvals(np.linalg.solve(m0, m1))
+    except np.linalg.LinAlgError:
+        return _get_det_poly(m0, m1, s0=np.linalg.norm(m0)/np.linalg.norm(m1))
+
+    lam = lam[np.abs(lam) > _EIG_RTOL*np.max(np.abs(lam), initial=0)]
+    poly = np.ones(1, dtype=complex)
+    for val in lam:
+        poly = np.convolve(poly, [val, 1])
+    return np.linalg.det(m0)*poly.real
+
+
+def _get_det_poly_batch(m0: np.ndarray, m1: np.ndarray) -> np.ndarray:
+    """Returns the coefficients of det(m0[i] + s*m1[i]) for every i, highest order first.
+
+    Batched _get_det_poly: dropped polynomial orders are left as leading zeros,
+    so all rows have the full length. Stacks with a singular m0 fall back to
+    _get_det_poly row by row.
+    """
+    num, num_dim = m0.shape[0], m0.shape[-1]
+    try:
+        lam = np.linalg.eigvals(np.linalg.solve(m0, m1))
+    except np.linalg.LinAlgError:
+        ans = np.zeros((num, num_dim+1))
+        for idx in range(num):
+            poly = _get_det_poly(m0[idx], m1[idx])
+            ans[idx, num_dim+1-len(poly):] = poly
+        return ans
+
+    lam_max = np.max(np.abs(lam), axis=-1, initial=0, keepdims=True)
+    lam = np.where(np.abs(lam) > _EIG_RTOL*lam_max, lam, 0)
+    # Multiply out prod(1 + s*lambda_i) one factor at a time for all rows
+    poly = np.ones((num, 1), dtype=complex)
+    for col in range(lam.shape[-1]):
+        new_poly = np.zeros((num, col+2), dtype=complex)
+        new_poly[:, :-1] = poly*lam[:, col:col+1]
+        new_poly[:, 1:] += poly
+        poly = new_poly
+    return np.linalg.det(m0)[:, np.newaxis]*poly.real
+
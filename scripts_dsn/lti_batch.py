@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Batched counterparts of the bag.data.lti margin and bandwidth functions.
+
+Transfer functions are stacks of numerator and denominator rows, highest order
+first and padded with leading zeros. Crossings are found on a log frequency grid
+and refined by bisection; rows where the grid sees no crossing go to bag.data.lti.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from bag.data.lti import get_w_3db, get_stability_margins
+
+# Grid points per decade of angular frequency
+_GRID_PER_DECADE = 50
+# Bisection steps refining each bracket, enough to reach double precision
+_NUM_REFINE = 64
+
+
+def get_w_3db_batch(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    '''
+    Returns:
+        w_3db: 3 dB bandwidth (rad/s) of each row of num/den, as bag.data.lti.get_w_3db,
+            NaN where it returns None
+    '''
+    num, den = np.atleast_2d(num), np.atleast_2d(den)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain_sq = (num[:, -1]/den[:, -1])**2
+    w_vec = _get_w_crossing(num, den, gain_sq/2)
+    for idx in np.flatnonzero(np.isnan(w_vec)):
+        w_3db = get_w_3db(trim_poly(num[idx]), trim_poly(den[idx]))
+        w_vec[idx] = float('nan') if w_3db is None else w_3db
+    return w_vec
+
+
+def get_phase_margin_batch(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    '''
+    Returns:
+        pm: Phase margin (degrees) of each row of the loop gain num/den, as
+            bag.data.lti.get_stability_margins
+    '''
+    num, den = np.atleast_2d(num), np.atleast_2d(den)
+    w_vec = _get_w_crossing(num, den, np.ones(num.shape[0]))
+    found = ~np.isnan(w_vec)
+    pm = np.empty(num.shape[0])
+    s_vec = 1j*w_vec[found, np.newaxis]
+    tf_vec = _polyval(num[found], s_vec)/_polyval(den[found], s_vec)
+    pm[found] = 180 + np.angle(tf_vec[:, 0], deg=True)
+    for idx in np.flatnonzero(~found):
+        pm[idx], _ = get_stability_margins(trim_poly(num[idx]), trim_poly(den[idx]))
+    return pm
+
+
+def _get_w_crossing(num: np.ndarray, den: np.ndarray, level: np.ndarray) -> np.ndarray:
+    """Returns the smallest w > 0 with |num(jw)|^2 = level*|den(jw)|^2 per row, NaN if none is seen."""
+    # Crossing condition as a polynomial in x = w^2, lowest order first
+    mag_num, mag_den = _get_mag_sq(num), _get_mag_sq(den)
+    order = max(mag_num.shape[1], mag_den.shape[1])
+    mag_num = np.pad(mag_num, ((0, 0), (0, order - mag_num.shape[1])))
+    mag_den = np.pad(mag_den, ((0, 0), (0, order - mag_den.shape[1])))
+    coef = mag_num - level[:, np.newaxis]*mag_den
+    coef = np.where(np.isfinite(coef), coef, 0)
+    x_lo, x_hi = _get_root_bounds(coef)
+    ans = np.full(num.shape[0], float('nan'))
+    valid = np.flatnonzero(x_lo < x_hi)
+    if len(valid) == 0:
+        return ans
+    coef, x_lo, x_hi = coef[valid], x_lo[valid], x_hi[valid]
+
+    # Log grid over each row's bounds, all rows with the same number of points
+    log_lo, log_hi = np.log(x_lo), np.log(x_hi)
+    num_grid = int(np.ceil(_GRID_PER_DECADE*np.max(log_hi - log_lo)/np.log(100))) + 2
+    log_x = log_lo[:, np.newaxis] + np.linspace(0, 1, num_grid)*(log_hi - log_lo)[:, np.newaxis]
+    sign = np.sign(_polyval_asc(coef, np.exp(log_x)))
+
+    # First grid point whose sign differs from the one below all roots
+    sign_lo = sign[:, 0]
+    change = sign != sign_lo[:, np.newaxis]
+    exact = sign_lo == 0
+    ans[valid[exact]] = np.sqrt(x_lo[exact])
+    pos = np.argmax(change, axis=1)
+    rows = np.flatnonzero(~exact & np.any(change, axis=1))
+    if len(rows) == 0:
+        return ans
+
+    lo = log_x[rows, pos[rows]-1]
+    hi = log_x[rows, pos[rows]]
+    sign_lo = sign_lo[rows]
+    for _ in range(_NUM_REFINE):
+        mid = (lo + hi)/2
+        same = np.sign(_polyval_asc(coef[rows], np.exp(mid)[:, np.newaxis])[:, 0]) == sign_lo
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    ans[valid[rows]] = np.exp(hi/2)
+    return ans
+
+
+def _get_mag_sq(poly: np.ndarray) -> np.ndarray:
+    """Returns |poly(jw)|^2 per row as a polynomial in w^2, lowest order first."""
+    asc = poly[:, ::-1]
+    order = asc.shape[1]
+    # Real and imaginary parts of poly(jw) as polynomials in w, lowest order first
+    sign = np.array([(1, 0, -1, 0)[k % 4] for k in range(order)])
+    sign_im = np.array([(0, 1, 0, -1)[k % 4] for k in range(order)])
+    re, im = asc*sign, asc*sign_im
+    ans = np.zeros((poly.shape[0], 2*order - 1))
+    for k in range(order):
+        ans[:, k:k+order] += re[:, k:k+1]*re + im[:, k:k+1]*im
+    # Only even powers of w remain
+    return ans[:, ::2]
+
+
+def _get_root_bounds(coef: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns Cauchy bounds on the magnitudes of the nonzero roots of each row, lowest order first."""
+    mag = np.abs(coef)
+    nonzero = mag > 0
+    num_row, order = coef.shape
+    has_any = np.any(nonzero, axis=1)
+    low = np.argmax(nonzero, axis=1)
+    high = order - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    col = np.arange(order)
+    rows = np.arange(num_row)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_below = np.max(np.where(col < high[:, np.newaxis], mag, 0), axis=1)
+        max_above = np.max(np.where(col > low[:, np.newaxis], mag, 0), axis=1)
+        x_hi = 1 + max_below/mag[rows, high]
+        x_lo = mag[rows, low]/(mag[rows, low] + max_above)
+    # Constant rows have no roots
+    empty = ~has_any | (low == high)
+    x_lo[empty] = 1
+    x_hi[empty] = 0
+    return x_lo, x_hi
+
+
+def _polyval(poly: np.ndarray, s: np.ndarray) -> np.ndarray:
+    """Evaluates each row of poly, highest order first, at the matching row of s."""
+    ans = np.zeros(s.shape, dtype=np.result_type(poly, s))
+    for k in range(poly.shape[1]):
+        ans = ans*s + poly[:, k:k+1]
+    return ans
+
+
+def _polyval_asc(coef: np.ndarray, x: np.ndarray) -> np.ndarray:
+    with np.errstate(over='ignore', invalid='ignore'):
+        return _polyval(coef[:, ::-1], x)
+
+
+def trim_poly(poly: np.ndarray) -> np.ndarray:
+    """Strips the leading zeros of a padded polynomial row."""
+    nonzero = np.flatnonzero(poly)
+    return poly[nonzero[0]:] if len(nonzero) else poly[-1:]
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from span_ion_proj.scripts_dsn import get_mos_db
+except ImportError:
+    # Databases supplied with MOSDBCache.put are still served
+    get_mos_db = None
+
+
+class MOSDBCache(object):
+    """Process-wide LRU cache of transistor databases returned by get_mos_db.
+
+    Databases are keyed on (spec_file, intent, sim_env, mtime of spec_file), with
+    spec_file resolved by resolve_spec_file and handed to get_mos_db as such, so
+    editing a characterization spec file causes it to be reloaded rather than
+    served stale. Databases supplied with put are served as given and never
+    evicted, and need no span_ion_proj. The cache is thread-safe: concurrent requests for the same database
+    wait for a single load.
+
+    Parameters
+    ----------
+    max_size : int
+        maximum number of databases held in memory. The least recently used
+        database is evicted beyond this.
+    """
+
+    def __init__(self, max_size: int = 8) -> None:
+        self._max_size = max_size
+        self._db_table = OrderedDict()  # type: OrderedDict[Tuple[Hashable, ...], Any]
+        self._pending = dict()  # type: Dict[Tuple[Hashable, ...], Future]
+        self._supplied = dict()  # type: Dict[Tuple[str, str, str], Any]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, val: int) -> None:
+        with self._lock:
+            self._max_size = val
+            self._evict()
+
+    @staticmethod
+    def get_key(spec_file: str, intent: str, sim_env: str) -> Tuple[Hashable, ...]:
+        """Returns the cache key of a database. Raises FileNotFoundError if the spec file cannot be found."""
+        spec_file = resolve_spec_file(spec_file)
+        return spec_file, intent, sim_env, os.path.getmtime(spec_file)
+
+    def get(self, spec_file: str, intent: str, sim_env: str) -> Any:
+        """Returns the database for the given spec file, loading it on a miss."""
+        with self._lock:
+            supplied = self._supplied.get((os.path.abspath(str(spec_file)), intent, sim_env))
+            if supplied is not None:
+                self.hits += 1
+                return supplied
+        key = self.get_key(spec_file, intent, sim_env)
+        with self._lock:
+            if key in self._db_table:
+                self.hits += 1
+                self._db_table.move_to_end(key)
+                return self._db_table[key]
+            future = self._pending.get(key)
+            if future is None:
+                self.misses += 1
+                future = self._pending[key] = Future()
+                is_loader = True
+            else:
+                self.hits += 1
+                is_loader = False
+
+        # Load outside the lock so that different databases load concurrently
+        if not is_loader:
+            return future.result()
+        try:
+            if get_mos_db is None:
+                raise ImportError(f'Loading the transistor database {key[0]} needs span_ion_proj; '
+                                  f'supply it with MOSDBCache.put instead')
+            db = get_mos_db(spec_file=key[0], intent=intent, sim_env=sim_env)
+        except BaseException as ex:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(ex)
+            raise
+        with self._lock:
+            del self._pending[key]
+            self._db_table[key] = db
+            self._evict()
+        future.set_result(db)
+        return db
+
+    def put(self, spec_file: str, intent: str, sim_env: str, db: Any) -> None:
+        """Supplies a database for the given spec file, which need not exist, instead of loading it."""
+        with self._lock:
+            self._supplied[os.path.abspath(str(spec_file)), intent, sim_env] = db
+
+    def get_db_dict(self, specfile_dict: Mapping[str, str], th_dict: Mapping[str, str],
+                    sim_env: str) -> Dict[str, Any]:
+        """Returns a dictionary from device name to database, sharing cached handles."""
+        return {k: self.get(specfile_dict[k], th_dict[k], sim_env) for k in specfile_dict.keys()}
+
+    def get_corner_db_dicts(self, specfile_dict: Mapping[str, str], th_dict: Mapping[str, str],
+                            sim_env_list: Sequence[str],
+                            max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Returns get_db_dict for every simulation environment, loading the databases in threads.
+
+        Parameters
+        ----------
+        specfile_dict : Mapping[str, str]
+            transistor database spec file of each device.
+        th_dict : Mapping[str, str]
+            transistor flavor of each device.
+        sim_env_list : Sequence[str]
+            simulation environments.
+        max_workers : Optional[int]
+            maximum number of loading threads. Defaults to one per distinct database.
+
+        Returns
+        -------
+        corner_db_dict : Dict[str, Dict[str, Any]]
+            dictionary from simulation environment to device name to database.
+        """
+        job_list = list({(specfile_dict[k], th_dict[k], env) for env in sim_env_list for k in specfile_dict})
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(job_list), 1)) as executor:
+            db_list = list(executor.map(lambda job: self.get(*job), job_list))
+        db_table = dict(zip(job_list, db_list))
+        return {env: {k: db_table[specfile_dict[k], th_dict[k], env] for k in specfile_dict}
+                for env in sim_env_list}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db_table.clear()
+            self._supplied.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(hits=self.hits,
+                        misses=self.misses,
+                        evictions=self.evictions,
+                        size=len(self._db_table) + len(self._supplied))
+
+    def _evict(self) -> None:
+        while len(self._db_table) > max(self._max_size, 0):
+            self._db_table.popitem(last=False)
+            self.evictions += 1
+
+
+_db_cache = MOSDBCache()
+
+
+def resolve_spec_file(spec_file: str) -> str:
+    """Returns the absolute path of a transistor spec file, as get_mos_db finds it.
+
+    Relative paths are looked up in the working directory first, then in the
+    BAG working directory ($BAG_WORK_DIR). Raises FileNotFoundError if neither has it.
+    """
+    spec_file = os.path.expanduser(str(spec_file))
+    root_list = [os.getcwd()]
+    if not os.path.isabs(spec_file) and os.environ.get('BAG_WORK_DIR'):
+        root_list.append(os.environ['BAG_WORK_DIR'])
+    for root in root_list:
+        fname = os.path.abspath(os.path.join(root, spec_file))
+        if os.path.isfile(fname):
+            return fname
+    raise FileNotFoundError(f'Transistor spec file {spec_file} not found in {", ".join(root_list)}')
+
+
+def get_db_cache() -> MOSDBCache:
+    """Returns the process-wide transistor database cache."""
+    return _db_cache
+
+
+class OpTable(object):
+    """Operating points of a transistor database on a regular bias grid, filled in on demand.
+
+    Each point is queried from the database the first time it is asked for and
+    served from dense arrays afterwards, so sweeps revisiting the same bias
+    points query each of them once. Callers holding grid indices use
+    query_index; query looks the values up on the axes first. Points off the
+    grid are queried directly and not stored.
+
+    Parameters
+    ----------
+    db : Any
+        the transistor database.
+    axes : Sequence[np.ndarray]
+        increasing grid values of each table axis.
+    get_bias : Callable[..., Mapping[str, Any]]
+        maps arrays of axis values, one per axis, to the bias voltage keyword
+        arguments of db.query. A module level function, so the table can be pickled.
+    """
+
+    def __init__(self, db: Any, axes: Sequence[np.ndarray], get_bias: Callable[..., Mapping[str, Any]]) -> None:
+        self._db = db
+        self._axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self._get_bias = get_bias
+        self._shape = tuple(len(axis) for axis in self._axes)
+        self._known = np.zeros(self._shape, dtype=bool)
+        self._values = dict()  # type: Dict[str, np.ndarray]
+
+    @property
+    def num_known(self) -> int:
+        return int(np.count_nonzero(self._known))
+
+    def query(self, *vals: Any) -> Dict[str, Any]:
+        """Returns the operating points at broadcast arrays of axis values, as query_batch.
+
+        Scalar axis values give a dictionary of scalars, as db.query.
+        """
+        vals = np.broadcast_arrays(*(np.asarray(val, dtype=float) for val in vals))
+        idx = tuple(self._get_index(axis, val) for axis, val in zip(self._axes, vals))
+        if any(axis_idx is None for axis_idx in idx):
+            ans = query_batch(self._db, **self._get_bias(*vals))
+            if vals[0].ndim == 0:
+                return {k: float(v) for k, v in ans.items()}
+            return ans
+        return self.query_index(*idx)
+
+    def query_index(self, *idx: Any) -> Dict[str, Any]:
+        """Returns the operating points at broadcast arrays of grid indices, one per axis, as query."""
+        idx = tuple(np.broadcast_arrays(*(np.asarray(axis_idx, dtype=int) for axis_idx in idx)))
+        self._fill(idx)
+        if idx[0].ndim == 0:
+            return {k: float(v[idx]) for k, v in self._values.items()}
+        return {k: v[idx] for k, v in self._values.items()}
+
+    def _fill(self, idx: Tuple[np.ndarray, ...]) -> None:
+        missing = ~self._known[idx]
+        if not np.any(missing):
+            return
+        flat = np.unique(np.ravel_multi_index(tuple(np.asarray(axis_idx)[missing] for axis_idx in idx), self._shape))
+        new_idx = np.unravel_index(flat, self._shape)
+        op = query_batch(self._db, **self._get_bias(*(axis[axis_idx] for axis, axis_idx in zip(self._axes, new_idx))))
+        for k, v in op.items():
+            if k not in self._values:
+                self._values[k] = np.full(self._shape, np.nan)
+            self._values[k][new_idx] = v
+        self._known[new_idx] = True
+
+    @staticmethod
+    def _get_index(axis: np.ndarray, val: np.ndarray) -> Optional[np.ndarray]:
+        """Returns the indices of the values in axis, or None if any is not exactly on it."""
+        if len(axis) == 0:
+            return None
+        idx = np.minimum(np.searchsorted(axis, val), len(axis) - 1)
+        return idx if np.all(axis[idx] == val) else None
+
+
+# Databases whose query() was found to accept voltage arrays, mapped to the verdict
+_batch_support = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary[Any, bool]
+
+
+def query_batch(db: Any, **kwargs: Any) -> Dict[str, np.ndarray]:
+    """Queries a transistor database over broadcast arrays of bias voltages.
+
+    Databases providing their own query_batch method are used directly. Otherwise
+    the whole grid is passed to db.query in one call, and that answer is trusted
+    only if it has the right shape and its end points agree exactly with scalar
+    queries. Databases failing the check fall back to point-by-point queries. The
+    verdict is remembered per database, so the check costs two extra queries once.
+
+    Parameters
+    ----------
+    db : Any
+        the transistor database.
+    **kwargs : Any
+        bias voltages (vgs, vds, vbs, ...), as scalars or arrays.
+
+    Returns
+    -------
+    op : Dict[str, np.ndarray]
+        dictionary from operating point parameter to array of values, with the
+        broadcast shape of the inputs. Empty if the inputs are empty.
+    """
+    names = list(kwargs.keys())
+    args = np.broadcast_arrays(*(np.asarray(kwargs[k], dtype=float) for k in names))
+    shape = args[0].shape
+    flat = [arg.ravel() for arg in args]
+    if flat[0].size == 0:
+        return dict()
+
+    if hasattr(db, 'query_batch'):
+        ans = db.query_batch(**dict(zip(names, flat)))
+    else:
+        ans = None
+        support = _get_batch_support(db)
+        if support is not False:
+            ans = _query_vector(db, names, flat, verify=support is None)
+            _set_batch_support(db, ans is not None)
+        if ans is None:
+            ans = _query_points(db, names, flat)
+
+    return {k: np.reshape(v, shape) for k, v in ans.items()}
+
+
+def _get_batch_support(db: Any) -> Optional[bool]:
+    try:
+        return _batch_support.get(db)
+    except TypeError:
+        return None
+
+
+def _set_batch_support(db: Any, val: bool) -> None:
+    try:
+        _batch_support[db] = val
+    except TypeError:
+        pass
+
+
+def _query_vector(db: Any, names: List[str], flat: Sequence[np.ndarray],
+                  verify: bool) -> Optional[Dict[str, np.ndarray]]:
+    num = flat[0].size
+    try:
+        ans = db.query(**dict(zip(names, flat)))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    ans = {k: np.asarray(v) for k, v in ans.items()}
+    if any(v.shape != (num,) for v in ans.values()):
+        return None
+    if verify:
+        for idx in {0, num-1}:
+            op = db.query(**{k: arg[idx] for k, arg in zip(names, flat)})
+            if op.keys() != ans.keys() or any(not np.array_equal(ans[k][idx], op[k]) for k in op):
+                return None
+    return ans
+
+
+def _query_points(db: Any, names: List[str], flat: Sequence[np.ndarray]) -> Dict[str, np.ndarray]:
+    op_list = [db.query(**{k: arg[idx] for k, arg in zip(names, flat)}) for idx in range(flat[0].size)]
+    return {k: np.array([op[k] for op in op_list]) for k in op_list[0].keys()}
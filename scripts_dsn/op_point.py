@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterator, Mapping, Sequence, Union
+
+import numpy as np
+
+
+class OpGroup(Mapping):
+    """Operating points of a group of devices, stored as the rows of one array.
+
+    Read-only dictionary from device name to an OpPoint view of its row. present
+    is False where a device has no such parameter.
+    """
+
+    __slots__ = ('_layout', '_values', '_rows')
+
+    def __init__(self, names: Sequence[str], fields: Sequence[str], values: np.ndarray,
+                 present: np.ndarray) -> None:
+        self._layout = _OpLayout(names, fields, present)
+        self._values = values
+        # Row lists make single reads Python indexing rather than numpy scalar access
+        self._rows = values.tolist()
+
+    @classmethod
+    def from_ops(cls, op_dict: Mapping[str, Mapping[str, Any]]) -> 'OpGroup':
+        """Packs a dictionary from device name to operating point dictionary."""
+        names = list(op_dict.keys())
+        fields = []
+        for op in op_dict.values():
+            fields.extend(k for k in op.keys() if k not in fields)
+        field_idx = {name: idx for idx, name in enumerate(fields)}
+        values = np.zeros((len(names), len(fields)))
+        present = np.zeros((len(names), len(fields)), dtype=bool)
+        for row, op in enumerate(op_dict.values()):
+            for k, v in op.items():
+                values[row, field_idx[k]] = v
+                present[row, field_idx[k]] = True
+        return cls(names, fields, values, present)
+
+    def __getitem__(self, name: str) -> 'OpPoint':
+        return OpPoint(self, self._layout.name_idx[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout.names)
+
+    def __len__(self) -> int:
+        return len(self._layout.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._layout.name_idx
+
+    def __reduce__(self):
+        layout = self._layout
+        return self.__class__, (layout.names, layout.fields, self._values, layout.present)
+
+    @property
+    def fields(self) -> Sequence[str]:
+        return self._layout.fields
+
+    def scale(self, wm: Union[Mapping[str, float], Sequence[float], np.ndarray]) -> 'OpGroup':
+        """Returns the group with every device's width multiplied by wm, by device name or in row order."""
+        layout = self._layout
+        if isinstance(wm, Mapping):
+            wm = [wm[name] for name in layout.names]
+        factor = np.where(layout.is_v, 1.0, np.asarray(wm, dtype=float)[:, np.newaxis])
+        # The scaled group shares the layout, so only the values are allocated
+        ans = object.__new__(self.__class__)
+        ans._layout = layout
+        ans._values = self._values*factor
+        ans._rows = ans._values.tolist()
+        return ans
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """Returns a plain dictionary copy of the operating points."""
+        return {name: dict(self[name]) for name in self._layout.names}
+
+
+class _OpLayout(object):
+    """Row and column index tables shared by an OpGroup and its scaled copies."""
+
+    __slots__ = ('names', 'name_idx', 'fields', 'present', 'row_cols', 'is_v')
+
+    def __init__(self, names: Sequence[str], fields: Sequence[str], present: np.ndarray) -> None:
+        self.names = tuple(names)
+        self.name_idx = {name: idx for idx, name in enumerate(self.names)}
+        self.fields = tuple(fields)
+        self.present = present
+        # Per row, the column of every parameter the device has
+        self.row_cols = [{name: col for col, name in enumerate(self.fields) if row_present[col]}
+                         for row_present in present]
+        # Voltages (vstar, vth, ...) do not scale with width, as in resize_op
+        self.is_v = np.array([name.startswith('v') for name in self.fields], dtype=bool)
+
+
+class OpPoint(Mapping):
+    """Read-only dictionary view of one device's row in an OpGroup."""
+
+    __slots__ = ('_group', '_row')
+
+    def __init__(self, group: OpGroup, row: int) -> None:
+        self._group = group
+        self._row = row
+
+    def __getitem__(self, key: str) -> float:
+        group = self._group
+        return group._rows[self._row][group._layout.row_cols[self._row][key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._group._layout.row_cols[self._row])
+
+    def __len__(self) -> int:
+        return len(self._group._layout.row_cols[self._row])
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._group._layout.row_cols[self._row]
+
+    def __reduce__(self):
+        return self.__class__, (self._group, self._row)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+import time
+from contextlib import contextmanager
+
+
+class Profiler(object):
+    """Counts and times events (database queries, small-signal solves, ...) per design stage.
+
+    Events go to the innermost open stage, reported by path, e.g. 'meet_spec/dsn_vg/dsn_amp'.
+    """
+
+    def __init__(self) -> None:
+        self._stack = []  # type: List[str]
+        self._stages = dict()  # type: Dict[str, Dict[str, Any]]
+        self._totals = dict()  # type: Dict[str, Dict[str, float]]
+        self._db_proxies = dict()  # type: Dict[int, ProfiledDB]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._stack.append(name)
+        path = '/'.join(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            info = self._get_stage(path)
+            info['count'] += 1
+            info['time'] += time.perf_counter() - start
+            self._stack.pop()
+
+    @contextmanager
+    def event(self, name: str, num: int = 1) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, num)
+
+    def record(self, name: str, start: float, num: int = 1) -> None:
+        """Records an event of num items started at time.perf_counter() value start."""
+        elapsed = time.perf_counter() - start
+        path = '/'.join(self._stack)
+        for table in (self._get_stage(path)['events'], self._totals):
+            info = table.setdefault(name, dict(count=0, num=0, time=0.0))
+            info['count'] += 1
+            info['num'] += num
+            info['time'] += elapsed
+
+    def wrap_db(self, db: Any) -> 'ProfiledDB':
+        """Returns a proxy of a transistor database counting its queries."""
+        if id(db) not in self._db_proxies:
+            self._db_proxies[id(db)] = ProfiledDB(db, self)
+        return self._db_proxies[id(db)]
+
+    def report(self) -> Dict[str, Any]:
+        return dict(stages={k: dict(v, events=dict(v['events'])) for k, v in self._stages.items()},
+                    totals={k: dict(v) for k, v in self._totals.items()})
+
+    def _get_stage(self, path: str) -> Dict[str, Any]:
+        if path not in self._stages:
+            self._stages[path] = dict(count=0, time=0.0, events=dict())
+        return self._stages[path]
+
+
+class ProfiledDB(object):
+    """Transistor database proxy recording every query, batches included, as a 'db_query' event."""
+
+    def __init__(self, db: Any, profiler: Profiler) -> None:
+        self._db = db
+        self._profiler = profiler
+        if hasattr(db, 'query_batch'):
+            self.query_batch = self._query_batch
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not set in __init__; guards against lookups
+        # before _db exists, e.g. while unpickling
+        if name.startswith('__') or name in ('_db', '_profiler'):
+            raise AttributeError(name)
+        return getattr(self._db, name)
+
+    def query(self, **kwargs: Any) -> Mapping[str, Any]:
+        with self._profiler.event('db_query', _get_num(kwargs)):
+            return self._db.query(**kwargs)
+
+    def _query_batch(self, **kwargs: Any) -> Mapping[str, Any]:
+        with self._profiler.event('db_query', _get_num(kwargs)):
+            return self._db.query_batch(**kwargs)
+
+
+def _get_num(kwargs: Mapping[str, Any]) -> int:
+    return max((getattr(val, 'size', 1) for val in kwargs.values()), default=1)
+
+
+_profiler = None  # type: Optional[Profiler]
+
+
+def get_profiler() -> Optional[Profiler]:
+    """Returns the active profiler, or None if profiling is off."""
+    return _profiler
+
+
+def set_profiler(profiler: Optional[Profiler]) -> None:
+    """Installs the process-wide profiler; None turns profiling off."""
+    global _profiler
+    _profiler = profiler
+
+
+@contextmanager
+def _null_context() -> Iterator[None]:
+    yield
+
+
+def stage(name: str):
+    """Context manager opening a profiling stage, or doing nothing if profiling is off."""
+    return _null_context() if _profiler is None else _profiler.stage(name)
+
+
+def event(name: str, num: int = 1):
+    """Context manager timing a profiling event, or doing nothing if profiling is off."""
+    return _null_context() if _profiler is None else _profiler.event(name, num)
+
+
+def event_start() -> Optional[float]:
+    """Returns the start time of an event for event_end, or None if profiling is off."""
+    return None if _profiler is None else time.perf_counter()
+
+
+def event_end(name: str, start: Optional[float], num: int = 1) -> None:
+    """Records an event started by event_start."""
+    if start is not None and _profiler is not None:
+        _profiler.record(name, start, num)
+
+
+def wrap_db_dict(db_dict: Mapping[str, Any]) -> Dict[str, Any]:
+    """Returns db_dict with query-counting proxies if profiling is on, unchanged otherwise."""
+    if _profiler is None:
+        return dict(db_dict)
+    return {k: _profiler.wrap_db(db) for k, db in db_dict.items()}
@@ -3,15 +3,110 @@
 from typing import Mapping, Tuple, Any, List
 
 import os
+import pickle
 import pkg_resources
+import functools
 import numpy as np
 import warnings
+import yaml
+from pathlib import Path
 from pprint import pprint
 
 from bag.design.module import Module
 from bag.core import BagProject
-from span_ion_proj.scripts_dsn import DesignModule, get_mos_db, estimate_vth, parallel, verify_ratio, num_den_add, enable_print, disable_print
+from span_ion_proj.scripts_dsn import DesignModule, estimate_vth, parallel, verify_ratio, num_den_add, enable_print, disable_print
 from bag.data.lti import LTICircuit, get_w_3db, get_stability_margins
+from scripts_dsn.mos_db import get_db_cache, query_batch, OpTable
+from scripts_dsn.op_point import OpGroup
+from scripts_dsn.ldo_small_signal import LDOSmallSignal, LDOSmallSignalBatch, get_instances
+from scripts_dsn.sweep import bisect_min_log, grid_min_log, grid_argmin, ParetoArchive, SweepEngine
+from scripts_dsn.profiling import stage, event, event_start, event_end, wrap_db_dict
+from scripts_dsn.checkpoint import SweepCheckpoint
+from scripts_dsn.candidate_log import CandidateLog
+
+def _get_tail_bias(vtail, vgtail):
+    return dict(vgs=vgtail, vds=vtail, vbs=0)
+
+def _get_mir_bias(vgtail):
+    return dict(vgs=vgtail, vds=vgtail, vbs=0)
+
+def _load_warm_start(warm_start):
+    '''
+    Returns:
+        warm_op: The previous best_op given as warm_start, loaded if it is a pickle or
+            yaml file name, or None if there is none or it did not meet spec
+    '''
+    if warm_start is None or isinstance(warm_start, str) and not warm_start:
+        return None
+    if isinstance(warm_start, str):
+        if os.path.splitext(warm_start)[1] in ('.yaml', '.yml'):
+            with open(warm_start, 'r') as f:
+                warm_start = yaml.load(f, Loader=yaml.SafeLoader)
+        else:
+            with open(warm_start, 'rb') as f:
+                warm_start = pickle.load(f)
+    if 'vg' not in warm_start or not np.isfinite(warm_start.get('ibias', float('inf'))):
+        warnings.warn('Warm start design did not meet spec; ignoring it')
+        return None
+    return warm_start
+
+# Number of tail finger counts evaluated per batched small-signal call in the linear tail search
+_TAIL_BATCH = 16
+
+# Number of Monte Carlo samples evaluated per batched small-signal model
+_MC_BATCH = 1000
+
+def _get_ser_params(params, ser_type):
+    '''
+    Returns:
+        ser_params: params for series device type ser_type. Device dictionary entries
+            of the series device given per type, e.g. specfile_dict['ser'] = {'n': ..., 'p': ...},
+            are replaced by the entry of ser_type
+    '''
+    ser_params = dict(params, ser_type=ser_type)
+    for key in ('specfile_dict', 'th_dict', 'l_dict'):
+        dev_dict = params[key]
+        if isinstance(dev_dict['ser'], Mapping):
+            ser_params[key] = dict(dev_dict, ser=dev_dict['ser'][ser_type])
+    return ser_params
+
+def _get_psrr(ss, cload, cdecap_amp, **kwargs):
+    '''
+    Returns:
+        psrr, psrr_fbw: ss.get_psrr(cload, cdecap_amp, **kwargs), with a psrr_fbw of 0
+            where the small-signal model finds no 3dB bandwidth (NaN)
+    '''
+    psrr, fbw = ss.get_psrr(cload, cdecap_amp, **kwargs)
+    if np.ndim(fbw):
+        return psrr, np.where(np.isnan(fbw), 0, fbw)
+    return psrr, 0 if np.isnan(fbw) else fbw
+
+# Metrics traded off against each other in the Pareto output mode
+_PARETO_OBJECTIVES = dict(ibias='min', psrr='max', psrr_fbw='max', pm='max', loadreg='min')
+
+class _LTIModel(object):
+    """LDOSmallSignal interface over the per-analysis LTICircuit builders of the design module."""
+
+    def __init__(self, dsn, op_dict, nf_dict, ser_type, amp_in, rsource):
+        self._dsn = dsn
+        self._args = (op_dict, nf_dict, ser_type, amp_in)
+        self._rsource = rsource
+
+    def get_loopgain(self):
+        return self._dsn._get_loopgain_lti(*self._args, self._rsource)
+
+    def get_psrr(self, cload, cdecap_amp):
+        return self._dsn._get_psrr_lti(*self._args, cload, cdecap_amp, self._rsource)
+
+    def get_stb(self, cload, cdecap_amp):
+        return self._dsn._get_stb_lti(*self._args, cload, cdecap_amp, self._rsource)
+
+    def get_loadreg(self, cload, cdecap_amp, vout, iout):
+        return self._dsn._get_loadreg_lti(*self._args, cload, cdecap_amp, self._rsource, vout, iout)
+
+    def get_droop(self, cload, cdecap_amp, vout, iout):
+        # LTICircuit has no transient analysis; the step response is the same model's
+        return LDOSmallSignal(*self._args, self._rsource).get_droop(cload, cdecap_amp, vout, iout)
 
 # noinspection PyPep8Naming
 class bag2_analog__regulator_ldo_series_dsn(DesignModule):
@@ -30,14 +125,15 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         """
         ans = super().get_op_info()
         ans.update(dict(
-            specfile_dict = 'Transistor database spec file names for each device',
-            ser_type = 'n or p for type of series device',
-            th_dict = 'Transistor flavor dictionary.',
-            l_dict = 'Transistor channel length dictionary',
-            sim_env = 'Simulation environment',
+            specfile_dict = 'Transistor database spec file names for each device. The series device entry may map each series device type to its own',
+            ser_type = 'n or p for type of series device, or a list of them to design each and keep the best, with the best design of each type in best_op["ser_results"]',
+            th_dict = 'Transistor flavor dictionary. The series device entry may map each series device type to its own',
+            l_dict = 'Transistor channel length dictionary. The series device entry may map each series device type to its own',
+            sim_env = 'Simulation environment, or list of them: the design is sized at the first and must meet spec at every one, with per-corner metrics in best_op["corners"]',
             vdd = 'Supply voltage in volts.',
             vout = 'Reference voltage to regulate the output to',
             loadreg = 'Maximum absolute change in output voltage given change in output current',
+            droop = 'Optional. Maximum peak output deviation after a load current step of 20% of iload, relative to vout, from the small-signal step response (default none, unchecked)',
             iload = 'Bias current of series device, in amperes.',
             iref = 'Reference current for amplifier biasing, in amperes',
             iamp_max = 'Maximum amplifier current, in amperes',
@@ -49,7 +145,27 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
             psrr_fbw = 'Minimum bandwidth for power supply rejection roll-off',
             pm = 'Minimum phase margin for the large feedback loop, in degrees',
             load_pole = 'True to ensure dominant pole is at theregulator output',
-            v_res = 'Resolution of voltage bias point sweeps, in volts'
+            v_res = 'Resolution of voltage bias point sweeps, in volts',
+            pareto = 'Optional. True to also return the Pareto front over ibias, psrr, psrr_fbw, pm and loadreg of all designs meeting spec in best_op["pareto"] (default False)',
+            pareto_size = 'Optional. Maximum number of designs kept on the Pareto front (default 50)',
+            adaptive = 'Optional. Coarsening factor of the bias sweeps: every adaptive-th grid point is swept first, then only the points around the best ones, or every point if no coarse one meets spec (default 1, full sweep)',
+            adaptive_tol = 'Optional. Relative amplifier current margin within which coarse series gate designs are refined (default 0.05)',
+            n_workers = 'Optional. Number of worker processes for the series gate bias sweep (default 1, serial)',
+            tail_search = "Optional. 'bracket' (default) brackets and bisects the tail finger count when growing the amplifier, assuming phase margin and PSRR bandwidth improve with it; 'linear' walks it two fingers at a time",
+            cdecap_rtol = 'Optional. Relative tolerance of the minimum amplifier decap search (default 0.01)',
+            cdecap_search = "Optional. 'bisect' (default) bisects the amplifier decap assuming the phase margin improves with it; 'batch' evaluates log grids of decap values at once, refining around the smallest passing one",
+            ss_model = "Optional. Small-signal evaluation: 'mna' (default) stamps one shared LDO model per operating point, 'lti' builds an LTICircuit per analysis",
+            lti_check = 'Optional. True to re-evaluate the chosen design with LTICircuit and warn if it disagrees with the small-signal model; relative deviations go in best_op["lti_check"] (default False)',
+            checkpoint = 'Optional. File to periodically save the series gate sweep progress to; it is deleted once the sweep finishes. With several series device types, each type saves to <stem>_<type><suffix>, deleted once all types are designed (default none)',
+            checkpoint_interval = 'Optional. Minimum time between checkpoint saves, in seconds (default 60)',
+            resume = 'Optional. True to continue from the checkpoint file if it holds a sweep with the same parameters (default False)',
+            warm_start = 'Optional. Previous best_op, or a pickle or yaml file of one, to search outward from: its series gate bias is designed first and its tail finger count seeds the tail search (default none)',
+            mc_samples = 'Optional. Number of Monte Carlo mismatch samples of the chosen design; offset, metric statistics and spec yields go in best_op["mc"] (default 0, none)',
+            mc_seed = 'Optional. Seed of the Monte Carlo mismatch samples (default 0)',
+            mc_avt = 'Optional. Pelgrom threshold voltage mismatch coefficient, in V*m (default 3.5e-9, i.e. 3.5 mV*um)',
+            mc_abeta = 'Optional. Pelgrom current factor mismatch coefficient, in m (default 1e-8, i.e. 1 %*um)',
+            progress_interval = 'Optional. Minimum time between progress reports of the series gate sweep, in seconds (default none)',
+            candidate_log = 'Optional. File to append a JSON line to for every series gate bias candidate, with its bias voltages, sizing, metrics and rejection reason (default none)'
         ))
         return ans
 
@@ -63,14 +179,8 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         return op_new
 
     def dsn_fet(self, **params):
-        specfile_dict = params['specfile_dict']
         ser_type = params['ser_type']
-        th_dict = params['th_dict']
-        sim_env = params['sim_env']
-
-        db_dict = {k:get_mos_db(spec_file=specfile_dict[k],
-                                intent=th_dict[k],
-                                sim_env=sim_env) for k in specfile_dict.keys()}
+        db_dict = params['db_dict']
 
         vdd = params['vdd']
         vout = params['vout']
@@ -87,73 +197,157 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         wm = (m%1 + 1)
         nf = 2*int(m)
         ser_op = self.resize_op(ser_op,wm)
-        return m > 1, dict(nf=nf, wm=wm, op=ser_op)
+        return m > 1, dict(nf=nf, wm=wm, op=ser_op, bias=dict(vgs=vg-vs, vds=vd-vs, vbs=vb-vs))
 
-    def dsn_amp(self, **params):
+    def bias_amp(self, **params):
+        '''
+        Returns:
+            bias_ok: True if the amplifier could be biased and sized at this output common mode
+            bias_info: Bias voltages, unit operating points and initial sizing of the amplifier.
+                Only the databases are queried; no small-signal model is built.
+        '''
         vdd = params['vdd']
         vincm = params['vout']
         voutcm = params['voutcm']
-        iload = params['iload']
         iref = params['iref']
-        iamp_max = params['iamp_max']
-        cload = params['cload']
-        cdecap_max = params['cdecap']
-        rsource = params['rsource']
-        err_max = params['err']
-        psrr_min = params['psrr']
-        psrr_fbw_min = params['psrr_fbw']
-        pm_min = params['pm']
-        loadreg_max = params['loadreg']
-        load_pole = params['load_pole']
         v_res = params['v_res']
-        ser_type = params['ser_type']
-        ser_info = params['ser_info']
         db_dict = params['db_dict']
-        amp_in = 'n'
 
         # Get amplifier load pair parameters
         op_load = db_dict['amp_load'].query(vgs=-(vdd-voutcm), vds=-(vdd-voutcm), vbs=0)
         Vstar_load = op_load['vstar']
 
-        amp_dsn_info = dict()
-
         # Choose amp bias voltages
-        Vstar_in_err = float('inf')
-        vtail = 0
-        op_in = dict()
-        for vtail_i in np.arange(0,min(voutcm,vincm),v_res):
-            op_in_i = db_dict['amp_in'].query(vgs=vincm-vtail_i, vds=voutcm-vtail_i, vbs=-vtail_i)
-            Vstar_in_i = op_in_i['vstar']
-            if Vstar_in_err > abs(Vstar_load-Vstar_in_i) and op_in_i['ibias'] > 0:
-                Vstar_in_err = abs(Vstar_load-Vstar_in_i)
-                vtail = vtail_i
-                op_in = op_in_i
-                Vstar_in = Vstar_in_i
-
-        Vstar_tail_errsq = float('inf')
-        vgtail = 0
-        op_tail = dict()
-        for vgtail_i in np.arange(0,vdd,v_res):
-            op_tail_i = db_dict['amp_tail'].query(vgs=vgtail_i, vds=vtail, vbs=0)
-            Vstar_tail_i = op_tail_i['vstar']
-            if Vstar_tail_errsq > abs(Vstar_load-Vstar_tail_i)**2+abs(Vstar_in-Vstar_tail_i)**2 and op_tail_i['ibias'] > 0:
-                Vstar_tail_errsq = abs(Vstar_load-Vstar_tail_i)**2+abs(Vstar_in-Vstar_tail_i)**2
-                vgtail = vgtail_i
-                op_tail = op_tail_i
-                Vstar_tail = Vstar_tail_i
+        factor = params.get('adaptive', 1)
+        vtail_vec = np.arange(0,min(voutcm,vincm),v_res)
+        def eval_vtail(idx_vec):
+            op_in_vec = query_batch(db_dict['amp_in'], vgs=vincm-vtail_vec[idx_vec],
+                                    vds=voutcm-vtail_vec[idx_vec], vbs=-vtail_vec[idx_vec])
+            Vstar_in_err = np.abs(Vstar_load-op_in_vec['vstar'])
+            return Vstar_in_err, op_in_vec['ibias'] > 0, op_in_vec
+        idx, op_in, n_vtail = grid_argmin(eval_vtail, len(vtail_vec), factor)
+        if idx is None:
+            return False, dict()
+        vtail_idx = idx
+        vtail = vtail_vec[idx]
+        Vstar_in = op_in['vstar']
+
+        vgtail_vec = np.arange(0,vdd,v_res)
+        # The tables are tabulated on these same grids, so they are read by grid index
+        table_dict = params.get('op_table_dict', dict())
+        def eval_vgtail(idx_vec):
+            if 'amp_tail' in table_dict:
+                op_tail_vec = table_dict['amp_tail'].query_index(vtail_idx, idx_vec)
+            else:
+                op_tail_vec = query_batch(db_dict['amp_tail'], vgs=vgtail_vec[idx_vec], vds=vtail, vbs=0)
+            Vstar_tail_errsq = np.abs(Vstar_load-op_tail_vec['vstar'])**2+np.abs(Vstar_in-op_tail_vec['vstar'])**2
+            return Vstar_tail_errsq, op_tail_vec['ibias'] > 0, op_tail_vec
+        idx, op_tail, n_vgtail = grid_argmin(eval_vgtail, len(vgtail_vec), factor)
+        if idx is None:
+            return False, dict()
+        vgtail_idx = idx
+        vgtail = vgtail_vec[idx]
+        grid_skipped = len(vtail_vec) - n_vtail + len(vgtail_vec) - n_vgtail
 
         # Size reference current mirror
-        op_mir = db_dict['amp_mir'].query(vgs=vgtail, vds=vgtail, vbs=0)
+        if 'amp_mir' in table_dict:
+            op_mir = table_dict['amp_mir'].query_index(vgtail_idx)
+        else:
+            op_mir = db_dict['amp_mir'].query(vgs=vgtail, vds=vgtail, vbs=0)
         m_mir = iref/(2*op_mir['ibias'])
         wm_mir = (m_mir%1 + 1)
         nf_mir = 2*int(m_mir)
         if nf_mir == 0:
-            return False, amp_dsn_info
+            return False, dict()
 
         # Size amplifier devices and base current
         Id_tail = wm_mir*op_tail['ibias']
-        wm_tail = wm_mir
         nf_tail = int(2*max(((2*op_load['ibias'])//Id_tail)+1,((2*op_in['ibias'])//Id_tail)+1))
+        # Terminal voltages each unit operating point was queried at
+        bias_dict = {'amp_load' : dict(vgs=-(vdd-voutcm), vds=-(vdd-voutcm), vbs=0),
+                     'amp_in' : dict(vgs=vincm-vtail, vds=voutcm-vtail, vbs=-vtail),
+                     'amp_tail' : dict(vgs=vgtail, vds=vtail, vbs=0),
+                     'amp_mir' : dict(vgs=vgtail, vds=vgtail, vbs=0)}
+        return True, dict(vtail=vtail, vgtail=vgtail, grid_skipped=grid_skipped,
+                          op_load=op_load, op_in=op_in, op_tail=op_tail, op_mir=op_mir,
+                          Id_tail=Id_tail, nf_tail=nf_tail, wm_mir=wm_mir, nf_mir=nf_mir,
+                          bias_dict=bias_dict)
+
+    def bound_vg(self, **params):
+        '''
+        Returns:
+            reason: 'iamp' if the amplifier load pair biased at series gate bias vg already
+                shows the amplifier current reaches the incumbent, or None
+        '''
+        vdd = params['vdd']
+        vg = params['vg']
+        iamp_max = params['iamp_max']
+        db_dict = params['db_dict']
+
+        # Exact bound: bias_amp sizes the tail to nf_tail >= 2*(2*Iload//Id_tail + 1) with the
+        # load pair at voutcm = vg, so the tail carries more than 4*Iload on every design path,
+        # and bound_amp would reject the candidate anyway. Only the load pair is queried
+        op_load = db_dict['amp_load'].query(vgs=-(vdd-vg), vds=-(vdd-vg), vbs=0)
+        if 4*op_load['ibias'] >= iamp_max:
+            return 'iamp'
+        return None
+
+    def bound_amp(self, **params):
+        '''
+        Returns:
+            reason: 'iamp' if the initial amplifier current already reaches the incumbent, or None
+        '''
+        iamp_max = params['iamp_max']
+        bias_info = params['bias_info']
+
+        # Every design path starts from the initial tail sizing and only grows it
+        if bias_info['Id_tail']*bias_info['nf_tail'] >= iamp_max:
+            return 'iamp'
+        return None
+
+    def dsn_amp(self, **params):
+        vincm = params['vout']
+        iload = params['iload']
+        iamp_max = params['iamp_max']
+        cload = params['cload']
+        cdecap_max = params['cdecap']
+        rsource = params['rsource']
+        err_max = params['err']
+        psrr_min = params['psrr']
+        psrr_fbw_min = params['psrr_fbw']
+        pm_min = params['pm']
+        loadreg_max = params['loadreg']
+        droop_max = params.get('droop')
+        load_pole = params['load_pole']
+        ser_type = params['ser_type']
+        ser_info = params['ser_info']
+        ss_model = params.get('ss_model', 'mna')
+        cdecap_rtol = params.get('cdecap_rtol', 1e-2)
+        tail_search = params.get('tail_search', 'bracket')
+        cdecap_search = params.get('cdecap_search', 'bisect')
+        amp_in = 'n'
+
+        if 'bias_info' in params:
+            bias_info = params['bias_info']
+        else:
+            bias_ok, bias_info = self.bias_amp(**params)
+            if not bias_ok:
+                return False, dict()
+        op_load = bias_info['op_load']
+        op_in = bias_info['op_in']
+        op_tail = bias_info['op_tail']
+        op_mir = bias_info['op_mir']
+        Id_tail = bias_info['Id_tail']
+        nf_tail = bias_info['nf_tail']
+        wm_mir = bias_info['wm_mir']
+        nf_mir = bias_info['nf_mir']
+
+        amp_dsn_info = dict()
+        wm_tail = wm_mir
+        # The droop settles to the load regulation, so a design whose load regulation
+        # misses the droop spec is rejected without a step response
+        droop_ok = lambda droop: droop_max is None or droop < droop_max
+        loadreg_lim = loadreg_max if droop_max is None else min(loadreg_max, droop_max)
         if Id_tail*nf_tail > iamp_max:
             return False, amp_dsn_info
 
@@ -166,12 +360,19 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         wm_in = (m_in/2)%1 + 1
         nf_in = 2*int(m_in/2)
 
-        # Resize op and format parameters
-        op_dict = {'amp_in' : self.resize_op(op_in, wm_in),
-                   'amp_tail' : self.resize_op(op_tail, wm_tail),
-                   'amp_load' : self.resize_op(op_load, wm_tail),
-                   'amp_mir' : self.resize_op(op_mir, wm_mir),
-                   'ser' : ser_info['op']}
+        # Resize op and format parameters. The unit operating points are packed
+        # once so every resizing below is a single array multiplication
+        unit_ops = OpGroup.from_ops({'amp_in' : op_in,
+                                     'amp_tail' : op_tail,
+                                     'amp_load' : op_load,
+                                     'amp_mir' : op_mir,
+                                     'ser' : ser_info['op']})
+        wm_op = {'amp_in' : wm_in,
+                 'amp_tail' : wm_tail,
+                 'amp_load' : wm_tail,
+                 'amp_mir' : wm_mir,
+                 'ser' : 1}
+        op_dict = unit_ops.scale(wm_op)
         nf_dict = {'amp_in' : nf_in,
                    'amp_tail' : nf_tail,
                    'amp_load' : nf_load,
@@ -183,93 +384,192 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
                    'amp_mir' : wm_mir,
                    'ser' : ser_info['wm']}
 
-        A = abs(self._get_loopgain_lti(op_dict, nf_dict, ser_type, amp_in, rsource))
+        ss = self._get_ss_model(op_dict, nf_dict, ser_type, amp_in, rsource, ss_model)
+        A = abs(ss.get_loopgain())
         dc_err = 1/(A+1)
-        loadreg = self._get_loadreg_lti(op_dict, nf_dict, ser_type, amp_in, cload, 0, rsource, vincm, iload)
-        psrr, psrr_fbw = self._get_psrr_lti(op_dict, nf_dict, ser_type, amp_in, cload, 0, rsource)
-        pm = self._get_stb_lti(op_dict, nf_dict, ser_type, amp_in, cload, 0, rsource)
-        if pm > pm_min and psrr > psrr_min and psrr_fbw > psrr_fbw_min and loadreg < loadreg_max and dc_err < err_max and Id_tail*nf_tail < iamp_max and not load_pole:
-            amp_dsn_info.update(dict(op_dict=op_dict,nf_dict=nf_dict,wm_dict=wm_dict))
+        loadreg = ss.get_loadreg(cload, 0, vincm, iload)
+        psrr, psrr_fbw = _get_psrr(ss, cload, 0)
+        pm = ss.get_stb(cload, 0)
+        droop = None
+        spec_met = pm > pm_min and psrr > psrr_min and psrr_fbw > psrr_fbw_min and loadreg < loadreg_lim and dc_err < err_max and Id_tail*nf_tail < iamp_max and not load_pole
+        if spec_met and droop_max is not None:
+            droop = ss.get_droop(cload, 0, vincm, iload)
+            spec_met = droop_ok(droop)
+        if spec_met:
+            amp_dsn_info.update(dict(op_dict=op_dict.to_dict(),nf_dict=nf_dict,wm_dict=wm_dict))
             amp_dsn_info.update(cap_dict=dict(cdecap_amp=0, cdecap_load=0))
             amp_dsn_info.update(dict(loadreg=loadreg, psrr=psrr, psrr_fbw=psrr_fbw, pm=pm, err=dc_err, ibias=Id_tail*nf_tail))
+            if droop is not None:
+                amp_dsn_info.update(droop=droop)
             return True, amp_dsn_info
         if psrr_fbw > psrr_fbw_min and Id_tail*nf_tail < iamp_max and not load_pole:
             # Find minimum decap necessary with dominant amplifier pole
+            # Only the phase margin depends on the decap, and it improves with it
             cdecap_min = ser_info['op']['cgg']*ser_info['nf']
-            for cdecap_amp in np.logspace(np.log10(cdecap_min),np.log10(cdecap_max),100):
-                loadreg = self._get_loadreg_lti(op_dict, nf_dict, ser_type, amp_in, cload, cdecap_amp, rsource, vincm, iload)
-                psrr, psrr_fbw = self._get_psrr_lti(op_dict, nf_dict, ser_type, amp_in, cload, 0, rsource)
-                pm = self._get_stb_lti(op_dict, nf_dict, ser_type, amp_in, cload, cdecap_amp, rsource)
-                if psrr_fbw < psrr_fbw_min:
-                    break
-                if pm > pm_min and psrr > psrr_min and psrr_fbw > psrr_fbw_min and loadreg < loadreg_max and dc_err < err_max:
-                    amp_dsn_info.update(dict(op_dict=op_dict,nf_dict=nf_dict,wm_dict=wm_dict))
+            if psrr > psrr_min and loadreg < loadreg_lim and dc_err < err_max:
+                if cdecap_search == 'batch':
+                    if ss_model == 'mna':
+                        # The whole decap grid is one family of the same stamped model
+                        stb_passes = lambda c_vec: ss.batch.get_stb(cload, c_vec, grid=True) > pm_min
+                    else:
+                        stb_passes = lambda c_vec: np.array([ss.get_stb(cload, c) > pm_min for c in c_vec])
+                    cdecap_amp, n_eval = grid_min_log(stb_passes, cdecap_min, cdecap_max, cdecap_rtol)
+                else:
+                    cdecap_amp, n_eval = bisect_min_log(lambda c: ss.get_stb(cload, c) > pm_min,
+                                                        cdecap_min, cdecap_max, cdecap_rtol)
+                print(f'Decap search: {n_eval} evaluations')
+                # A design too slow for the droop spec falls through to a larger tail
+                if cdecap_amp is not None and droop_max is not None:
+                    droop = ss.get_droop(cload, cdecap_amp, vincm, iload)
+                if cdecap_amp is not None and droop_ok(droop):
+                    loadreg = ss.get_loadreg(cload, cdecap_amp, vincm, iload)
+                    pm = ss.get_stb(cload, cdecap_amp)
+                    amp_dsn_info.update(dict(op_dict=op_dict.to_dict(),nf_dict=nf_dict,wm_dict=wm_dict))
                     amp_dsn_info.update(cap_dict=dict(cdecap_amp=cdecap_amp, cdecap_load=0))
                     amp_dsn_info.update(dict(loadreg=loadreg, psrr=psrr, psrr_fbw=psrr_fbw, pm=pm, err=dc_err, ibias=Id_tail*nf_tail))
+                    amp_dsn_info.update(n_cdecap_eval=n_eval)
+                    if droop is not None:
+                        amp_dsn_info.update(droop=droop)
                     return True, amp_dsn_info
-        if psrr > psrr_min and loadreg < loadreg_max:
-            pm = 0
-            psrr_fbw = 0
-            while (pm < pm_min or psrr_fbw < psrr_fbw_min) and Id_tail*nf_tail < iamp_max:
-                # Resize amp parameters
-                Id_load = Id_tail*nf_tail/2
+        if psrr > psrr_min and loadreg < loadreg_lim:
+            # Grow the tail until the decap-loaded output pole gives enough phase
+            # margin and supply rejection bandwidth. Both improve with the tail
+            # current, so the smallest passing even finger count is bracketed
+            # and bisected rather than walked two fingers at a time. So does the
+            # load step response, which speeds up with the amplifier.
+            tail_table = dict()
+            def size_tail_batch(nf_vec):
+                # Resize amp parameters for all finger counts at once
+                nf_vec = np.asarray(nf_vec)
+                Id_load = Id_tail*nf_vec/2
 
                 m_load = Id_load/op_load['ibias']
                 wm_load = (m_load/2)%1 + 1
-                nf_load = 2*int(m_load/2)
+                nf_load = 2*(m_load/2).astype(int)
 
                 m_in = Id_load/op_in['ibias']
                 wm_in = (m_in/2)%1 + 1
-                nf_in = 2*int(m_in/2)
-
-                op_dict.update({'amp_in' : self.resize_op(op_in, wm_in),
-                                'amp_tail' : self.resize_op(op_tail, wm_tail),
-                                'amp_load' : self.resize_op(op_load, wm_tail)})
-                nf_dict.update({'amp_in' : nf_in,
-                                'amp_tail' : nf_tail,
-                                'amp_load' : nf_load})
-                wm_dict.update({'amp_in' : wm_in,
-                                'amp_tail' : wm_tail,
-                                'amp_load' : wm_load})
-                loadreg = self._get_loadreg_lti(op_dict, nf_dict, ser_type, amp_in, cload+cdecap_max, 0, rsource, vincm, iload)
-                psrr, psrr_fbw = self._get_psrr_lti(op_dict, nf_dict, ser_type, amp_in, cload+cdecap_max, 0, rsource)
-                pm = self._get_stb_lti(op_dict, nf_dict, ser_type, amp_in, cload+cdecap_max, 0, rsource)
-                nf_tail += 2
-            amp_dsn_info.update(dict(op_dict=op_dict,nf_dict=nf_dict,wm_dict=wm_dict))
+                nf_in = 2*(m_in/2).astype(int)
+
+                nf_nf_list = [dict(nf_dict, amp_in=int(nf_in[idx]), amp_tail=int(nf_vec[idx]),
+                                   amp_load=int(nf_load[idx])) for idx in range(len(nf_vec))]
+                nf_wm_list = [dict(wm_dict, amp_in=float(wm_in[idx]), amp_tail=wm_tail, amp_load=float(wm_load[idx]))
+                              for idx in range(len(nf_vec))]
+                nf_op_list = [unit_ops.scale(dict(wm_op, amp_in=wm_in[idx])) for idx in range(len(nf_vec))]
+                if ss_model == 'mna':
+                    # One batched model evaluates every finger count
+                    ss = LDOSmallSignalBatch(dict(op_dict, amp_in=self.resize_op(op_in, wm_in)),
+                                             dict(nf_dict, amp_in=nf_in, amp_tail=nf_vec, amp_load=nf_load),
+                                             ser_type, amp_in, rsource)
+                    loadreg = ss.get_loadreg(cload+cdecap_max, 0, vincm, iload)
+                    psrr, psrr_fbw = _get_psrr(ss, cload+cdecap_max, 0)
+                    pm = ss.get_stb(cload+cdecap_max, 0)
+                    droop = [None]*len(nf_vec) if droop_max is None else ss.get_droop(cload+cdecap_max, 0, vincm, iload)
+                else:
+                    loadreg, psrr, psrr_fbw, pm, droop = [], [], [], [], []
+                    for nf_op_dict, nf_nf_dict in zip(nf_op_list, nf_nf_list):
+                        ss = self._get_ss_model(nf_op_dict, nf_nf_dict, ser_type, amp_in, rsource, ss_model)
+                        loadreg.append(ss.get_loadreg(cload+cdecap_max, 0, vincm, iload))
+                        psrr_nf, psrr_fbw_nf = _get_psrr(ss, cload+cdecap_max, 0)
+                        psrr.append(psrr_nf)
+                        psrr_fbw.append(psrr_fbw_nf)
+                        pm.append(ss.get_stb(cload+cdecap_max, 0))
+                        droop.append(None if droop_max is None else ss.get_droop(cload+cdecap_max, 0, vincm, iload))
+                for idx, nf in enumerate(nf_vec):
+                    tail_table[int(nf)] = (nf_op_list[idx], nf_nf_list[idx], nf_wm_list[idx],
+                                           loadreg[idx], psrr[idx], psrr_fbw[idx], pm[idx], droop[idx])
+
+            def size_tail(nf_tail):
+                if nf_tail not in tail_table:
+                    size_tail_batch([nf_tail])
+                return tail_table[nf_tail]
+
+            def tail_passes(nf_tail):
+                _, _, _, _, _, psrr_fbw, pm, droop = size_tail(nf_tail)
+                return pm >= pm_min and psrr_fbw >= psrr_fbw_min and droop_ok(droop)
+
+            # Largest even finger count still below the current budget
+            nf_max = nf_tail + 2*max(int(np.ceil((iamp_max/Id_tail - nf_tail)/2)) - 1, -1)
+            while Id_tail*(nf_max+2) < iamp_max:
+                nf_max += 2
+            while nf_max >= nf_tail and Id_tail*nf_max >= iamp_max:
+                nf_max -= 2
+
+            if tail_search == 'linear':
+                # Walk in batches, stopping at the first batch with a passing count
+                nf_best = None
+                for nf_start in range(nf_tail, nf_max+1, 2*_TAIL_BATCH):
+                    nf_vec = np.arange(nf_start, min(nf_start+2*_TAIL_BATCH, nf_max+1), 2)
+                    size_tail_batch(nf_vec)
+                    nf_best = next((int(nf) for nf in nf_vec if tail_passes(int(nf))), None)
+                    if nf_best is not None:
+                        break
+                n_eval = len(tail_table)
+            else:
+                # Bracket and bisect the even finger counts, from the hint if there is one
+                nf_tail_hint = params.get('nf_tail_hint')
+                engine = SweepEngine(dict(nf_tail=np.arange(nf_tail, nf_max+1, 2)),
+                                     lambda point, bound: (tail_passes(int(point['nf_tail'])), point),
+                                     cost_key='nf_tail', strategy='bisect',
+                                     center=None if nf_tail_hint is None else dict(nf_tail=nf_tail_hint))
+                nf_best = None if engine.run() is None else int(engine.best_point['nf_tail'])
+                n_eval = engine.stats['designed']
+            print(f'Tail search: {n_eval} evaluations')
+            if nf_best is None:
+                nf_best = nf_max
+            if nf_best >= nf_tail:
+                op_dict, nf_dict, wm_dict, loadreg, psrr, psrr_fbw, pm, droop = size_tail(nf_best)
+            else:
+                pm = 0
+                psrr_fbw = 0
+                droop = None if droop_max is None else float('inf')
+            amp_dsn_info.update(dict(op_dict=op_dict.to_dict(),nf_dict=nf_dict,wm_dict=wm_dict))
             amp_dsn_info.update(cap_dict=dict(cdecap_amp=0, cdecap_load=cdecap_max))
             amp_dsn_info.update(dict(loadreg=loadreg, psrr=psrr, psrr_fbw=psrr_fbw, pm=pm, err=dc_err, ibias=Id_tail*nf_dict['amp_tail']))
-            spec_met = pm > pm_min and psrr > psrr_min and psrr_fbw > psrr_fbw_min and loadreg < loadreg_max and dc_err < err_max and Id_tail*nf_dict['amp_tail'] < iamp_max
+            amp_dsn_info.update(n_nf_tail_eval=n_eval)
+            if droop is not None:
+                amp_dsn_info.update(droop=float(droop))
+            spec_met = pm > pm_min and psrr > psrr_min and psrr_fbw > psrr_fbw_min and loadreg < loadreg_max and dc_err < err_max and Id_tail*nf_dict['amp_tail'] < iamp_max and droop_ok(droop)
             return spec_met, amp_dsn_info
         else:
+            # Keep the metrics of the rejected design for the candidate log
+            amp_dsn_info.update(dict(nf_dict=nf_dict, wm_dict=wm_dict))
+            amp_dsn_info.update(dict(loadreg=loadreg, psrr=psrr, psrr_fbw=psrr_fbw, pm=pm, err=dc_err, ibias=Id_tail*nf_tail))
             return False, amp_dsn_info
 
 
     def meet_spec(self, **params) -> List[Mapping[str,Any]]:
+        if not isinstance(params['ser_type'], str):
+            return [self._meet_spec_multi(list(params['ser_type']), params)]
+        params = _get_ser_params(params, params['ser_type'])
         specfile_dict = params['specfile_dict']
         th_dict = params['th_dict']
         l_dict = params['l_dict']
         sim_env = params['sim_env']
 
-        db_dict = {k:get_mos_db(spec_file=specfile_dict[k],
-                                intent=th_dict[k],
-                                sim_env=sim_env) for k in specfile_dict.keys()}
-        params.update(dict(db_dict=db_dict))
+        checkpoint = None
+        if params.get('checkpoint', ''):
+            checkpoint = SweepCheckpoint(params['checkpoint'], SweepCheckpoint.get_fingerprint(params),
+                                         params.get('checkpoint_interval', 60))
+        ckpt_state = checkpoint.load() if checkpoint is not None and params.get('resume', False) else None
+
+        # Size at the first simulation environment and check the design at the others
+        sim_env_list = [sim_env] if isinstance(sim_env, str) else list(sim_env)
+        with stage('load_db'):
+            if len(sim_env_list) > 1:
+                corner_db_dict = get_db_cache().get_corner_db_dicts(specfile_dict, th_dict, sim_env_list)
+                corner_db_dict = {env:wrap_db_dict(corner_db_dict[env]) for env in sim_env_list}
+            else:
+                corner_db_dict = {sim_env_list[0]: wrap_db_dict(get_db_cache().get_db_dict(specfile_dict, th_dict, sim_env_list[0]))}
+        db_dict = corner_db_dict.pop(sim_env_list[0])
+        params.update(dict(db_dict=db_dict, sim_env=sim_env_list[0], corner_db_dict=corner_db_dict,
+                           iamp_spec=params.get('iamp_spec', params['iamp_max'])))
 
         ser_type = params['ser_type']
         vdd = params['vdd']
         vout = params['vout']
-        iload = params['iload']
-        iref = params['iref']
         iamp_max = params['iamp_max']
         cload = params['cload']
-        cdecap_max = params['cdecap']
-        rsource = params['rsource']
-        err_max = params['err']
-        psrr_min = params['psrr']
-        psrr_fbw_min = params['psrr_fbw']
-        pm_min = params['pm']
-        loadreg_max = params['loadreg']
-        load_pole = params['load_pole']
         v_res = params['v_res']
 
         vth_ser = estimate_vth(db=db_dict['ser'],
@@ -294,6 +594,13 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
 
         w_dict = {k:db.width_list[0] for k,db in db_dict.items()}
 
+        # The tail and mirror bias grids of bias_amp do not depend on the series gate
+        # bias, so their operating points are tabulated once for the whole sweep
+        vtail_grid = np.arange(0,vout,v_res)
+        vgtail_grid = np.arange(0,vdd,v_res)
+        params['op_table_dict'] = dict(amp_tail=OpTable(db_dict['amp_tail'], (vtail_grid, vgtail_grid), _get_tail_bias),
+                                       amp_mir=OpTable(db_dict['amp_mir'], (vgtail_grid,), _get_mir_bias))
+
         self.other_params = dict(l_dict=l_dict,
                                  w_dict=w_dict,
                                  th_dict=th_dict,
@@ -305,41 +612,471 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         vg_max = min(vdd+vth_ser, vdd)
         vg_vec = np.arange(vg_min, vg_max, v_res)
 
-        for vg in vg_vec:
-            print('Designing the series device...')
-            # Size the series device
-            match_ser, ser_info = self.dsn_fet(vg=vg, **params)
-            if not match_ser:
-                continue
-            print('Done')
-
-            # Design amplifier s.t. output bias = gate voltage
-            # This is to maintain accuracy in the computational design proces
-            print('Designing the amplifier...')
-
-            params.update(dict(voutcm=vg,
-                               iamp_max=iamp_max,
-                               ser_info=ser_info))
-            spec_met, amp_dsn_info = self.dsn_amp(**params)
-            print('Done')
+        n_workers = params.get('n_workers', 1)
+        # Designs costlier than the incumbent can still be on the trade-off curve,
+        # so they are only pruned against the current spec in Pareto mode
+        if params.get('pareto', False):
+            self.pareto_front = ParetoArchive(_PARETO_OBJECTIVES, params.get('pareto_size', 50))
+        else:
+            self.pareto_front = None
+        self.bound_stats = dict(iamp=0)
+        self.grid_stats = dict(vg=0, bias=0)
+        self.corner_stats = {env:0 for env in corner_db_dict.keys()}
+        adaptive = params.get('adaptive', 1)
+
+        # Search outward from a previous solution, so that a design near it sets a
+        # tight bound early. Ties are broken towards the lower vg as in an in-order sweep
+        warm_op = _load_warm_start(params.get('warm_start'))
+        if warm_op is not None and warm_op.get('type_dict', dict()).get('ser', ser_type) != ser_type:
+            warnings.warn(f'Ignoring warm start with a series device of type {warm_op["type_dict"]["ser"]}')
+            warm_op = None
+        if warm_op is not None:
+            params['nf_tail_hint'] = warm_op['nf_dict']['amp_tail']
+            print(f'Warm start from vg = {warm_op["vg"]:.4g} V (ibias = {warm_op["ibias"]:.4g} A)')
+
+        dsn_dict = dict(w_dict=w_dict, l_dict=l_dict, th_dict=th_dict, type_dict=type_dict)
+        engine = SweepEngine(dict(vg=vg_vec), functools.partial(self._design_vg, params, dsn_dict),
+                             bound=iamp_max, cost_key='ibias',
+                             strategy='adaptive' if adaptive > 1 else 'grid', factor=adaptive,
+                             rtol=params.get('adaptive_tol', 0.05), share_bound=self.pareto_front is None,
+                             n_workers=n_workers, center=None if warm_op is None else dict(vg=warm_op['vg']),
+                             archive=self.pareto_front, get_archive_item=self._get_pareto_item,
+                             worker_init=disable_print, progress_interval=params.get('progress_interval'),
+                             prune=functools.partial(self._prune_vg, params))
+        log_size = None
+        if ckpt_state is not None:
+            print(f'Resuming from checkpoint {checkpoint.fname}')
+            extra = ckpt_state['extra']
+            # Adaptive sweeps merge every design again instead
+            if adaptive <= 1:
+                self.bound_stats, self.grid_stats, self.corner_stats = extra['stats']
+            log_size = extra['log_size']
+
+        def on_result(point, spec_met, amp_dsn_info, is_best):
+            if 'pruned' in amp_dsn_info:
+                self.bound_stats[amp_dsn_info['pruned']] += 1
+            self.grid_stats['bias'] += amp_dsn_info.get('grid_skipped', 0)
+            if 'corner_failed' in amp_dsn_info:
+                self.corner_stats[amp_dsn_info['corner_failed']] += 1
+            if cand_log is not None:
+                reason = 'not_best' if spec_met and not is_best else amp_dsn_info.get('reject')
+                if 'pruned' in amp_dsn_info:
+                    # Candidates pruned by bound_vg are not designed, so they only carry the bound
+                    reason = f'bound_{amp_dsn_info["pruned"]}'
+                cand_log.append(self._get_log_record(point['vg'], ser_type, amp_dsn_info, reason))
+
+        cand_log = None
+        if params.get('candidate_log', ''):
+            # Records of candidates after the checkpoint are dropped, as they are designed again
+            cand_log = CandidateLog(params['candidate_log'], size=log_size)
+        get_extra_state = lambda: dict(stats=(self.bound_stats, self.grid_stats, self.corner_stats),
+                                       log_size=None if cand_log is None else cand_log.flush())
+        try:
+            best_info = engine.run(on_result, checkpoint=checkpoint, ckpt_state=ckpt_state,
+                                   get_extra_state=get_extra_state)
+        finally:
+            if cand_log is not None:
+                cand_log.close()
+        if best_info is not None:
+            best_op.update(best_info)
+        self.pareto_front = engine.archive
+        self.grid_stats['vg'] += engine.stats['skipped']
+        print(f'Designed {engine.stats["designed"]} of {engine.num_points} series gate biases '
+              f'in {engine.stats["time"]:.3f} s')
+        if checkpoint is not None:
+            print(f'Saved {checkpoint.num_saves} checkpoints in {checkpoint.save_time:.3f} s')
+            # A multi-type run resumes its finished types from their checkpoints
+            if not params.get('keep_checkpoint', False):
+                checkpoint.remove()
+
+        self._check_best(best_op, params)
+
+        print(f'Bound stage pruned {sum(self.bound_stats.values())} of {len(vg_vec)} candidates: {self.bound_stats}')
+        if corner_db_dict:
+            print(f'Corner checks rejected {sum(self.corner_stats.values())} candidates: {self.corner_stats}')
+        if adaptive > 1:
+            print(f'Adaptive sweep skipped {self.grid_stats["vg"]} series gate and {self.grid_stats["bias"]} amplifier bias grid points')
+        if self.pareto_front is not None:
+            best_op['pareto'] = sorted(self.pareto_front, key=lambda info: info['ibias'])
+            print(f'Pareto front: {len(self.pareto_front)} designs ({self.pareto_front.num_evict} evicted)')
+        return [best_op]
 
-            if not spec_met:
-                print('Amp specs not met.')
-                continue
+    def _meet_spec_multi(self, ser_type_list, params):
+        '''
+        Returns:
+            best_op: Best design over the series device types in ser_type_list, with the
+                best design of each type in best_op["ser_results"]. The types are designed
+                in turn, each against the amplifier current of the best design so far, so a
+                type only reports a design that improves on the earlier ones. The transistor
+                database cache is shared, so the amplifier databases are loaded once.
+                Each type checkpoints to its own file, kept until every type is designed,
+                so a resumed run does not design the finished types again.
+        '''
+        if not ser_type_list:
+            raise ValueError('ser_type must list at least one series device type')
+        # Design the type of the warm start first, so that it sets the bound
+        warm_op = _load_warm_start(params.get('warm_start'))
+        warm_type = None if warm_op is None else warm_op.get('type_dict', dict()).get('ser')
+        ser_type_list.sort(key=lambda ser_type: ser_type != warm_type)
+        pareto = params.get('pareto', False)
+
+        best_op, best_params, best_other = None, None, None
+        ser_results = dict()
+        pareto_list = []
+        ckpt_list = []
+        for ser_type in ser_type_list:
+            print(f'Designing with series device type {ser_type}...')
+            ser_params = _get_ser_params(params, ser_type)
+            ser_params.update(iamp_spec=params['iamp_max'], mc_samples=0, lti_check=False,
+                              warm_start=warm_op if ser_type == warm_type else None)
+            # Pareto mode keeps the designs of every type that meet spec
+            if not pareto and best_op is not None and 'op_dict' in best_op:
+                ser_params['iamp_max'] = best_op['ibias']
+            if params.get('checkpoint', ''):
+                ckpt_path = Path(params['checkpoint'])
+                ser_params['checkpoint'] = str(ckpt_path.with_name(f'{ckpt_path.stem}_{ser_type}{ckpt_path.suffix}'))
+                ser_params['keep_checkpoint'] = True
+                ckpt_list.append(SweepCheckpoint(ser_params['checkpoint'], ''))
+            op = self.meet_spec(**ser_params)[0]
+            ser_results[ser_type] = dict({k:op[k] for k in ('ibias', 'err', 'psrr', 'psrr_fbw', 'pm', 'loadreg', 'droop')
+                                          if k in op}, iamp_max=ser_params['iamp_max'])
+            if 'op_dict' in op:
+                print(f'Series device type {ser_type}: ibias = {op["ibias"]:.4g} A')
             else:
-                print('AMP SPECS MET.')
+                print(f'Series device type {ser_type}: no design below {ser_params["iamp_max"]:.4g} A')
+            pareto_list.extend(dict(info, ser_type=ser_type) for info in op.get('pareto', []))
+            if best_op is None or ('op_dict' in op and ('op_dict' not in best_op or op['ibias'] < best_op['ibias'])):
+                best_op, best_params, best_other = op, ser_params, self.other_params
+        self.other_params = best_other
+        for checkpoint in ckpt_list:
+            checkpoint.remove()
+
+        best_op.update(ser_results=ser_results)
+        if 'op_dict' in best_op:
+            print(f'Best series device type: {best_op["type_dict"]["ser"]}')
+        if pareto:
+            self.pareto_front = ParetoArchive(_PARETO_OBJECTIVES, params.get('pareto_size', 50))
+            for info in pareto_list:
+                self.pareto_front.add(info, info)
+            best_op['pareto'] = sorted(self.pareto_front, key=lambda info: info['ibias'])
+        self._check_best(best_op, dict(best_params, mc_samples=params.get('mc_samples', 0),
+                                       lti_check=params.get('lti_check', False)))
+        return best_op
+
+    def _check_best(self, best_op, params):
+        '''
+        Runs the requested checks of the chosen design: the LTICircuit comparison into
+        best_op["lti_check"] and the Monte Carlo mismatch analysis into best_op["mc"]
+        '''
+        if params.get('lti_check', False) and 'op_dict' in best_op:
+            best_op['lti_check'] = self._check_lti(best_op, params)
+        if params.get('mc_samples', 0) > 0 and 'op_dict' in best_op:
+            with stage('monte_carlo'):
+                best_op['mc'] = self.monte_carlo(best_op, **params)
+            print(f'Monte Carlo yield: {best_op["mc"]["yield"]:.4f} of {best_op["mc"]["num"]} samples '
+                  f'(offset std {best_op["mc"]["offset"]["std"]:.4g} V)')
+
+    def check_corners(self, amp_dsn_info, **params):
+        '''
+        Returns:
+            failed: First simulation environment in params['corner_db_dict'] at which the
+                design in amp_dsn_info misses spec, or None if it meets spec at all of them
+            corner_dict: Metrics of the design at its design corner and each corner checked
+        Every device keeps the sizing and terminal voltages of the design corner,
+        and is re-queried in each corner's databases.
+        '''
+        err_max = params['err']
+        psrr_min = params['psrr']
+        psrr_fbw_min = params['psrr_fbw']
+        pm_min = params['pm']
+        loadreg_max = params['loadreg']
+        iamp_max = params.get('iamp_spec', params['iamp_max'])
+        ser_info = params['ser_info']
+        nf_dict = amp_dsn_info['nf_dict']
+        wm_dict = amp_dsn_info['wm_dict']
+        cap_dict = amp_dsn_info['cap_dict']
+        cload = params['cload'] + cap_dict['cdecap_load']
+        cdecap_amp = cap_dict['cdecap_amp']
+        bias_dict = dict(params['bias_info']['bias_dict'], ser=ser_info['bias'])
+        # Same multipliers as the design corner's operating points in dsn_amp
+        wm_op = {'amp_in' : wm_dict['amp_in'],
+                 'amp_tail' : wm_dict['amp_tail'],
+                 'amp_load' : wm_dict['amp_tail'],
+                 'amp_mir' : wm_dict['amp_mir'],
+                 'ser' : ser_info['wm']}
+
+        droop_max = params.get('droop')
+        corner_dict = {params['sim_env']: {k:amp_dsn_info[k] for k in ('ibias', 'err', 'psrr', 'psrr_fbw', 'pm', 'loadreg', 'droop')
+                                           if k in amp_dsn_info}}
+        for sim_env, db_dict in params['corner_db_dict'].items():
+            unit_ops = OpGroup.from_ops({k:db_dict[k].query(**bias) for k,bias in bias_dict.items()})
+            ss = self._get_ss_model(unit_ops.scale(wm_op), nf_dict, params['ser_type'], 'n',
+                                    params['rsource'], params.get('ss_model', 'mna'))
+            psrr, psrr_fbw = _get_psrr(ss, cload, cdecap_amp)
+            info = dict(ibias=wm_dict['amp_mir']*unit_ops['amp_tail']['ibias']*nf_dict['amp_tail'],
+                        err=1/(abs(ss.get_loopgain())+1),
+                        psrr=psrr,
+                        psrr_fbw=psrr_fbw,
+                        pm=ss.get_stb(cload, cdecap_amp),
+                        loadreg=ss.get_loadreg(cload, cdecap_amp, params['vout'], params['iload']))
+            corner_dict[sim_env] = info
+            if not (info['pm'] > pm_min and info['psrr'] > psrr_min and info['psrr_fbw'] > psrr_fbw_min and
+                    info['loadreg'] < loadreg_max and info['err'] < err_max and info['ibias'] < iamp_max):
+                return sim_env, corner_dict
+            if droop_max is not None:
+                info['droop'] = ss.get_droop(cload, cdecap_amp, params['vout'], params['iload'])
+                if info['droop'] >= droop_max:
+                    return sim_env, corner_dict
+        return None, corner_dict
+
+    def monte_carlo(self, op, **params):
+        '''
+        Returns:
+            mc_info: Mismatch statistics of design op over params['mc_samples'] samples:
+                the yield of all specs together, the mean and standard deviation of the
+                output offset, and the mean, standard deviation, extremes and yield of each metric
+        Threshold voltage and current factor mismatch of the amplifier devices follow
+        Pelgrom's law. The halves of the input and load pairs mismatch against each
+        other, and the tail against the reference mirror, which scales the amplifier
+        current and, to first order, the conductances of every amplifier device.
+        The samples are evaluated as stacks of small-signal models.
+        '''
+        num = params['mc_samples']
+        avt = params.get('mc_avt', 3.5e-9)
+        abeta = params.get('mc_abeta', 1e-8)
+        vout = params['vout']
+        iload = params['iload']
+        op_dict = op['op_dict']
+        nf_dict = op['nf_dict']
+        cload = params['cload'] + op['cap_dict']['cdecap_load']
+        cdecap_amp = op['cap_dict']['cdecap_amp']
+        spec_dict = dict(ibias=(params.get('iamp_spec', params['iamp_max']), 'max'),
+                         err=(params['err'], 'max'),
+                         psrr=(params['psrr'], 'min'),
+                         psrr_fbw=(params['psrr_fbw'], 'min'),
+                         pm=(params['pm'], 'min'),
+                         loadreg=(params['loadreg'], 'max'))
+        if params.get('droop') is not None:
+            spec_dict['droop'] = (params['droop'], 'max')
+
+        # Gate area of each transistor instance, and of the reference mirror
+        area = {dev:op['w_dict'][dev]*op['wm_dict'][dev]*nf_dict[dev]*op['l_dict'][dev]
+                for dev in ('amp_in', 'amp_load', 'amp_tail', 'amp_mir')}
+        inst_list = get_instances(params['ser_type'], 'n')
+        sigma_inst = np.array([np.array([avt, abeta])/np.sqrt(area[inst[0]]) if inst[0] in area else [0, 0]
+                               for inst in inst_list])
+        sigma_mir = np.array([avt, abeta])/np.sqrt(area['amp_mir'])
+        tail_idx = [inst[0] for inst in inst_list].index('amp_tail')
+        gm_id_tail = op_dict['amp_tail']['gm']/op_dict['amp_tail']['ibias']
+
+        rng = np.random.default_rng(params.get('mc_seed', 0))
+        dvth = rng.standard_normal((num, len(inst_list)))*sigma_inst[:, 0]
+        dbeta = rng.standard_normal((num, len(inst_list)))*sigma_inst[:, 1]
+        dvth_mir, dbeta_mir = (rng.standard_normal((num, 2))*sigma_mir).T
+        # Tail current relative to nominal, as mirrored from the reference
+        dvth[:, tail_idx] -= dvth_mir
+        dbeta[:, tail_idx] -= dbeta_mir
+        cur_scale = 1 + dbeta[:, tail_idx] - gm_id_tail*dvth[:, tail_idx]
+        inst_scale = np.where(sigma_inst[:, 0] > 0, (1 + dbeta)*cur_scale[:, np.newaxis], 1)
+        inst_scale[:, tail_idx] = cur_scale
+
+        metric_dict = {k:np.empty(num) for k in list(spec_dict.keys()) + ['offset']}
+        for start in range(0, num, _MC_BATCH):
+            sl = slice(start, min(start+_MC_BATCH, num))
+            ss = LDOSmallSignalBatch(op_dict, nf_dict, params['ser_type'], 'n', params['rsource'],
+                                     inst_scale=inst_scale[sl])
+            offset = ss.get_dc_shift(dvth[sl])
+            # The finite loop gain alone leaves the output below target
+            metric_dict['offset'][sl] = offset
+            metric_dict['err'][sl] = np.abs(offset - vout/(np.abs(ss.get_loopgain())+1))/vout
+            metric_dict['psrr'][sl], metric_dict['psrr_fbw'][sl] = _get_psrr(ss, cload, cdecap_amp, grid=True)
+            metric_dict['pm'][sl] = ss.get_stb(cload, cdecap_amp, grid=True)
+            metric_dict['loadreg'][sl] = ss.get_loadreg(cload, cdecap_amp, vout, iload)
+            if 'droop' in spec_dict:
+                metric_dict['droop'][sl] = ss.get_droop(cload, cdecap_amp, vout, iload)
+            metric_dict['ibias'][sl] = op['ibias']*cur_scale[sl]
+
+        passes = np.ones(num, dtype=bool)
+        mc_info = dict(num=num, offset=dict(mean=float(np.mean(metric_dict['offset'])),
+                                            std=float(np.std(metric_dict['offset']))))
+        for k, (limit, sense) in spec_dict.items():
+            val = metric_dict[k]
+            ok = val < limit if sense == 'max' else val > limit
+            passes &= ok
+            mc_info[k] = {'mean': float(np.mean(val)), 'std': float(np.std(val)), 'min': float(np.min(val)),
+                          'max': float(np.max(val)), 'yield': float(np.mean(ok))}
+        mc_info['yield'] = float(np.mean(passes))
+        return mc_info
+
+    def dsn_vg(self, **params):
+        '''
+        Returns:
+            spec_met: True if the series device and amplifier designed around
+                series gate bias vg meet spec with amplifier current below iamp_max
+            amp_dsn_info: Amplifier design info. If spec is not met, 'reject' holds
+                the reason: 'ser_size', 'bias', 'bound_<bound>', 'iamp', the
+                comma-separated specs missed, or 'corner_<sim_env>'
+        '''
+        vg = params['vg']
+        print('Designing the series device...')
+        # Size the series device
+        with stage('dsn_fet'):
+            match_ser, ser_info = self.dsn_fet(**params)
+        if not match_ser:
+            return False, dict(reject='ser_size')
+        print('Done')
+
+        # Design amplifier s.t. output bias = gate voltage
+        # This is to maintain accuracy in the computational design proces
+        print('Designing the amplifier...')
+        params.update(dict(voutcm=vg,
+                           ser_info=ser_info))
+        with stage('bias_amp'):
+            bias_ok, bias_info = self.bias_amp(**params)
+        if not bias_ok:
+            print('Amp could not be biased.')
+            return False, dict(reject='bias')
+        params.update(bias_info=bias_info)
+
+        # Skip candidates that cannot win before building any small-signal model
+        with stage('bound_amp'):
+            reason = self.bound_amp(**params)
+        if reason is not None:
+            print(f'Pruned by {reason} bound.')
+            return False, dict(pruned=reason, reject=f'bound_{reason}', vtail=bias_info['vtail'],
+                               vgtail=bias_info['vgtail'], grid_skipped=bias_info['grid_skipped'])
+
+        with stage('dsn_amp'):
+            spec_met, amp_dsn_info = self.dsn_amp(**params)
+        amp_dsn_info.update(vg=vg, vtail=bias_info['vtail'], vgtail=bias_info['vgtail'],
+                            grid_skipped=bias_info['grid_skipped'])
+        print('Done')
+
+        if spec_met and params.get('corner_db_dict'):
+            with stage('check_corners'):
+                failed, corner_dict = self.check_corners(amp_dsn_info, **params)
+            amp_dsn_info.update(corners=corner_dict)
+            if failed is not None:
+                print(f'Specs not met at corner {failed}.')
+                amp_dsn_info.update(corner_failed=failed, reject=f'corner_{failed}')
+                spec_met = False
+
+        if not spec_met:
+            if 'reject' not in amp_dsn_info:
+                amp_dsn_info.update(reject=','.join(self._get_missed_specs(amp_dsn_info, params)) or 'iamp')
+            print('Amp specs not met.')
+        else:
+            print('AMP SPECS MET.')
+        return spec_met, amp_dsn_info
+
+    def _get_log_record(self, vg, ser_type, amp_dsn_info, reason):
+        '''
+        Returns:
+            record: Candidate log entry of the design at series gate bias vg with series
+                device type ser_type, rejected
+                for reason (None for a new best design, 'not_best' for one meeting spec
+                without beating it)
+        '''
+        record = dict(vg=float(vg), ser_type=ser_type, reason=reason)
+        for key in ('vtail', 'vgtail', 'ibias', 'err', 'psrr', 'psrr_fbw', 'pm', 'loadreg', 'droop'):
+            if key in amp_dsn_info:
+                record[key] = float(amp_dsn_info[key])
+        for key, name in (('nf_dict', 'nf'), ('wm_dict', 'wm'), ('cap_dict', 'cap')):
+            if key in amp_dsn_info:
+                record[name] = amp_dsn_info[key]
+        return record
+
+    def _get_missed_specs(self, info, params):
+        '''
+        Returns:
+            missed: Names of the specs the metrics in info miss, skipping metrics info lacks
+        '''
+        spec_dict = dict(iamp=lambda info: info['ibias'] < params['iamp_max'],
+                         err=lambda info: info['err'] < params['err'],
+                         psrr=lambda info: info['psrr'] > params['psrr'],
+                         psrr_fbw=lambda info: info['psrr_fbw'] > params['psrr_fbw'],
+                         pm=lambda info: info['pm'] > params['pm'],
+                         loadreg=lambda info: info['loadreg'] < params['loadreg'],
+                         droop=lambda info: info['droop'] < params['droop'])
+        metric_dict = dict(iamp='ibias')
+        return [k for k,passes in spec_dict.items() if metric_dict.get(k, k) in info and not passes(info)]
+
+    def _design_vg(self, params, dsn_dict, point, iamp_max):
+        '''
+        Returns:
+            spec_met, amp_dsn_info: dsn_vg of the series gate bias point['vg'] with amplifier
+                current below iamp_max, with the device dictionaries in dsn_dict added to
+                designs meeting spec
+        '''
+        spec_met, amp_dsn_info = self.dsn_vg(**dict(params, vg=point['vg'], iamp_max=iamp_max))
+        if spec_met:
+            amp_dsn_info.update(dsn_dict)
+        return spec_met, amp_dsn_info
 
-            amp_dsn_info.update(dict(w_dict=w_dict, l_dict=l_dict, th_dict=th_dict, type_dict=type_dict))
+    def _prune_vg(self, params, point, iamp_max):
+        '''
+        Returns:
+            reason: bound_vg of the series gate bias point['vg'] with amplifier current below iamp_max
+        '''
+        with stage('bound_vg'):
+            reason = self.bound_vg(**dict(params, vg=point['vg'], iamp_max=iamp_max))
+        if reason is not None:
+            print(f'Pruned by {reason} bound.')
+        return reason
 
-            best_op.update(self.op_compare(best_op,amp_dsn_info))
-            iamp_max = best_op['ibias']
-        return [best_op]
+    def _get_pareto_item(self, point, amp_dsn_info):
+        '''
+        Returns:
+            pareto_info: Pareto front entry of the design at series gate bias point['vg']
+        '''
+        pareto_info = {k:amp_dsn_info[k] for k in _PARETO_OBJECTIVES.keys()}
+        pareto_info.update(vg=point['vg'], err=amp_dsn_info['err'], sch_params=self.get_sch_params(amp_dsn_info))
+        return pareto_info
+
+    def _get_ss_model(self, op_dict, nf_dict, ser_type, amp_in, rsource, ss_model):
+        '''
+        Returns:
+            ss: Small-signal evaluator for one operating point, providing get_loopgain,
+                get_psrr, get_stb, get_loadreg and get_droop
+        '''
+        if ss_model == 'mna':
+            return LDOSmallSignal(op_dict, nf_dict, ser_type, amp_in, rsource)
+        if ss_model == 'lti':
+            return _LTIModel(self, op_dict, nf_dict, ser_type, amp_in, rsource)
+        raise ValueError(f'Unknown small-signal model {ss_model}')
+
+    def _check_lti(self, op, params, rtol=1e-6):
+        '''
+        Returns:
+            dev_dict: Relative deviation between the small-signal model and the LTICircuit
+                builders of each metric of design op. Warns for deviations above rtol.
+        '''
+        cload = params['cload'] + op['cap_dict']['cdecap_load']
+        cdecap_amp = op['cap_dict']['cdecap_amp']
+        metric_list = []
+        for ss_model in ('mna', 'lti'):
+            ss = self._get_ss_model(op['op_dict'], op['nf_dict'], params['ser_type'], 'n',
+                                    params['rsource'], ss_model)
+            psrr, psrr_fbw = _get_psrr(ss, cload, cdecap_amp)
+            metric_list.append(dict(loopgain=ss.get_loopgain(),
+                                    psrr=psrr,
+                                    psrr_fbw=psrr_fbw,
+                                    pm=ss.get_stb(cload, cdecap_amp),
+                                    loadreg=ss.get_loadreg(cload, cdecap_amp, params['vout'], params['iload'])))
+        mna_dict, lti_dict = metric_list
+        dev_dict = dict()
+        for k, val in lti_dict.items():
+            dev_dict[k] = 0.0 if mna_dict[k] == val else float(abs(mna_dict[k] - val)/max(abs(val), np.finfo(float).tiny))
+            if dev_dict[k] > rtol:
+                warnings.warn(f'{k} of the chosen design is {mna_dict[k]} with the small-signal model but {val} with LTICircuit')
+        return dev_dict
 
     def _get_loopgain_lti(self, op_dict, nf_dict, ser_type, amp_in, rsource) -> float:
         '''
         Returns:
             A: DC loop gain
         '''
+        build_start = event_start()
         ckt = LTICircuit()
 
         n_ser = ser_type == 'n'
@@ -367,7 +1104,10 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         ckt.add_transistor(op_dict['amp_load'], 'out', 'outx', load_rail, fg=nf_dict['amp_load'], neg_cap=False)
 
         # Calculating stability margins
+        event_end('lti_build', build_start)
+        solve_start = event_start()
         num, den = ckt.get_num_den(in_name='amp_in', out_name='reg', in_type='v')
+        event_end('lti_solve', solve_start)
         A = num[-1]/den[-1]
 
         return A
@@ -376,8 +1116,9 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         '''
         Returns:
             psrr: PSRR (dB)
-            fbw: Power supply -> output 3dB bandwidth (Hz)
+            fbw: Power supply -> output 3dB bandwidth (Hz), NaN if get_w_3db finds none
         '''
+        build_start = event_start()
         n_ser = ser_type == 'n'
         n_amp = amp_in == 'n'
 
@@ -406,18 +1147,20 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         ckt_sup.add_transistor(op_dict['amp_load'], 'outx', 'outx', load_rail, fg=nf_dict['amp_load'], neg_cap=False)
         ckt_sup.add_transistor(op_dict['amp_load'], 'out', 'outx', load_rail, fg=nf_dict['amp_load'], neg_cap=False)
 
+        event_end('lti_build', build_start)
+        solve_start = event_start()
         if rsource == 0:
             num_sup, den_sup = ckt_sup.get_num_den(in_name='vdd', out_name='reg', in_type='v')
         else:
             num_sup, den_sup = ckt_sup.get_num_den(in_name='vbat', out_name='reg', in_type='v')
+        event_end('lti_solve', solve_start)
         gain_sup = num_sup[-1]/den_sup[-1]
-        wbw_sup = get_w_3db(den_sup, num_sup)
+        with event('w_3db'):
+            wbw_sup = get_w_3db(den_sup, num_sup)
 
         if gain_sup == 0:
-            return float('inf')
-        if wbw_sup == None:
-            wbw_sup = 0
-        fbw_sup = wbw_sup / (2*np.pi)
+            return float('inf'), float('inf')
+        fbw_sup = float('nan') if wbw_sup is None else wbw_sup / (2*np.pi)
 
         psrr = 10*np.log10((1/gain_sup)**2)
 
@@ -428,6 +1171,7 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         Returns:
             pm: Phase margin (degrees)
         '''
+        build_start = event_start()
         ckt = LTICircuit()
 
         n_ser = ser_type == 'n'
@@ -457,8 +1201,12 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         ckt.add_transistor(op_dict['amp_load'], 'out', 'outx', load_rail, fg=nf_dict['amp_load'], neg_cap=False)
 
         # Calculating stability margins
+        event_end('lti_build', build_start)
+        solve_start = event_start()
         num, den = ckt.get_num_den(in_name='amp_in', out_name='reg', in_type='v')
-        pm, _ = get_stability_margins(np.convolve(num, [-1]), den)
+        event_end('lti_solve', solve_start)
+        with event('stability_margin'):
+            pm, _ = get_stability_margins(np.convolve(num, [-1]), den)
 
         return pm
 
@@ -467,6 +1215,7 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         Returns:
             loadreg: Load regulation for peak-to-peak load current variation of 20% (V/V)
         '''
+        build_start = event_start()
         n_ser = ser_type == 'n'
         n_amp = amp_in == 'n'
         vdd = 'vdd' if rsource != 0 else 'gnd'
@@ -497,16 +1246,16 @@ class bag2_analog__regulator_ldo_series_dsn(DesignModule):
         ckt.add_transistor(op_dict['amp_load'], 'out', 'outx', load_rail, fg=nf_dict['amp_load'], neg_cap=False)
 
 
+        event_end('lti_build', build_start)
+        solve_start = event_start()
         num, den = ckt.get_num_den(in_name='reg', out_name='reg', in_type='i')
+        event_end('lti_solve', solve_start)
         transimpedance = num[-1]/den[-1]
 
         loadreg = transimpedance*0.2*iout/vout
 
         return loadreg
 
-    def op_compare(self, op1:Mapping[str,Any], op2:Mapping[str,Any]):
-        return op1 if op1['ibias'] < op2['ibias'] else op2
-
     def get_sch_params(self, op):
         try:
             w_dict_new = dict()
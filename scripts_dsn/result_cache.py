@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import os
+import glob
+import json
+import pickle
+import hashlib
+import tempfile
+from pathlib import Path
+
+import yaml
+
+
+class ResultCache(object):
+    """On-disk cache of design results, evicting the least recently used beyond max_size bytes.
+
+    A run is keyed on its design parameters, source files, the files the
+    parameters name and the size and mtime of the characterization data under
+    their root_dir. The data is listed once per cache.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = 512*1024**2) -> None:
+        self._cache_dir = Path(cache_dir)
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data_stats = dict()  # type: Dict[str, str]
+
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+
+    def get_key(self, dsn_mod: str, dsn_cls: str, specs: Mapping[str, Any],
+                source_files: Sequence[str]) -> str:
+        """Returns the cache key of a design run, whose code lives in source_files."""
+        hasher = hashlib.sha256()
+        hasher.update(json.dumps([dsn_mod, dsn_cls, specs], sort_keys=True, default=repr).encode())
+        for fname in sorted({os.path.abspath(fname) for fname in source_files}):
+            hasher.update(fname.encode())
+            hasher.update(_hash_file(fname).encode())
+        for fname in sorted(set(_get_spec_files(specs))):
+            hasher.update(fname.encode())
+            hasher.update(_hash_file(fname).encode())
+            if fname not in self._data_stats:
+                self._data_stats[fname] = _stat_data_dir(fname)
+            hasher.update(self._data_stats[fname].encode())
+        return hasher.hexdigest()
+
+    def load(self, key: str) -> Optional[Tuple[Any, Any]]:
+        """Returns the cached (sch_params, best_op) of a run, or None on a miss."""
+        fname = self._get_fname(key)
+        try:
+            with open(fname, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(fname)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['sch_params'], entry['best_op']
+
+    def save(self, key: str, sch_params: Any, best_op: Any) -> None:
+        """Stores the result of a run, then evicts old entries beyond the size limit."""
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent runs never read a partial entry
+        fd, tmp_fname = tempfile.mkstemp(dir=str(self._cache_dir), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(dict(sch_params=sch_params, best_op=best_op), f)
+            os.replace(tmp_fname, self._get_fname(key))
+        except BaseException:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+            raise
+        self._evict()
+
+    def clear(self) -> None:
+        for fname in self._iter_entries():
+            os.remove(fname)
+
+    def stats(self) -> Dict[str, int]:
+        entries = list(self._iter_entries())
+        return dict(hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    size=len(entries),
+                    num_bytes=sum(os.path.getsize(fname) for fname in entries))
+
+    def _get_fname(self, key: str) -> Path:
+        return self._cache_dir / f'{key}.pkl'
+
+    def _iter_entries(self) -> Iterator[Path]:
+        if self._cache_dir.is_dir():
+            yield from self._cache_dir.glob('*.pkl')
+
+    def _evict(self) -> None:
+        entries = []
+        for fname in self._iter_entries():
+            try:
+                fstat = fname.stat()
+            except OSError:
+                continue
+            entries.append((fstat.st_mtime, fstat.st_size, fname))
+        entries.sort()
+        num_bytes = sum(size for _, size, _ in entries)
+        for _, size, fname in entries:
+            if num_bytes <= self._max_size:
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                continue
+            num_bytes -= size
+            self.evictions += 1
+
+
+def _hash_file(fname: str) -> str:
+    hasher = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _stat_data_dir(fname: str) -> str:
+    """Returns the path, size and mtime of every characterization data file under the root_dir of a spec file."""
+    try:
+        with open(fname, 'r') as f:
+            spec = yaml.safe_load(f)
+    except (OSError, UnicodeDecodeError, yaml.YAMLError):
+        return ''
+    if not isinstance(spec, Mapping) or not isinstance(spec.get('root_dir'), str):
+        return ''
+    root_dir = spec['root_dir']
+    if not os.path.isdir(root_dir):
+        # Relative to the spec file rather than the working directory
+        root_dir = os.path.join(os.path.dirname(fname), root_dir)
+    stat_list = []
+    for dirpath, _, fname_list in os.walk(root_dir):
+        for data_fname in fname_list:
+            data_path = os.path.join(dirpath, data_fname)
+            try:
+                fstat = os.stat(data_path)
+            except OSError:
+                continue
+            stat_list.append(f'{data_path}:{fstat.st_size}:{fstat.st_mtime_ns}')
+    return '\n'.join(sorted(stat_list))
+
+
+def get_source_files(mod_file: str) -> List[str]:
+    """Returns every Python source file in the directory of a design module, whether imported or not."""
+    pkg_dir = os.path.dirname(os.path.abspath(mod_file))
+    return sorted(glob.glob(os.path.join(pkg_dir, '*.py')))
+
+
+def _get_spec_files(specs: Any) -> Iterator[str]:
+    """Yields the existing files named by string values anywhere in the design parameters."""
+    if isinstance(specs, Mapping):
+        for val in specs.values():
+            yield from _get_spec_files(val)
+    elif isinstance(specs, (list, tuple)):
+        for val in specs:
+            yield from _get_spec_files(val)
+    elif isinstance(specs, str) and os.path.isfile(specs):
+        yield os.path.abspath(specs)
@@ -0,0 +1,738 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import time
+import itertools
+import multiprocessing
+
+import numpy as np
+
+
+def bisect_min_log(passes: Callable[[float], bool], lo: float, hi: float,
+                   rtol: float) -> Tuple[Optional[float], int]:
+    """Finds the smallest value in [lo, hi] for which a monotonic predicate passes.
+
+    passes is assumed to fail below some threshold and pass above it. The end
+    points are checked first, then the bracket is bisected on a log scale until
+    it is within a relative tolerance rtol of its passing end.
+
+    Parameters
+    ----------
+    passes : Callable[[float], bool]
+        the predicate.
+    lo : float
+        lower end of the search range. Returned immediately if it passes.
+    hi : float
+        upper end of the search range.
+    rtol : float
+        relative tolerance on the returned value.
+
+    Returns
+    -------
+    val : Optional[float]
+        the smallest passing value found, or None if nothing in the range passes.
+    num_eval : int
+        number of predicate evaluations.
+    """
+    if passes(lo):
+        return lo, 1
+    if hi <= lo or not passes(hi):
+        return None, 1 if hi <= lo else 2
+
+    num_eval = 2
+    while hi - lo > rtol*hi:
+        mid = np.sqrt(lo*hi) if lo > 0 else hi/2
+        num_eval += 1
+        if passes(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi, num_eval
+
+
+
+def grid_min_log(passes: Callable[[np.ndarray], np.ndarray], lo: float, hi: float,
+                 rtol: float, num: int = 16) -> Tuple[Optional[float], int]:
+    """Finds the smallest value in [lo, hi] for which a predicate passes, on log-spaced grids.
+
+    passes takes an array of values and returns an array of booleans, so that
+    a whole grid is evaluated in one call. The first grid spans [lo, hi] with
+    num points; each later one has num points inside the bracket below the
+    first passing point, until the bracket is within a relative tolerance rtol
+    of its passing end. Unlike bisect_min_log, the predicate only needs to be
+    monotonic within one grid step.
+
+    Parameters
+    ----------
+    passes : Callable[[np.ndarray], np.ndarray]
+        the vectorized predicate.
+    lo : float
+        lower end of the search range, > 0. Returned if it passes.
+    hi : float
+        upper end of the search range.
+    rtol : float
+        relative tolerance on the returned value.
+    num : int
+        number of points per grid.
+
+    Returns
+    -------
+    val : Optional[float]
+        the smallest passing value found, or None if no grid point passes.
+    num_eval : int
+        number of predicate evaluations.
+    """
+    if lo <= 0:
+        raise ValueError('grid_min_log needs a positive lower end')
+    val_vec = np.geomspace(lo, max(hi, lo), num if hi > lo else 1)
+    ok = np.asarray(passes(val_vec), dtype=bool)
+    num_eval = len(val_vec)
+    if not ok.any():
+        return None, num_eval
+    idx = int(np.argmax(ok))
+    if idx == 0:
+        return lo, num_eval
+
+    lo, hi = val_vec[idx-1], val_vec[idx]
+    while hi - lo > rtol*hi:
+        val_vec = np.geomspace(lo, hi, num+2)[1:-1]
+        ok = np.asarray(passes(val_vec), dtype=bool)
+        num_eval += num
+        idx = int(np.argmax(ok)) if ok.any() else num
+        if idx > 0:
+            lo = val_vec[idx-1]
+        if idx < num:
+            hi = val_vec[idx]
+    return hi, num_eval
+
+
+def search_min_int(passes: Callable[[int], bool], lo: int, hi: int,
+                   step: int = 1, hint: Optional[int] = None) -> Tuple[Optional[int], int]:
+    """Finds the smallest of lo, lo + step, ... <= hi for which a monotonic predicate passes.
+
+    passes is assumed to fail below some threshold and pass above it, so the
+    answer is the same as walking up from lo one step at a time. The bracket
+    grows geometrically from lo (lo, lo + step, lo + 3*step, lo + 7*step, ...)
+    until the predicate passes or hi is reached, and is then bisected. Given a
+    hint, the bracket grows from the hint instead, downwards if it passes, so a
+    good guess of the answer takes a few evaluations; the answer is the same.
+
+    Parameters
+    ----------
+    passes : Callable[[int], bool]
+        the predicate.
+    lo : int
+        first candidate value.
+    hi : int
+        largest candidate value allowed.
+    step : int
+        spacing between candidate values.
+    hint : Optional[int]
+        guess of the answer, e.g. from a previous search. Rounded down onto the
+        candidate values and clipped to [lo, hi].
+
+    Returns
+    -------
+    val : Optional[int]
+        the smallest passing value, or None if nothing up to hi passes. In that
+        case the last value evaluated is the largest candidate.
+    num_eval : int
+        number of predicate evaluations.
+    """
+    idx_max = (hi - lo)//step
+    if idx_max < 0:
+        return None, 0
+
+    start = 0 if hint is None else min(max((hint - lo)//step, 0), idx_max)
+    num_eval = 0
+    idx_fail = -1
+    idx, width = start, 1
+    while True:
+        num_eval += 1
+        if passes(lo + idx*step):
+            break
+        if idx == idx_max:
+            return None, num_eval
+        idx_fail = idx
+        idx = min(idx + width, idx_max)
+        width *= 2
+
+    # A passing hint brackets the answer from above only
+    width = 1
+    while idx_fail < 0 < idx:
+        probe = max(idx - width, 0)
+        num_eval += 1
+        if passes(lo + probe*step):
+            idx = probe
+        else:
+            idx_fail = probe
+        width *= 2
+
+    while idx - idx_fail > 1:
+        mid = (idx + idx_fail)//2
+        num_eval += 1
+        if passes(lo + mid*step):
+            idx = mid
+        else:
+            idx_fail = mid
+    return lo + idx*step, num_eval
+
+
+def coarse_idx(num: int, factor: int) -> np.ndarray:
+    """Returns every factor-th index of a grid of num points, plus the last one."""
+    if factor <= 1 or num == 0:
+        return np.arange(num)
+    return np.unique(np.r_[0:num:factor, num-1])
+
+
+def argmin_valid(err: np.ndarray, valid: np.ndarray) -> Optional[int]:
+    """Returns the index of the first minimum of err among valid entries, or None if no valid entry is finite.
+
+    This is the point a loop keeping the strictly better design so far ends with.
+    """
+    err = np.where(valid & ~np.isnan(err), err, float('inf'))
+    idx = int(np.argmin(err))
+    return idx if err[idx] < float('inf') else None
+
+
+def grid_argmin(evaluate: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, Mapping[str, np.ndarray]]],
+                num: int, factor: int = 1) -> Tuple[Optional[int], Optional[Dict[str, Any]], int]:
+    """Finds the grid point of minimum error, evaluating the grid in vectorized batches.
+
+    With factor > 1 every factor-th point is evaluated first, then only the
+    points within factor-1 of the coarse minimum, so the error is assumed to
+    vary slowly over factor points. If no coarse point is valid, the whole grid
+    is evaluated.
+
+    Parameters
+    ----------
+    evaluate : Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, Mapping[str, np.ndarray]]]
+        maps an array of grid indices to the error, valid mask and dictionary of
+        arrays of values at those points.
+    num : int
+        number of grid points.
+    factor : int
+        coarsening factor.
+
+    Returns
+    -------
+    idx : Optional[int]
+        grid index of the minimum error found, or None if no valid point was found.
+    val : Optional[Dict[str, Any]]
+        values returned by evaluate at idx.
+    num_eval : int
+        number of grid points evaluated.
+    """
+    idx_vec = coarse_idx(num, factor)
+    if len(idx_vec) == 0:
+        return None, None, 0
+    err, valid, val_vec = evaluate(idx_vec)
+    num_eval = len(idx_vec)
+    pos = argmin_valid(err, valid)
+    if pos is None and factor > 1:
+        # Valid points can lie between coarse points that are all invalid
+        idx_vec = np.arange(num)
+        err, valid, val_vec = evaluate(idx_vec)
+        num_eval = num
+        pos = argmin_valid(err, valid)
+    elif pos is not None and factor > 1:
+        center = idx_vec[pos]
+        idx_vec = np.arange(max(center-factor+1, 0), min(center+factor, num))
+        err, valid, val_vec = evaluate(idx_vec)
+        num_eval += len(idx_vec) - 1
+        pos = argmin_valid(err, valid)
+    if pos is None:
+        return None, None, num_eval
+    return idx_vec[pos], {k:v[pos] for k,v in val_vec.items()}, num_eval
+
+
+class ParetoArchive(object):
+    """Bounded archive of mutually non-dominated designs, maintained incrementally.
+
+    A design is added only if no archived design is at least as good in every
+    objective, and it removes the archived designs it dominates. When the
+    archive is full, the design in the most crowded part of the front (smallest
+    crowding distance) is evicted, so the extremes of every objective are kept
+    and the remaining designs stay spread along the trade-off.
+
+    Parameters
+    ----------
+    objectives : Mapping[str, str]
+        dictionary from metric name to 'min' or 'max'.
+    max_size : int
+        maximum number of designs held.
+    """
+
+    def __init__(self, objectives: Mapping[str, str], max_size: int = 50) -> None:
+        for name, sense in objectives.items():
+            if sense not in ('min', 'max'):
+                raise ValueError(f"Objective {name} must be 'min' or 'max', not {sense}")
+        if max_size < 1:
+            raise ValueError('Pareto archive size must be at least 1')
+        self._names = list(objectives.keys())
+        self._sign = np.array([1.0 if objectives[k] == 'min' else -1.0 for k in self._names])
+        self._max_size = max_size
+        self._costs = []  # type: List[np.ndarray]
+        self._items = []  # type: List[Any]
+        self.num_evict = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items)
+
+    @property
+    def objectives(self) -> List[str]:
+        return list(self._names)
+
+    def add(self, metrics: Mapping[str, float], item: Any) -> bool:
+        """Offers a design to the archive.
+
+        Parameters
+        ----------
+        metrics : Mapping[str, float]
+            values of every objective for this design.
+        item : Any
+            the design to archive.
+
+        Returns
+        -------
+        accepted : bool
+            True if the design is in the archive after this call.
+        """
+        cost = self._sign*np.array([metrics[k] for k in self._names], dtype=float)
+        if np.any(np.isnan(cost)):
+            return False
+        if any(np.all(old <= cost) for old in self._costs):
+            return False
+
+        keep = [idx for idx, old in enumerate(self._costs) if not np.all(cost <= old)]
+        self._costs = [self._costs[idx] for idx in keep] + [cost]
+        self._items = [self._items[idx] for idx in keep] + [item]
+        if len(self._items) <= self._max_size:
+            return True
+
+        idx = int(np.argmin(self._get_crowding()))
+        del self._costs[idx]
+        del self._items[idx]
+        self.num_evict += 1
+        return idx != len(self._items)
+
+    def _get_crowding(self) -> np.ndarray:
+        costs = np.array(self._costs)
+        num = costs.shape[0]
+        dist = np.zeros(num)
+        for col in costs.T:
+            order = np.argsort(col, kind='stable')
+            span = col[order[-1]] - col[order[0]]
+            dist[order[0]] = dist[order[-1]] = np.inf
+            if num > 2 and np.isfinite(span) and span > 0:
+                dist[order[1:-1]] += (col[order[2:]] - col[order[:-2]])/span
+        return dist
+
+
+# Sweep strategies by name, see register_strategy
+_STRATEGIES = dict()  # type: Dict[str, Callable[..., None]]
+
+
+def register_strategy(name: str, run: Callable[..., None]) -> None:
+    """Makes a sweep strategy available as SweepEngine(strategy=name).
+
+    run(engine, on_result, checkpoint, ckpt_state, get_extra) picks the points of
+    the grid to design, designs them with engine.design and passes every design
+    to engine.merge(idx, spec_met, info, on_result). If checkpoint is given, it
+    saves its progress with checkpoint.update as a dictionary holding get_extra()
+    under 'extra'; ckpt_state is such a dictionary to resume from, or None.
+
+    Parameters
+    ----------
+    name : str
+        name of the strategy.
+    run : Callable[..., None]
+        the strategy.
+    """
+    _STRATEGIES[name] = run
+
+
+# Design and prune functions, cost key, shared cost bound, its relative slack and its cap of a sweep worker process
+_worker_state = None
+
+
+def _init_sweep_worker(evaluate, prune, cost_key, bound, bound_rtol, bound_cap, worker_init):
+    global _worker_state
+    _worker_state = evaluate, prune, cost_key, bound, bound_rtol, bound_cap
+    if worker_init is not None:
+        worker_init()
+
+
+def _run_sweep_worker(point):
+    evaluate, prune, cost_key, bound, bound_rtol, bound_cap = _worker_state
+    if bound is None:
+        cost_max = bound_cap
+    else:
+        # Let ties with the shared bound through; the in-order merge breaks them as a serial sweep would
+        cost_max = np.nextafter(bound.value, float('inf'))
+        if bound_rtol > 0:
+            cost_max = min(cost_max*(1+bound_rtol), bound_cap)
+    reason = None if prune is None else prune(point, cost_max)
+    if reason is not None:
+        return reason, (False, dict(pruned=reason))
+    spec_met, info = evaluate(point, cost_max)
+    if spec_met and bound is not None:
+        with bound.get_lock():
+            bound.value = min(bound.value, info[cost_key])
+    return None, (spec_met, info)
+
+
+class SweepEngine(object):
+    """Sweep of a design over a grid of candidate points, keeping the cheapest design meeting spec.
+
+    A design module declares its search axes and a function designing one point
+    against a cost bound, e.g. a maximum current; the engine picks the points,
+    tightens the bound as designs are found, keeps the best design and an
+    optional Pareto archive, and checkpoints its progress.
+
+    The grid is the Cartesian product of the axes, indexed in C order. The
+    'grid' strategy designs every point; the 'adaptive' strategy designs every
+    factor-th point along each axis first, keeping the designs within rtol of the
+    best cost, then the points within factor-1 of those along every axis; if no
+    coarse design meets spec, it designs the rest of the grid instead. Points
+    are designed in grid order, or outward from a center point such as a previous
+    solution, so that a good design sets a tight bound early. The 'bisect'
+    strategy sweeps a single axis along which designs fail below some point and
+    meet spec above it, with the cost growing along the axis, e.g. a finger
+    count: it finds the first point meeting spec with search_min_int, bracketing
+    from the center point if given, and designs one point at a time in this
+    process. Other strategies can be added with register_strategy.
+
+    A prune function can reject points before they are designed, e.g. with a
+    cheap lower bound on their cost. Pruned points are merged as failing, with
+    info dict(pruned=reason), and counted in stats['pruned'].
+
+    With share_bound, each point is designed against the cost of the best design
+    so far, so evaluate may give up on points that cannot beat it; otherwise
+    against the initial bound, e.g. to collect every design meeting spec. With
+    n_workers > 1 the points are designed in a process pool whose workers share
+    the best cost found. Either way, the best design is the cheapest one, ties
+    going to the lowest grid index, as in a serial in-order sweep.
+
+    Parameters
+    ----------
+    axes : Mapping[str, Sequence[Any]]
+        dictionary from axis name to the values of the axis.
+    evaluate : Callable[[Dict[str, Any], float], Tuple[bool, Mapping[str, Any]]]
+        designs a point, given as a dictionary from axis name to value, against a
+        cost bound. Returns whether the design meets spec with a cost below the
+        bound, and its info, with the cost under cost_key. Worker processes get it
+        through fork where available, and pickled otherwise.
+    bound : float
+        cost bound of the spec.
+    cost_key : str
+        key of the cost in the design info.
+    strategy : str
+        'grid', 'adaptive', 'bisect' or a strategy added with register_strategy.
+    factor : int
+        coarsening factor of the adaptive strategy.
+    rtol : float
+        relative cost margin within which coarse designs are refined by the adaptive strategy.
+    share_bound : bool
+        True to design each point against the best cost found so far.
+    n_workers : int
+        number of worker processes. 1 designs the points serially.
+    center : Optional[Mapping[str, Any]]
+        point to design first, snapped to the nearest grid value of each axis.
+    archive : Optional[ParetoArchive]
+        archive offered every design meeting spec, as item get_archive_item(point, info).
+    get_archive_item : Optional[Callable[[Dict[str, Any], Mapping[str, Any]], Any]]
+        maps a design to its archived item. Defaults to the design info.
+    worker_init : Optional[Callable[[], None]]
+        run in each worker process when it starts, e.g. to silence it.
+    progress_interval : Optional[float]
+        minimum time between progress reports, in seconds. None reports nothing.
+    prune : Optional[Callable[[Dict[str, Any], float], Optional[str]]]
+        given a point and the cost bound it would be designed against, returns the
+        reason it cannot meet spec below the bound, or None to design it. Worker
+        processes get it as they get evaluate.
+    """
+
+    def __init__(self, axes: Mapping[str, Sequence[Any]],
+                 evaluate: Callable[[Dict[str, Any], float], Tuple[bool, Mapping[str, Any]]],
+                 bound: float = float('inf'), cost_key: str = 'cost', strategy: str = 'grid',
+                 factor: int = 1, rtol: float = 0.0, share_bound: bool = True, n_workers: int = 1,
+                 center: Optional[Mapping[str, Any]] = None, archive: Optional[ParetoArchive] = None,
+                 get_archive_item: Optional[Callable[[Dict[str, Any], Mapping[str, Any]], Any]] = None,
+                 worker_init: Optional[Callable[[], None]] = None,
+                 progress_interval: Optional[float] = None,
+                 prune: Optional[Callable[[Dict[str, Any], float], Optional[str]]] = None) -> None:
+        if strategy not in _STRATEGIES:
+            raise ValueError(f'Sweep strategy must be one of {sorted(_STRATEGIES)}, not {strategy}')
+        if strategy == 'bisect' and len(axes) != 1:
+            raise ValueError(f"The 'bisect' strategy sweeps a single axis, not {len(axes)}")
+        self._names = list(axes.keys())
+        self._axes = [np.asarray(axes[k]) for k in self._names]
+        self._shape = tuple(len(axis) for axis in self._axes)
+        self._evaluate = evaluate
+        self._prune = prune
+        self._bound_spec = bound
+        self._cost_key = cost_key
+        # Without coarsening the adaptive sweep is the full grid
+        self._strategy = 'grid' if strategy == 'adaptive' and factor <= 1 else strategy
+        self._factor = factor
+        self._rtol = rtol
+        self._share_bound = share_bound
+        self._n_workers = n_workers
+        self._center = None
+        if center is not None:
+            self._center = np.array([int(np.argmin(np.abs(axis - center[k])))
+                                     for k, axis in zip(self._names, self._axes)])
+        self._archive = archive
+        self._get_archive_item = get_archive_item
+        self._worker_init = worker_init
+        self._progress_interval = progress_interval
+
+        self.bound = bound
+        self.best = None  # type: Optional[Mapping[str, Any]]
+        self.best_point = None  # type: Optional[Dict[str, Any]]
+        self._best_idx = None  # type: Optional[int]
+        self.stats = dict(designed=0, met=0, pruned=0, skipped=0, time=0.0)
+        self._last_report = 0.0
+
+    @property
+    def num_points(self) -> int:
+        return int(np.prod(self._shape))
+
+    @property
+    def archive(self) -> Optional[ParetoArchive]:
+        return self._archive
+
+    def get_point(self, idx: int) -> Dict[str, Any]:
+        """Returns the grid point at flat index idx, as a dictionary from axis name to value."""
+        return {k:axis[i] for k, axis, i in zip(self._names, self._axes, np.unravel_index(idx, self._shape))}
+
+    def run(self, on_result: Optional[Callable[[Dict[str, Any], bool, Mapping[str, Any], bool], None]] = None,
+            checkpoint: Any = None, ckpt_state: Optional[Dict[str, Any]] = None,
+            get_extra_state: Optional[Callable[[], Any]] = None) -> Optional[Mapping[str, Any]]:
+        """Sweeps the grid.
+
+        Every design is merged in turn: offered to the archive if it meets spec,
+        compared with the best design, then passed to on_result(point, spec_met,
+        info, is_best). Grid sweeps merge the designs in the order they are
+        designed, adaptive and bisect sweeps in grid order once all are designed.
+
+        The checkpoint is saved when the sweep starts, so that a crash before the
+        first periodic save resumes with the caller's state at the start, and once
+        it is done, so that a finished sweep resumes straight to its result.
+
+        Parameters
+        ----------
+        on_result : Optional[Callable[[Dict[str, Any], bool, Mapping[str, Any], bool], None]]
+            called for every design merged. is_best is True if it is the new best design.
+        checkpoint : Any
+            SweepCheckpoint to save the progress to.
+        ckpt_state : Optional[Dict[str, Any]]
+            state loaded from checkpoint, to continue from.
+        get_extra_state : Optional[Callable[[], Any]]
+            returns state of the caller saved with every checkpoint, e.g. statistics
+            gathered by on_result, under ckpt_state['extra']. Adaptive and bisect sweeps
+            merge every design again on resume, so state rebuilt by on_result must not
+            be restored for them.
+
+        Returns
+        -------
+        best : Optional[Mapping[str, Any]]
+            info of the best design, or None if no design meets spec.
+        """
+        start = time.perf_counter()
+        self._last_report = start
+        get_extra = (lambda: None) if get_extra_state is None else get_extra_state
+        _STRATEGIES[self._strategy](self, on_result, checkpoint, ckpt_state, get_extra)
+        self.stats['time'] += time.perf_counter() - start
+        return self.best
+
+    def design(self, idx_vec: Sequence[int], get_bound: Callable[[], float],
+               bound_rtol: float) -> Iterator[Tuple[bool, Mapping[str, Any]]]:
+        """Yields the design of each point in idx_vec, in order.
+
+        The serial sweep designs each point against get_bound(); pool workers
+        share the best cost found so far instead, relaxed by bound_rtol and
+        capped at the spec. Without share_bound, every point is designed against the spec.
+        """
+        point_list = [self.get_point(idx) for idx in idx_vec]
+        if self._n_workers <= 1:
+            for point in point_list:
+                yield self._design_point(point, get_bound() if self._share_bound else self._bound_spec)
+            return
+
+        # Forked workers inherit the design state; otherwise it is sent once per worker
+        if 'fork' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('fork')
+        else:
+            ctx = multiprocessing.get_context()
+        bound = ctx.Value('d', get_bound()) if self._share_bound else None
+        with ctx.Pool(self._n_workers, initializer=_init_sweep_worker,
+                      initargs=(self._evaluate, self._prune, self._cost_key, bound, bound_rtol, self._bound_spec,
+                                self._worker_init)) as pool:
+            for reason, result in pool.imap(_run_sweep_worker, point_list):
+                yield self._count(result, reason)
+
+    def merge(self, idx: int, spec_met: bool, info: Mapping[str, Any],
+              on_result: Optional[Callable[[Dict[str, Any], bool, Mapping[str, Any], bool], None]]) -> None:
+        """Merges the design of the point at flat index idx, see run."""
+        is_best = False
+        if spec_met:
+            point = self.get_point(idx)
+            if self._archive is not None:
+                self._archive.add(info, info if self._get_archive_item is None else self._get_archive_item(point, info))
+            # Workers may run with a looser bound than the serial sweep would have had
+            cost = info[self._cost_key]
+            if cost < self.bound or (cost == self.bound and self._best_idx is not None and idx < self._best_idx):
+                self.bound, self._best_idx, self.best, self.best_point = cost, idx, info, point
+                is_best = True
+        if on_result is not None:
+            on_result(self.get_point(idx), spec_met, info, is_best)
+
+    def _run_grid(self, on_result, checkpoint, ckpt_state, get_extra):
+        start = time.perf_counter()
+        order = self._get_order(np.arange(self.num_points))
+        pos = 0
+        if ckpt_state is not None:
+            pos = ckpt_state['pos']
+            self.bound, self._best_idx, self.best = ckpt_state['bound'], ckpt_state['best_idx'], ckpt_state['best']
+            self.best_point = None if self._best_idx is None else self.get_point(self._best_idx)
+            self._archive = ckpt_state['archive']
+        get_bound = lambda: (self.bound if self._best_idx is None or self._center is None
+                             else np.nextafter(self.bound, float('inf')))
+        get_state = lambda: dict(pos=pos, bound=self.bound, best_idx=self._best_idx, best=self.best,
+                                 archive=self._archive, extra=get_extra())
+        if checkpoint is not None and ckpt_state is None:
+            checkpoint.update(get_state, force=True)
+        for idx, (spec_met, info) in zip(order[pos:], self.design(order[pos:], get_bound, 0)):
+            self.merge(idx, spec_met, info, on_result)
+            pos += 1
+            self._report(start, None if self._best_idx is None else self.bound)
+            if checkpoint is not None:
+                checkpoint.update(get_state)
+        if checkpoint is not None:
+            checkpoint.update(get_state, force=True)
+
+    def _run_adaptive(self, on_result, checkpoint, ckpt_state, get_extra):
+        results = dict() if ckpt_state is None else ckpt_state['results']
+        best = [min([self._bound_spec] + [info[self._cost_key] for spec_met, info in results.values() if spec_met])]
+        # Fine points depend on the coarse designs alone, so they are saved once chosen
+        idx_fine = None if ckpt_state is None else ckpt_state['idx_fine']
+        start = time.perf_counter()
+        get_state = lambda: dict(results=results, idx_fine=idx_fine, extra=get_extra())
+        if checkpoint is not None and ckpt_state is None:
+            checkpoint.update(get_state, force=True)
+
+        def sweep(idx_vec, get_bound, bound_rtol):
+            idx_vec = self._get_order(np.array([idx for idx in idx_vec if idx not in results], dtype=int))
+            for idx, (spec_met, info) in zip(idx_vec, self.design(idx_vec, get_bound, bound_rtol)):
+                results[idx] = spec_met, info
+                if spec_met:
+                    best[0] = min(best[0], info[self._cost_key])
+                self._report(start, best[0] if best[0] < self._bound_spec else None)
+                if checkpoint is not None:
+                    checkpoint.update(get_state)
+
+        grids = np.meshgrid(*(coarse_idx(num, self._factor) for num in self._shape), indexing='ij')
+        idx_coarse = np.ravel_multi_index([grid.ravel() for grid in grids], self._shape)
+        if idx_fine is None:
+            sweep(idx_coarse, lambda: min(best[0]*(1+self._rtol), self._bound_spec), self._rtol)
+
+            idx_fine = set()
+            for idx in idx_coarse:
+                spec_met, info = results[idx]
+                if spec_met and (not self._share_bound or info[self._cost_key] <= best[0]*(1+self._rtol)):
+                    idx_fine.update(self._get_neighbours(idx))
+            if not any(results[idx][0] for idx in idx_coarse):
+                # Feasible points can lie between coarse points that all fail, so nothing
+                # short of the full grid finds them
+                idx_fine = range(self.num_points)
+            idx_fine = sorted(set(idx_fine).difference(idx_coarse))
+
+        # Let ties with the best design through; the in-order merge breaks them as the full sweep would
+        sweep(idx_fine, lambda: min(np.nextafter(best[0], float('inf')), self._bound_spec), 0)
+        if checkpoint is not None:
+            checkpoint.update(get_state, force=True)
+
+        self.stats['skipped'] += self.num_points - len(results)
+        for idx, (spec_met, info) in sorted(results.items(), key=lambda item: item[0]):
+            self.merge(idx, spec_met, info, on_result)
+
+    def _run_bisect(self, on_result, checkpoint, ckpt_state, get_extra):
+        results = dict() if ckpt_state is None else ckpt_state['results']
+        best = [min([self._bound_spec] + [info[self._cost_key] for spec_met, info in results.values() if spec_met])]
+        start = time.perf_counter()
+        get_state = lambda: dict(results=results, extra=get_extra())
+        if checkpoint is not None and ckpt_state is None:
+            checkpoint.update(get_state, force=True)
+
+        def passes(idx):
+            if idx not in results:
+                # Let ties with the best design through; the in-order merge breaks them as the full sweep would
+                bound = self._bound_spec
+                if self._share_bound:
+                    bound = min(np.nextafter(best[0], float('inf')), bound)
+                spec_met, info = results[idx] = self._design_point(self.get_point(idx), bound)
+                if spec_met:
+                    best[0] = min(best[0], info[self._cost_key])
+                self._report(start, best[0] if best[0] < self._bound_spec else None)
+                if checkpoint is not None:
+                    checkpoint.update(get_state)
+            return results[idx][0]
+
+        # Designs saved by the checkpoint are looked up, so the search retraces its steps up to them
+        search_min_int(passes, 0, self.num_points-1, hint=None if self._center is None else int(self._center[0]))
+        if checkpoint is not None:
+            checkpoint.update(get_state, force=True)
+
+        self.stats['skipped'] += self.num_points - len(results)
+        for idx, (spec_met, info) in sorted(results.items(), key=lambda item: item[0]):
+            self.merge(idx, spec_met, info, on_result)
+
+    def _design_point(self, point, bound):
+        reason = None if self._prune is None else self._prune(point, bound)
+        if reason is not None:
+            return self._count((False, dict(pruned=reason)), reason)
+        return self._count(self._evaluate(point, bound), reason)
+
+    def _count(self, result, reason):
+        if reason is None:
+            self.stats['designed'] += 1
+            self.stats['met'] += bool(result[0])
+        else:
+            self.stats['pruned'] += 1
+        return result
+
+    def _report(self, start, best_cost):
+        if self._progress_interval is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_report < self._progress_interval:
+            return
+        self._last_report = now
+        best_str = 'none' if best_cost is None else f'{best_cost:.4g}'
+        print(f'Sweep progress: {self.stats["designed"]} of {self.num_points} points designed, '
+              f'{self.stats["met"]} meeting spec, best {self._cost_key} {best_str}, '
+              f'{self.stats["designed"]/max(now - start, 1e-9):.3g} points/s')
+
+    def _get_order(self, idx_vec: np.ndarray) -> np.ndarray:
+        """Returns the flat indices sorted by grid distance from the center, lowest index first on ties."""
+        if self._center is None or len(idx_vec) == 0:
+            return idx_vec
+        dist = np.max(np.abs(np.stack(np.unravel_index(idx_vec, self._shape)) - self._center[:, np.newaxis]), axis=0)
+        return idx_vec[np.lexsort((idx_vec, dist))]
+
+    def _get_neighbours(self, idx: int) -> Iterable[int]:
+        """Returns the flat indices within factor-1 of flat index idx along every axis."""
+        ranges = [range(max(i-self._factor+1, 0), min(i+self._factor, num))
+                  for i, num in zip(np.unravel_index(idx, self._shape), self._shape)]
+        return (int(np.ravel_multi_index(multi, self._shape)) for multi in itertools.product(*ranges))
+
+
+register_strategy('grid', SweepEngine._run_grid)
+register_strategy('adaptive', SweepEngine._run_adaptive)
+register_strategy('bisect', SweepEngine._run_bisect)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+import numpy as np
+import pytest
+
+from scripts_dsn import bench_regulator_ldo_series as bench
+from scripts_dsn.mos_db import get_db_cache
+
+
+def test_synthetic_db_needs_no_bag():
+    params = bench.get_bench_params('small')
+    bench.seed_db_cache(params, vectorized=True)
+    db = get_db_cache().get(params['specfile_dict']['amp_in'], params['th_dict']['amp_in'], params['sim_env'])
+    op = db.query(vgs=np.array([0.3, 0.6]), vds=0.5, vbs=0)
+    assert np.all(np.diff(op['ibias']) > 0)
+
+
+def test_design_module_without_bag_raises_clear_error(monkeypatch):
+    # A None entry makes the import fail as if the package were not installed
+    monkeypatch.setitem(sys.modules, 'span_ion_proj.scripts_dsn', None)
+    monkeypatch.delitem(sys.modules, 'scripts_dsn.regulator_ldo_series', raising=False)
+    with pytest.raises(ImportError, match='needs BAG and span_ion_proj'):
+        bench._get_dsn_class()
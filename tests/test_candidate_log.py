@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import numpy as np
+import pytest
+
+from scripts_dsn.candidate_log import CandidateLog
+
+
+def test_records_are_written_in_order(tmp_path):
+    fname = tmp_path / 'log' / 'cand.jsonl'
+    with CandidateLog(str(fname), buffer_size=3, flush_interval=60) as cand_log:
+        for idx in range(10):
+            cand_log.append(dict(idx=idx, vg=np.float64(0.1*idx), nf=np.int64(idx), op=dict(gm=np.arange(2)),
+                                 reason=None if idx % 2 else 'pm'))
+    assert cand_log.num_records == 10
+    record_list = [json.loads(line) for line in fname.read_text().splitlines()]
+    assert [record['idx'] for record in record_list] == list(range(10))
+    assert record_list[3] == dict(idx=3, vg=pytest.approx(0.3), nf=3, op=dict(gm=[0, 1]), reason=None)
+
+    # Records are appended to an existing log
+    with CandidateLog(str(fname)) as cand_log:
+        cand_log.append(dict(idx=10))
+    assert len(fname.read_text().splitlines()) == 11
+
+
+def test_append_after_close_raises(tmp_path):
+    cand_log = CandidateLog(str(tmp_path / 'cand.jsonl'))
+    cand_log.close()
+    cand_log.close()
+    with pytest.raises(ValueError):
+        cand_log.append(dict(idx=0))
+
+
+def test_resume_drops_records_after_size(tmp_path):
+    fname = str(tmp_path / 'cand.jsonl')
+    with CandidateLog(fname, flush_interval=60) as cand_log:
+        cand_log.append(dict(idx=0))
+        size = cand_log.flush()
+        cand_log.append(dict(idx=1))
+    with CandidateLog(fname, size=size) as cand_log:
+        assert cand_log.flush() == size
+        cand_log.append(dict(idx=2))
+    with CandidateLog(fname, size=10*size) as cand_log:
+        cand_log.append(dict(idx=3))
+    assert [json.loads(line)['idx'] for line in open(fname)] == [0, 2, 3]
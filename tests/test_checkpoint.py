@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import pickle
+import contextlib
+
+import numpy as np
+import pytest
+
+from scripts_dsn.checkpoint import SweepCheckpoint
+from scripts_dsn.sweep import ParetoArchive, SweepEngine
+
+
+class _Crash(Exception):
+    pass
+
+
+def _get_design_fun(crash_after=None):
+    num_designed = [0]
+    def evaluate(point, bound):
+        if crash_after is not None and num_designed[0] == crash_after:
+            raise _Crash()
+        num_designed[0] += 1
+        x, y = point['x'], point['y']
+        cost = 1 + (x - 4.2)**2 + 0.5*(y - 2.6)**2
+        spec_met = cost < bound and (x + y) % 4 != 0
+        return spec_met, dict(cost=cost, pm=60 - 3*x + y)
+    return evaluate
+
+
+def _run(tmp_path, strategy, crash_after=None, resume=False):
+    fname = tmp_path / 'sweep.ckpt'
+    checkpoint = SweepCheckpoint(str(fname), SweepCheckpoint.get_fingerprint(dict(strategy=strategy)), interval=0)
+    ckpt_state = checkpoint.load() if resume else None
+    engine = SweepEngine(dict(x=np.arange(9), y=np.arange(6)), _get_design_fun(crash_after), bound=20.0,
+                         strategy=strategy, factor=3, rtol=0.1,
+                         archive=ParetoArchive(dict(cost='min', pm='max'), 5))
+    log = []
+    best = engine.run(lambda point, spec_met, info, is_best: log.append((point, spec_met, is_best)),
+                      checkpoint=checkpoint, ckpt_state=ckpt_state, get_extra_state=lambda: len(log))
+    return best, engine.best_point, list(engine.archive), engine.stats['designed']
+
+
+@pytest.mark.parametrize('strategy', ['grid', 'adaptive'])
+def test_resume_gives_identical_result(tmp_path, strategy):
+    ref = _run(tmp_path / 'ref', strategy)
+    with pytest.raises(_Crash):
+        _run(tmp_path, strategy, crash_after=11)
+    best, best_point, archive, num_designed = _run(tmp_path, strategy, resume=True)
+    assert (best, best_point, archive) == ref[:3]
+    # Only the points after the crash are designed again
+    assert num_designed == ref[3] - 11
+
+
+def test_bisect_resume_gives_identical_result(tmp_path):
+    def run(path, crash_after=None, resume=False):
+        checkpoint = SweepCheckpoint(str(path / 'sweep.ckpt'), 'bisect', interval=0)
+        ckpt_state = checkpoint.load() if resume else None
+        num_designed = [0]
+        def evaluate(point, bound):
+            if crash_after is not None and num_designed[0] == crash_after:
+                raise _Crash()
+            num_designed[0] += 1
+            return point['nf'] >= 57, dict(nf=point['nf'])
+        log = []
+        engine = SweepEngine(dict(nf=np.arange(3, 200, 2)), evaluate, cost_key='nf', strategy='bisect')
+        best = engine.run(lambda point, spec_met, info, is_best: log.append((int(point['nf']), spec_met)),
+                          checkpoint=checkpoint, ckpt_state=ckpt_state)
+        return best, log, engine.stats['designed']
+
+    ref = run(tmp_path / 'ref')
+    with pytest.raises(_Crash):
+        run(tmp_path, crash_after=4)
+    best, log, num_designed = run(tmp_path, resume=True)
+    assert (best, log) == ref[:2]
+    assert num_designed == ref[2] - 4
+
+
+def test_fingerprint_mismatch_is_ignored(tmp_path):
+    fname = str(tmp_path / 'sweep.ckpt')
+    SweepCheckpoint(fname, SweepCheckpoint.get_fingerprint(dict(vdd=1.5)), interval=0).save(dict(pos=3))
+    assert SweepCheckpoint(fname, SweepCheckpoint.get_fingerprint(dict(vdd=1.5, resume=True))).load() == dict(pos=3)
+    with pytest.warns(UserWarning):
+        assert SweepCheckpoint(fname, SweepCheckpoint.get_fingerprint(dict(vdd=1.2))).load() is None
+
+
+def test_update_is_rate_limited(tmp_path):
+    checkpoint = SweepCheckpoint(str(tmp_path / 'sweep.ckpt'), 'fp', interval=3600)
+    assert not checkpoint.update(lambda: dict(pos=1))
+    assert checkpoint.update(lambda: dict(pos=2), force=True)
+    assert checkpoint.load() == dict(pos=2)
+    checkpoint.remove()
+    assert checkpoint.load() is None
+    with open(tmp_path / 'bad.ckpt', 'wb') as f:
+        f.write(pickle.dumps('x')[:3])
+    with pytest.warns(UserWarning):
+        assert SweepCheckpoint(str(tmp_path / 'bad.ckpt'), 'fp').load() is None
+
+
+def _meet_spec_counted(params, crash_after=None):
+    from scripts_dsn.regulator_ldo_series import bag2_analog__regulator_ldo_series_dsn
+
+    dsn = bag2_analog__regulator_ldo_series_dsn()
+    vg_list = []
+    dsn_vg = dsn.dsn_vg
+    def counted_dsn_vg(**kwargs):
+        if len(vg_list) == crash_after:
+            raise _Crash()
+        vg_list.append((kwargs['ser_type'], kwargs['vg']))
+        return dsn_vg(**kwargs)
+    dsn.dsn_vg = counted_dsn_vg
+    with contextlib.redirect_stdout(io.StringIO()):
+        return dsn.meet_spec(**params)[0], vg_list
+
+
+def test_meet_spec_resumes_after_crash(tmp_path):
+    pytest.importorskip('bag.data.lti')
+    pytest.importorskip('span_ion_proj.scripts_dsn')
+    from scripts_dsn.bench_regulator_ldo_series import get_bench_params, seed_db_cache
+
+    params = get_bench_params('small')
+    seed_db_cache(params, True)
+    ref_op, ref_vg_list = _meet_spec_counted(params)
+    assert len(ref_vg_list) > 4
+
+    ckpt_params = dict(params, checkpoint=str(tmp_path / 'sweep.ckpt'), checkpoint_interval=0, resume=True)
+    with pytest.raises(_Crash):
+        _meet_spec_counted(ckpt_params, crash_after=4)
+    best_op, vg_list = _meet_spec_counted(ckpt_params)
+    assert best_op['ibias'] == ref_op['ibias']
+    assert best_op['nf_dict'] == ref_op['nf_dict']
+    assert best_op['cap_dict'] == ref_op['cap_dict']
+    # Only the series gate biases after the crash are designed again
+    assert vg_list == ref_vg_list[4:]
+    assert not (tmp_path / 'sweep.ckpt').exists()
+
+
+def test_multi_type_resume_keeps_finished_types(tmp_path):
+    pytest.importorskip('bag.data.lti')
+    pytest.importorskip('span_ion_proj.scripts_dsn')
+    from scripts_dsn.bench_regulator_ldo_series import get_bench_params, seed_db_cache
+
+    params = get_bench_params('small')
+    for ser_type in ('n', 'p'):
+        seed_db_cache(dict(params, specfile_dict=dict(params['specfile_dict'], ser=f'synthetic/{ser_type}ch.yaml')), True)
+    params.update(ser_type=['p', 'n'],
+                  specfile_dict=dict(params['specfile_dict'], ser=dict(n='synthetic/nch.yaml', p='synthetic/pch.yaml')))
+    ref_op, ref_vg_list = _meet_spec_counted(dict(params, candidate_log=str(tmp_path / 'ref.jsonl')))
+    num_p = sum(ser_type == 'p' for ser_type, _ in ref_vg_list)
+    assert 0 < num_p < len(ref_vg_list) - 2
+
+    # The sweep only saves when it starts and ends, so the log runs past the checkpoint
+    ckpt_params = dict(params, checkpoint=str(tmp_path / 'sweep.ckpt'), checkpoint_interval=3600, resume=True,
+                       candidate_log=str(tmp_path / 'cand.jsonl'))
+    with pytest.raises(_Crash):
+        _meet_spec_counted(ckpt_params, crash_after=num_p + 2)
+    best_op, vg_list = _meet_spec_counted(ckpt_params)
+    assert best_op['ibias'] == ref_op['ibias']
+    assert best_op['ser_results'] == ref_op['ser_results']
+    # The finished type is not designed again
+    assert vg_list == ref_vg_list[num_p:]
+    assert list(tmp_path.glob('sweep*')) == []
+    read_log = lambda name: [json.loads(line) for line in (tmp_path / name).read_text().splitlines()]
+    assert read_log('cand.jsonl') == read_log('ref.jsonl')
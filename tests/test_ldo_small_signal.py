@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import warnings
+
+import numpy as np
+import pytest
+
+pytest.importorskip('bag.data.lti')
+
+from scripts_dsn.ldo_small_signal import LDOSmallSignal, LDOSmallSignalBatch, get_instances
+
+_OP_DICT = {
+    'ser': dict(gm=2e-2, gds=2e-4, gb=3e-3, cgs=2e-12, cgd=4e-13, cds=1e-13, cgb=1e-13, cdb=3e-13, csb=3e-13),
+    'amp_in': dict(gm=4e-5, gds=4e-7, gb=8e-6, cgs=2e-15, cgd=5e-16, cds=1e-16, cdb=4e-16, csb=4e-16),
+    'amp_tail': dict(gm=6e-5, gds=5e-7, cgs=3e-15, cgd=6e-16, cdb=5e-16),
+    'amp_load': dict(gm=3e-5, gds=3e-7, cgs=2e-15, cgd=4e-16, cdb=4e-16),
+}
+_NF_DICT = dict(ser=40, amp_in=4, amp_tail=8, amp_load=2)
+
+
+def _get_lti_deviations(ser_type, rsource, cload, cdecap_amp):
+    pytest.importorskip('span_ion_proj.scripts_dsn')
+    from scripts_dsn.regulator_ldo_series import bag2_analog__regulator_ldo_series_dsn
+
+    op = dict(op_dict=_OP_DICT, nf_dict=_NF_DICT, cap_dict=dict(cdecap_load=0, cdecap_amp=cdecap_amp))
+    params = dict(cload=cload, ser_type=ser_type, rsource=rsource, vout=1.0, iload=1e-3)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        return bag2_analog__regulator_ldo_series_dsn()._check_lti(op, params)
+
+
+@pytest.mark.parametrize('rsource', [0, 50])
+@pytest.mark.parametrize('ser_type', ['n', 'p'])
+def test_metrics_match_lti_circuit(ser_type, rsource):
+    dev_dict = _get_lti_deviations(ser_type, rsource, 1e-9, 2e-12)
+    assert set(dev_dict) == {'loopgain', 'psrr', 'psrr_fbw', 'pm', 'loadreg'}
+    assert max(dev_dict.values()) < 1e-9
+
+
+@pytest.mark.parametrize('rsource', [0, 50])
+@pytest.mark.parametrize('ser_type', ['n', 'p'])
+def test_stiff_load_matches_lti_circuit(ser_type, rsource):
+    # The det polynomials come from eigenvalues of the stamped matrices, so time
+    # constants twelve orders of magnitude apart must not lose the small ones
+    dev_dict = _get_lti_deviations(ser_type, rsource, 1e-4, 1e-16)
+    assert max(dev_dict.values()) < 1e-9
+
+
+def test_batch_matches_single_candidates():
+    scale = np.array([0.5, 1.0, 2.0])
+    op_dict = dict(_OP_DICT, ser={k: v*scale for k, v in _OP_DICT['ser'].items()})
+    batch = LDOSmallSignalBatch(op_dict, _NF_DICT, 'p', 'n', 0)
+    assert batch.num == 3
+    pm = batch.get_stb(1e-9, 2e-12)
+    psrr, fbw = batch.get_psrr(1e-9, 2e-12)
+    loopgain = batch.get_loopgain()
+    for idx in range(3):
+        ss = LDOSmallSignal({dev: {k: v[idx] if dev == 'ser' else v for k, v in op.items()}
+                             for dev, op in op_dict.items()}, _NF_DICT, 'p', 'n', 0)
+        assert ss.get_stb(1e-9, 2e-12) == pm[idx]
+        assert ss.get_psrr(1e-9, 2e-12) == (psrr[idx], fbw[idx])
+        assert ss.get_loopgain() == loopgain[idx]
+
+
+def test_stacked_rows_match_separate_models():
+    nf_tail = np.array([4, 8, 16])
+    cdecap = np.array([0, 2e-12, 5e-12])
+    num, den = LDOSmallSignalBatch(_OP_DICT, dict(_NF_DICT, amp_tail=nf_tail), 'n', 'n', 0).get_num_den(
+        'fb', 'reg', 'v', False, 1e-9, cdecap)
+    s_vec = 2j*np.pi*np.logspace(2, 9, 8)
+    for idx in range(3):
+        num_one, den_one = LDOSmallSignalBatch(_OP_DICT, dict(_NF_DICT, amp_tail=nf_tail[idx]), 'n', 'n', 0).get_num_den(
+            'fb', 'reg', 'v', False, 1e-9, cdecap[idx])
+        # Rows are padded with leading zeros to the order of the stack
+        np.testing.assert_allclose(np.polyval(num[idx], s_vec)/np.polyval(den[idx], s_vec),
+                                   np.polyval(num_one[0], s_vec)/np.polyval(den_one[0], s_vec), rtol=1e-9)
+
+
+@pytest.mark.parametrize('ser_type', ['n', 'p'])
+def test_decap_sweep_grid_matches_per_row_margins(ser_type):
+    batch = LDOSmallSignalBatch(_OP_DICT, _NF_DICT, ser_type, 'n', 50)
+    cdecap_vec = np.geomspace(1e-15, 1e-10, 40)
+    pm_grid = batch.get_stb(1e-9, cdecap_vec, grid=True)
+    np.testing.assert_allclose(pm_grid, batch.get_stb(1e-9, cdecap_vec), rtol=1e-6, atol=1e-6)
+    psrr, fbw = batch.get_psrr(1e-9, cdecap_vec, grid=True)
+    psrr_ref, fbw_ref = batch.get_psrr(1e-9, cdecap_vec)
+    np.testing.assert_array_equal(psrr, psrr_ref)
+    np.testing.assert_allclose(fbw, fbw_ref, rtol=1e-6)
+
+
+def test_dc_shift_is_linear_in_threshold_shifts():
+    batch = LDOSmallSignalBatch(_OP_DICT, _NF_DICT, 'n', 'n', 50)
+    dvth = np.random.default_rng(0).standard_normal((2, len(get_instances('n', 'n'))))*1e-3
+    dv0, dv1 = batch.get_dc_shift(dvth[0])[0], batch.get_dc_shift(dvth[1])[0]
+    assert batch.get_dc_shift(2*dvth[0] - dvth[1])[0] == pytest.approx(2*dv0 - dv1, rel=1e-9)
+    assert batch.get_dc_shift(np.zeros(len(dvth[0])))[0] == 0
+
+
+@pytest.mark.parametrize('ser_type', ['n', 'p'])
+def test_input_offset_is_amplified_to_output(ser_type):
+    # A threshold shift of an input device acts as an input offset, which the loop
+    # reproduces at the output up to its finite gain
+    batch = LDOSmallSignalBatch(_OP_DICT, _NF_DICT, ser_type, 'n', 50)
+    loopgain = np.abs(batch.get_loopgain()[0])
+    in_idx = [idx for idx, inst in enumerate(get_instances(ser_type, 'n')) if inst[0] == 'amp_in']
+    dv_list = []
+    for idx in in_idx:
+        dvth = np.zeros(len(get_instances(ser_type, 'n')))
+        dvth[idx] = 1e-3
+        dv_list.append(batch.get_dc_shift(dvth)[0])
+    assert np.prod(np.sign(dv_list)) == -1
+    np.testing.assert_allclose(np.abs(dv_list), 1e-3*loopgain/(1 + loopgain), rtol=1e-3)
+
+
+@pytest.mark.parametrize('cdecap_amp', [1e-14, 2e-12, 1e-10])
+@pytest.mark.parametrize('ser_type', ['n', 'p'])
+def test_droop_matches_step_response_of_transfer_function(ser_type, cdecap_amp):
+    batch = LDOSmallSignalBatch(_OP_DICT, _NF_DICT, ser_type, 'n', 50)
+    droop = batch.get_droop(1e-9, cdecap_amp, 1.0, 1e-3)[0]
+    num, den = (poly[0] for poly in batch.get_num_den('reg', 'reg', 'i', True, 1e-9, cdecap_amp))
+    # The step response of num/den is the sum of res/pole*(exp(pole*t) - 1) over its simple poles
+    pole_vec = np.roots(den)
+    res_vec = np.polyval(num, pole_vec)/np.polyval(np.polyder(den), pole_vec)
+    t_vec = np.logspace(-14, 1, 200001)
+    resp = np.sum(res_vec[:, np.newaxis]/pole_vec[:, np.newaxis]*np.expm1(pole_vec[:, np.newaxis]*t_vec), axis=0)
+    assert droop == pytest.approx(np.max(np.abs(resp.real))*0.2e-3, rel=1e-5)
+    assert droop >= batch.get_loadreg(1e-9, cdecap_amp, 1.0, 1e-3)[0]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+lti = pytest.importorskip('bag.data.lti')
+
+from scripts_dsn.lti_batch import get_w_3db_batch, get_phase_margin_batch, trim_poly
+
+
+def _get_amp_num_den(cap_x, cap_out):
+    # Two-stage amplifier with Miller compensation, from 'in' to 'out'
+    ckt = lti.LTICircuit()
+    ckt.add_vccs(1e-3, 'x', 'gnd', 'in', 'gnd')
+    ckt.add_res(1e5, 'x', 'gnd')
+    ckt.add_cap(cap_x, 'x', 'gnd')
+    ckt.add_vccs(1e-2, 'out', 'gnd', 'x', 'gnd')
+    ckt.add_res(1e4, 'out', 'gnd')
+    ckt.add_cap(cap_out, 'out', 'gnd')
+    ckt.add_cap(2e-13, 'x', 'out')
+    return ckt.get_num_den(in_name='in', out_name='out', in_type='v')
+
+
+def _stack(poly_list):
+    order = max(len(poly) for poly in poly_list)
+    return np.array([np.pad(poly, (order - len(poly), 0)) for poly in poly_list])
+
+
+@pytest.fixture(scope='module')
+def num_den():
+    num_list, den_list = [], []
+    for cap_x in (1e-14, 1e-13, 1e-12):
+        for cap_out in (1e-13, 1e-12, 1e-11):
+            num, den = _get_amp_num_den(cap_x, cap_out)
+            num_list.append(-np.asarray(num))
+            den_list.append(np.asarray(den))
+    return _stack(num_list), _stack(den_list)
+
+
+def test_phase_margin_matches_lti(num_den):
+    num, den = num_den
+    pm = get_phase_margin_batch(num, den)
+    for idx in range(num.shape[0]):
+        pm_ref, _ = lti.get_stability_margins(trim_poly(num[idx]), trim_poly(den[idx]))
+        assert pm[idx] == pytest.approx(pm_ref, rel=1e-6, abs=1e-6)
+
+
+def test_w_3db_matches_lti(num_den):
+    num, den = num_den
+    w_3db = get_w_3db_batch(num, den)
+    for idx in range(num.shape[0]):
+        w_ref = lti.get_w_3db(trim_poly(num[idx]), trim_poly(den[idx]))
+        assert w_3db[idx] == pytest.approx(w_ref, rel=1e-6)
+
+
+def test_trim_poly():
+    np.testing.assert_array_equal(trim_poly(np.array([0, 0, 1.0, 2.0])), [1.0, 2.0])
+    np.testing.assert_array_equal(trim_poly(np.zeros(3)), [0.0])
+
+
+def test_rows_without_crossing_use_lti_fallback():
+    # A gain below one never crosses unity; a constant never drops by 3 dB
+    num = np.array([[0, 0.5], [0, 2.0]])
+    den = np.array([[1e-9, 1.0], [0, 1.0]])
+    pm = get_phase_margin_batch(-num, den)
+    for idx in range(2):
+        assert pm[idx] == lti.get_stability_margins(-trim_poly(num[idx]), trim_poly(den[idx]))[0]
+    w_3db = get_w_3db_batch(num, den)
+    assert w_3db[0] == pytest.approx(1e9, rel=1e-6)
+    assert np.isnan(w_3db[1]) and lti.get_w_3db(trim_poly(num[1]), trim_poly(den[1])) is None
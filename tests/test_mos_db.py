@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+from scripts_dsn import mos_db
+from scripts_dsn.mos_db import MOSDBCache, OpTable, query_batch, resolve_spec_file
+
+
+@pytest.fixture
+def spec_file(tmp_path, monkeypatch):
+    work_dir = tmp_path / 'work'
+    (work_dir / 'specs').mkdir(parents=True)
+    fname = work_dir / 'specs' / 'nch.yaml'
+    fname.write_text('root_dir: data\n')
+    monkeypatch.setenv('BAG_WORK_DIR', str(work_dir))
+    monkeypatch.chdir(tmp_path)
+    load_list = []
+    monkeypatch.setattr(mos_db, 'get_mos_db',
+                        lambda spec_file, intent, sim_env: load_list.append(spec_file) or object())
+    return fname, load_list
+
+
+def test_key_uses_resolved_spec_file(spec_file):
+    fname, load_list = spec_file
+    assert resolve_spec_file('specs/nch.yaml') == str(fname)
+    cache = MOSDBCache()
+    db = cache.get('specs/nch.yaml', 'standard', 'tt')
+    assert load_list == [str(fname)]
+    assert cache.get(str(fname), 'standard', 'tt') is db
+
+    # Editing the spec file reloads the database
+    mtime = os.path.getmtime(fname)
+    os.utime(fname, (mtime + 10, mtime + 10))
+    assert cache.get('specs/nch.yaml', 'standard', 'tt') is not db
+    assert len(load_list) == 2
+
+
+def test_missing_spec_file_raises(spec_file):
+    with pytest.raises(FileNotFoundError):
+        MOSDBCache().get('specs/pch.yaml', 'standard', 'tt')
+
+
+def test_supplied_db_needs_no_spec_file(spec_file):
+    _, load_list = spec_file
+    cache = MOSDBCache(max_size=0)
+    db = object()
+    cache.put('synthetic/nch.yaml', 'standard', 'tt', db)
+    assert cache.get('synthetic/nch.yaml', 'standard', 'tt') is db
+    assert load_list == []
+
+
+def test_supplied_db_needs_no_span_ion_proj(spec_file, monkeypatch):
+    monkeypatch.setattr(mos_db, 'get_mos_db', None)
+    cache = MOSDBCache()
+    db = object()
+    cache.put('synthetic/nch.yaml', 'standard', 'tt', db)
+    assert cache.get('synthetic/nch.yaml', 'standard', 'tt') is db
+    with pytest.raises(ImportError, match='MOSDBCache.put'):
+        cache.get('specs/nch.yaml', 'standard', 'tt')
+    # A failed load is not left pending
+    with pytest.raises(ImportError):
+        cache.get('specs/nch.yaml', 'standard', 'tt')
+
+
+class _CountingDB(object):
+    def __init__(self):
+        self.num_query = 0
+
+    def query(self, vgs, vds, vbs=0.0):
+        self.num_query += np.size(vgs)
+        ibias = 1e-4*np.maximum(np.asarray(vgs) - 0.4, 0)**2*(1 + 0.1*np.asarray(vds))
+        return dict(ibias=ibias, vstar=np.asarray(vgs) - 0.4 + 0*np.asarray(vds))
+
+
+def test_op_table_matches_direct_query():
+    db = _CountingDB()
+    vds_vec = np.arange(0, 1, 0.1)
+    vgs_vec = np.arange(0, 1.5, 0.1)
+    table = OpTable(db, (vds_vec, vgs_vec), _get_bias)
+    ref = query_batch(_CountingDB(), vgs=vgs_vec, vds=vds_vec[3], vbs=0)
+
+    idx_vec = np.arange(len(vgs_vec))
+    op_list = [table.query(vds_vec[3], vgs_vec)]
+    num_query = db.num_query
+    op_list.append(table.query_index(3, idx_vec))
+    for op in op_list:
+        assert op.keys() == ref.keys()
+        for k in ref:
+            np.testing.assert_array_equal(op[k], ref[k])
+    # Each grid point is queried once
+    assert table.num_known == len(vgs_vec)
+    op = table.query_index(3, 7)
+    assert op == {k: float(v[7]) for k, v in ref.items()}
+    assert db.num_query == num_query
+
+    # Off-grid points are queried directly
+    assert table.query(0.35, 1.0)['ibias'] == pytest.approx(1e-4*0.6**2*1.035)
+    assert table.num_known == len(vgs_vec)
+
+
+def _get_bias(vds, vgs):
+    return dict(vgs=vgs, vds=vds, vbs=0)
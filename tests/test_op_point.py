@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+
+import numpy as np
+import pytest
+
+from scripts_dsn.op_point import OpGroup
+
+_OP_DICT = {'ser': dict(ibias=1e-3, gm=2e-2, gds=1e-4, vstar=0.1, cgs=1e-12),
+            'amp_in': dict(ibias=1e-6, gm=2e-5, gds=1e-7, vstar=0.08, gb=1e-6)}
+
+
+def test_group_reads_as_dict():
+    group = OpGroup.from_ops(_OP_DICT)
+    assert list(group) == ['ser', 'amp_in']
+    assert len(group) == 2 and 'ser' in group and 'amp_tail' not in group
+    assert group.to_dict() == _OP_DICT
+    assert dict(group['amp_in']) == _OP_DICT['amp_in']
+    assert 'gb' not in group['ser'] and 'cgs' not in group['amp_in']
+    with pytest.raises(KeyError):
+        group['ser']['gb']
+
+
+def test_scale_matches_per_device_resize():
+    group = OpGroup.from_ops(_OP_DICT)
+    wm_dict = dict(ser=1.5, amp_in=0.5)
+    for wm in (wm_dict, [1.5, 0.5], np.array([1.5, 0.5])):
+        scaled = group.scale(wm)
+        for name, op in _OP_DICT.items():
+            # Voltages do not scale with width
+            assert dict(scaled[name]) == {k: v if k.startswith('v') else v*wm_dict[name] for k, v in op.items()}
+    # The original group is unchanged
+    assert group.to_dict() == _OP_DICT
+
+
+def test_pickle_round_trip():
+    group = OpGroup.from_ops(_OP_DICT).scale([2, 3])
+    loaded = pickle.loads(pickle.dumps(group))
+    assert loaded.to_dict() == group.to_dict()
+    assert dict(pickle.loads(pickle.dumps(group['ser']))) == dict(group['ser'])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from scripts_dsn import profiling
+from scripts_dsn.profiling import Profiler, set_profiler
+
+
+class _DB(object):
+    width_list = [1e-6]
+
+    def query(self, **kwargs):
+        return dict(ibias=1.0)
+
+    def query_batch(self, **kwargs):
+        return dict(ibias=np.ones(np.size(kwargs['vgs'])))
+
+
+def test_stages_nest_and_events_total():
+    profiler = Profiler()
+    with profiler.stage('meet_spec'):
+        with profiler.event('lti_solve', 4):
+            pass
+        for _ in range(2):
+            with profiler.stage('dsn_amp'):
+                with profiler.event('lti_solve'):
+                    pass
+    report = profiler.report()
+    assert report['stages']['meet_spec']['count'] == 1
+    assert report['stages']['meet_spec/dsn_amp']['count'] == 2
+    assert report['stages']['meet_spec']['events']['lti_solve']['num'] == 4
+    assert report['stages']['meet_spec/dsn_amp']['events']['lti_solve']['count'] == 2
+    assert report['totals']['lti_solve']['count'] == 3
+    assert report['totals']['lti_solve']['num'] == 6
+
+
+def test_wrapped_db_counts_queries():
+    profiler = Profiler()
+    db = _DB()
+    proxy = profiler.wrap_db(db)
+    assert profiler.wrap_db(db) is proxy
+    assert proxy.width_list == [1e-6]
+    proxy.query(vgs=0.5, vds=0.5)
+    proxy.query_batch(vgs=np.zeros(5), vds=0.5)
+    info = profiler.report()['totals']['db_query']
+    assert (info['count'], info['num']) == (2, 6)
+
+
+def test_module_functions_are_noops_when_off():
+    set_profiler(None)
+    with profiling.stage('design'):
+        with profiling.event('lti_build'):
+            pass
+    profiling.event_end('lti_build', profiling.event_start())
+    db_dict = dict(ser=_DB())
+    assert profiling.wrap_db_dict(db_dict) == db_dict
+
+    profiler = Profiler()
+    set_profiler(profiler)
+    try:
+        with profiling.stage('design'):
+            profiling.event_end('lti_build', profiling.event_start(), 3)
+            wrapped = profiling.wrap_db_dict(db_dict)
+            wrapped['ser'].query(vgs=0.5)
+    finally:
+        set_profiler(None)
+    assert profiler.report()['stages']['design']['events']['lti_build']['num'] == 3
+    assert profiler.report()['totals']['db_query']['count'] == 1
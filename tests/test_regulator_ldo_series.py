@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import io
+import contextlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip('bag.data.lti')
+pytest.importorskip('span_ion_proj.scripts_dsn')
+
+from scripts_dsn.bench_regulator_ldo_series import get_bench_params, seed_db_cache
+from scripts_dsn.regulator_ldo_series import bag2_analog__regulator_ldo_series_dsn, _get_psrr
+
+
+def _meet_spec(params):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bag2_analog__regulator_ldo_series_dsn().meet_spec(**params)[0]
+
+
+class _NoBandwidthModel(object):
+    def get_psrr(self, cload, cdecap_amp, grid=False):
+        if grid:
+            return np.array([40.0, 50.0]), np.array([1e3, float('nan')])
+        return 40.0, float('nan')
+
+
+def test_missing_bandwidth_counts_as_zero():
+    # Both small-signal models report a missing 3dB bandwidth as NaN
+    assert _get_psrr(_NoBandwidthModel(), 1e-9, 0) == (40.0, 0)
+    psrr, psrr_fbw = _get_psrr(_NoBandwidthModel(), 1e-9, 0, grid=True)
+    assert list(psrr_fbw) == [1e3, 0]
+
+
+def test_monte_carlo_without_mismatch_is_nominal():
+    params = get_bench_params('small')
+    seed_db_cache(params, True)
+    best_op = _meet_spec(dict(params, mc_samples=20, mc_avt=0, mc_abeta=0))
+    mc_info = best_op['mc']
+    assert mc_info['num'] == 20
+    assert mc_info['offset'] == dict(mean=0, std=0)
+    for key in ('ibias', 'err', 'psrr', 'psrr_fbw', 'pm', 'loadreg'):
+        assert mc_info[key]['mean'] == pytest.approx(best_op[key], rel=1e-9)
+        assert mc_info[key]['std'] <= 1e-9*abs(best_op[key])
+        assert mc_info[key]['yield'] == 1
+    assert mc_info['yield'] == 1
+
+
+@pytest.mark.parametrize('adaptive', [2, 3])
+def test_adaptive_finds_design_of_full_sweep(adaptive):
+    # Every coarse series gate bias fails phase margin; only one between them meets spec
+    params = get_bench_params('medium')
+    params.update(v_res=0.05, err=0.09, psrr=23, psrr_fbw=38, pm=49, loadreg=0.05)
+    seed_db_cache(params, True)
+    full_op = _meet_spec(params)
+    assert np.isfinite(full_op['ibias'])
+    adaptive_op = _meet_spec(dict(params, adaptive=adaptive))
+    assert adaptive_op['ibias'] == full_op['ibias']
+    assert adaptive_op['vg'] == full_op['vg']
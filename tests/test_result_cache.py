@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from scripts_dsn import result_cache
+from scripts_dsn.result_cache import ResultCache, get_source_files
+
+
+def _make_files(tmp_path):
+    src_dir = tmp_path / 'src'
+    src_dir.mkdir()
+    (src_dir / 'dsn.py').write_text('x = 1\n')
+    (src_dir / 'helper.py').write_text('y = 2\n')
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'tt.dat').write_text('0 1 2\n')
+    spec_file = tmp_path / 'nch.yaml'
+    spec_file.write_text(f'root_dir: {data_dir}\n')
+    return src_dir, spec_file
+
+
+def test_round_trip_and_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_size=10**6)
+    assert cache.load('missing') is None
+    cache.save('key', dict(nf=4), dict(ibias=1e-6))
+    assert cache.load('key') == (dict(nf=4), dict(ibias=1e-6))
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    small = ResultCache(str(tmp_path / 'small'), max_size=0)
+    small.save('key', dict(nf=4), None)
+    assert small.load('key') is None
+    assert small.evictions == 1
+    cache.clear()
+    assert cache.stats()['size'] == 0
+
+
+def test_key_follows_sources_and_specs(tmp_path, monkeypatch):
+    src_dir, spec_file = _make_files(tmp_path)
+    source_files = get_source_files(str(src_dir / 'dsn.py'))
+    assert source_files == [str(src_dir / 'dsn.py'), str(src_dir / 'helper.py')]
+
+    num_stat = []
+    stat_data_dir = result_cache._stat_data_dir
+    monkeypatch.setattr(result_cache, '_stat_data_dir', lambda fname: num_stat.append(fname) or stat_data_dir(fname))
+    cache = ResultCache(str(tmp_path / 'cache'))
+    specs = dict(vdd=1.5, specfile_dict=dict(ser=str(spec_file)))
+    key = cache.get_key('dsn', 'cls', specs, source_files)
+    assert cache.get_key('dsn', 'cls', specs, source_files) == key
+    # The characterization data is listed once per cache
+    assert num_stat == [str(spec_file)]
+
+    assert cache.get_key('dsn', 'cls', dict(specs, vdd=1.2), source_files) != key
+    (src_dir / 'helper.py').write_text('y = 3\n')
+    new_key = cache.get_key('dsn', 'cls', specs, source_files)
+    assert new_key != key
+    spec_file.write_text(spec_file.read_text() + '# edited\n')
+    assert cache.get_key('dsn', 'cls', specs, source_files) != new_key
+
+
+def test_data_dir_changes_key_in_new_cache(tmp_path):
+    src_dir, spec_file = _make_files(tmp_path)
+    source_files = get_source_files(str(src_dir / 'dsn.py'))
+    specs = dict(specfile_dict=dict(ser=str(spec_file)))
+    key = ResultCache(str(tmp_path / 'cache')).get_key('dsn', 'cls', specs, source_files)
+    data_file = tmp_path / 'data' / 'tt.dat'
+    data_file.write_text('0 1 2 3\n')
+    os.utime(data_file, (1, 1))
+    assert ResultCache(str(tmp_path / 'cache')).get_key('dsn', 'cls', specs, source_files) != key
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from scripts_dsn.sweep import (bisect_min_log, grid_min_log, search_min_int, grid_argmin,
+                               ParetoArchive, SweepEngine, register_strategy)
+
+
+def test_bisect_min_log_converges_to_threshold():
+    val, num_eval = bisect_min_log(lambda cap: cap >= 3.7e-12, 1e-15, 1e-9, 1e-3)
+    assert 3.7e-12 <= val <= 3.7e-12*(1 + 1e-3)
+    # A 100-point linear sweep of the same range only resolves 1e-11
+    assert num_eval < 30
+
+
+def test_bisect_min_log_end_points():
+    assert bisect_min_log(lambda cap: True, 1e-15, 1e-9, 1e-3) == (1e-15, 1)
+    assert bisect_min_log(lambda cap: False, 1e-15, 1e-9, 1e-3) == (None, 2)
+
+
+def test_grid_min_log_matches_bisection():
+    grid_size = []
+    def passes(cap_vec):
+        grid_size.append(len(cap_vec))
+        return cap_vec >= 3.7e-12
+    cap, num_eval = grid_min_log(passes, 1e-15, 1e-9, 1e-3, num=8)
+    assert cap == pytest.approx(bisect_min_log(lambda cap: cap >= 3.7e-12, 1e-15, 1e-9, 1e-3)[0], rel=2e-3)
+    assert 3.7e-12 <= cap <= 3.7e-12*(1 + 1e-3)
+    assert num_eval == sum(grid_size)
+    assert set(grid_size) == {8}
+
+
+def test_grid_min_log_end_points():
+    assert grid_min_log(lambda cap_vec: cap_vec > 1, 1e-15, 1e-9, 1e-3)[0] is None
+    assert grid_min_log(lambda cap_vec: cap_vec > 0, 1e-15, 1e-9, 1e-3)[0] == 1e-15
+    with pytest.raises(ValueError):
+        grid_min_log(lambda cap_vec: cap_vec > 0, 0, 1e-9, 1e-3)
+
+
+@pytest.mark.parametrize('nf_min', [0, 3, 4, 17, 40, 81, 82, 200])
+def test_search_min_int_matches_linear_walk(nf_min):
+    # Tail finger counts go up two at a time from an initial sizing
+    walked = [nf for nf in range(3, 82, 2) if nf >= nf_min]
+    nf, num_eval = search_min_int(lambda nf: nf >= nf_min, 3, 81, step=2)
+    assert nf == (walked[0] if walked else None)
+    assert num_eval <= 2*int(np.ceil(np.log2(40))) + 1
+
+
+def test_search_min_int_last_evaluation_is_largest_on_failure():
+    evaluated = []
+    def passes(nf):
+        evaluated.append(nf)
+        return False
+    assert search_min_int(passes, 2, 30, step=4) == (None, len(evaluated))
+    assert evaluated[-1] == 30
+    assert search_min_int(passes, 5, 4) == (None, 0)
+
+
+@pytest.mark.parametrize('hint', [3, 9, 41, 81, 100])
+@pytest.mark.parametrize('nf_min', [0, 9, 10, 41, 82])
+def test_search_min_int_hint_keeps_answer(hint, nf_min):
+    cold = search_min_int(lambda nf: nf >= nf_min, 3, 81, step=2)
+    warm = search_min_int(lambda nf: nf >= nf_min, 3, 81, step=2, hint=hint)
+    assert warm[0] == cold[0]
+
+
+def test_search_min_int_hint_at_answer_is_cheap():
+    # A previous solution's finger count is checked, then the step below it
+    assert search_min_int(lambda nf: nf >= 41, 3, 81, step=2, hint=41) == (41, 2)
+
+
+def test_pareto_archive_keeps_only_trade_offs():
+    front = ParetoArchive(dict(ibias='min', pm='max'), max_size=10)
+    assert front.add(dict(ibias=2e-6, pm=60), 'a')
+    # Dominated by, or equal to, an archived design
+    assert not front.add(dict(ibias=3e-6, pm=50), 'b')
+    assert not front.add(dict(ibias=2e-6, pm=60), 'c')
+    assert not front.add(dict(ibias=float('nan'), pm=90), 'd')
+    assert front.add(dict(ibias=1e-6, pm=45), 'e')
+    assert front.add(dict(ibias=3e-6, pm=80), 'f')
+    assert list(front) == ['a', 'e', 'f']
+    # A design better in every objective replaces those it dominates
+    assert front.add(dict(ibias=1e-6, pm=65), 'g')
+    assert list(front) == ['f', 'g']
+    assert front.objectives == ['ibias', 'pm']
+
+
+def test_pareto_archive_evicts_most_crowded_design():
+    front = ParetoArchive(dict(ibias='min', pm='max'), max_size=3)
+    for name, ibias, pm in [('low', 1, 40), ('mid', 2, 60), ('near_mid', 2.1, 61), ('high', 4, 80)]:
+        front.add(dict(ibias=ibias, pm=pm), name)
+    assert len(front) == 3
+    assert front.num_evict == 1
+    # The extremes of every objective survive
+    assert 'low' in list(front) and 'high' in list(front)
+
+
+def test_pareto_archive_rejects_bad_objectives():
+    with pytest.raises(ValueError):
+        ParetoArchive(dict(ibias='low'))
+    with pytest.raises(ValueError):
+        ParetoArchive(dict(ibias='min'), max_size=0)
+
+
+def test_grid_sweep_tightens_bound_and_breaks_ties_low():
+    cost_vec = [5.0, 3.0, float('inf'), 3.0, 4.0, 1.5, 1.5, 2.0]
+    bounds = []
+    def evaluate(point, bound):
+        bounds.append(bound)
+        cost = cost_vec[point['vg']]
+        return cost < bound, dict(ibias=cost)
+    engine = SweepEngine(dict(vg=np.arange(len(cost_vec))), evaluate, bound=10.0, cost_key='ibias')
+    assert engine.run() == dict(ibias=1.5)
+    assert engine.best_point == dict(vg=5)
+    assert bounds == [10.0, 5.0, 3.0, 3.0, 3.0, 3.0, 1.5, 1.5]
+    assert engine.stats['designed'] == len(cost_vec)
+
+
+def test_centered_sweep_designs_center_first():
+    order = []
+    def evaluate(point, bound):
+        order.append(round(float(point['vg']), 1))
+        cost = 1 + abs(point['vg'] - 0.42)
+        return cost < bound, dict(cost=cost)
+    engine = SweepEngine(dict(vg=np.arange(0, 1, 0.1)), evaluate, bound=10.0, center=dict(vg=0.52))
+    best = engine.run()
+    assert order[:3] == [0.5, 0.4, 0.6]
+    assert best == SweepEngine(dict(vg=np.arange(0, 1, 0.1)), evaluate, bound=10.0).run()
+
+
+def test_adaptive_sweep_designs_fewer_points():
+    designed = []
+    def evaluate(point, bound):
+        designed.append((point['vtail'], point['vgtail']))
+        cost = 1 + (point['vtail'] - 11)**2 + (point['vgtail'] - 7)**2
+        return cost < bound, dict(cost=cost)
+    axes = dict(vtail=np.arange(30), vgtail=np.arange(20))
+    full = SweepEngine(axes, evaluate, bound=1e3)
+    full.run()
+    del designed[:]
+    adaptive = SweepEngine(axes, evaluate, bound=1e3, strategy='adaptive', factor=4, rtol=0.5)
+    assert adaptive.run() == full.best
+    assert adaptive.best_point == full.best_point
+    assert len(designed) == adaptive.stats['designed'] < full.num_points//4
+    assert adaptive.stats['skipped'] == full.num_points - len(set(designed))
+
+
+def test_archive_collects_designs_without_shared_bound():
+    def evaluate(point, bound):
+        ibias = 1 + point['vg']
+        pm = 40 + 10*point['vg'] - point['vg']**2
+        return ibias < bound, dict(ibias=ibias, pm=pm)
+    results = []
+    engine = SweepEngine(dict(vg=np.arange(8)), evaluate, bound=7.5, cost_key='ibias', share_bound=False,
+                         archive=ParetoArchive(dict(ibias='min', pm='max')),
+                         get_archive_item=lambda point, info: int(point['vg']))
+    engine.run(lambda point, spec_met, info, is_best: results.append((int(point['vg']), spec_met, is_best)))
+    assert results[:2] == [(0, True, True), (1, True, False)]
+    assert [vg for vg, spec_met, _ in results if spec_met] == list(range(7))
+    # pm peaks at vg = 5, so costlier designs past it are dominated
+    assert list(engine.archive) == [0, 1, 2, 3, 4, 5]
+
+
+def test_worker_pool_matches_serial_sweep():
+    def evaluate(point, bound):
+        cost = 2 + np.cos(3*point['vg'])
+        return cost < bound, dict(cost=cost, vg=point['vg'])
+    axes = dict(vg=np.linspace(0, 4, 23))
+    serial = SweepEngine(axes, evaluate, bound=2.5)
+    pooled = SweepEngine(axes, evaluate, bound=2.5, n_workers=2)
+    assert pooled.run() == serial.run()
+    assert pooled.best_point == serial.best_point
+
+
+def test_unknown_strategy_raises():
+    with pytest.raises(ValueError):
+        SweepEngine(dict(vg=np.arange(3)), lambda point, bound: (False, dict()), strategy='random')
+    with pytest.raises(ValueError):
+        SweepEngine(dict(x=np.arange(3), y=np.arange(3)), lambda point, bound: (False, dict()), strategy='bisect')
+
+
+@pytest.mark.parametrize('hint', [None, 3, 9, 41, 81, 100])
+@pytest.mark.parametrize('nf_min', [0, 4, 40, 82, 200])
+def test_bisect_sweep_matches_search_min_int(hint, nf_min):
+    designed = []
+    def evaluate(point, bound):
+        designed.append(int(point['nf']))
+        return point['nf'] >= nf_min, dict(nf=point['nf'])
+    engine = SweepEngine(dict(nf=np.arange(3, 82, 2)), evaluate, cost_key='nf', strategy='bisect',
+                         center=None if hint is None else dict(nf=hint))
+    best = engine.run()
+    nf, num_eval = search_min_int(lambda nf: nf >= nf_min, 3, 81, step=2, hint=hint)
+    assert (None if best is None else best['nf']) == nf
+    assert len(designed) == engine.stats['designed'] == num_eval
+    assert engine.stats['skipped'] == engine.num_points - num_eval
+
+
+def test_prune_skips_points_and_merges_them_as_failing():
+    designed = []
+    def evaluate(point, bound):
+        designed.append(int(point['vg']))
+        cost = 1 + abs(point['vg'] - 2)
+        return cost < bound, dict(cost=cost)
+    # A lower bound on the cost that only sees the point
+    prune = lambda point, bound: 'cost' if abs(point['vg'] - 2) >= bound - 1 else None
+    results = []
+    engine = SweepEngine(dict(vg=np.arange(8)), evaluate, bound=4.5, prune=prune)
+    best = engine.run(lambda point, spec_met, info, is_best: results.append((int(point['vg']), spec_met, info)))
+    assert best == dict(cost=1) and engine.best_point == dict(vg=2)
+    assert designed == [0, 1, 2]
+    assert results[3:] == [(vg, False, dict(pruned='cost')) for vg in range(3, 8)]
+    assert engine.stats['designed'] == 3 and engine.stats['pruned'] == 5
+
+    pooled = SweepEngine(dict(vg=np.arange(8)), evaluate, bound=4.5, prune=prune, n_workers=2)
+    assert pooled.run() == best
+    assert pooled.stats['designed'] + pooled.stats['pruned'] == 8
+
+
+def test_registered_strategy_runs():
+    def run_reverse(engine, on_result, checkpoint, ckpt_state, get_extra):
+        idx_vec = np.arange(engine.num_points)[::-1]
+        for idx, (spec_met, info) in zip(idx_vec, engine.design(idx_vec, lambda: engine.bound, 0)):
+            engine.merge(idx, spec_met, info, on_result)
+    register_strategy('reverse', run_reverse)
+    order = []
+    def evaluate(point, bound):
+        order.append(int(point['vg']))
+        return point['vg'] % 3 == 0, dict(cost=1.0)
+    engine = SweepEngine(dict(vg=np.arange(7)), evaluate, strategy='reverse')
+    assert engine.run() == dict(cost=1.0)
+    assert order == list(range(6, -1, -1))
+    # Ties go to the lowest grid index whatever the design order
+    assert engine.best_point == dict(vg=0)
+
+
+@pytest.mark.parametrize('factor', [1, 2, 3, 5])
+def test_grid_argmin_matches_full_grid(factor):
+    def evaluate(idx_vec):
+        err = (idx_vec - 13.4)**2
+        return err, idx_vec != 13, dict(err=err)
+    idx, val, num_eval = grid_argmin(evaluate, 30, factor)
+    assert idx == 14
+    assert val['err'] == pytest.approx(0.36)
+    assert num_eval <= 30
+    assert grid_argmin(evaluate, 0, factor) == (None, None, 0)
+
+
+def test_grid_argmin_falls_back_to_full_grid():
+    # Only a window between the coarse points (every third) has valid bias points
+    def evaluate(idx_vec):
+        return np.abs(idx_vec - 10.0), np.isin(idx_vec, [4, 5]), dict(idx=idx_vec)
+    idx, val, num_eval = grid_argmin(evaluate, 12, 3)
+    assert (idx, val['idx'], num_eval) == (5, 5, 12)
+
+
+def test_adaptive_sweep_falls_back_when_no_coarse_point_meets_spec():
+    feasible = {4: 2.0, 5: 1.5}
+    def evaluate(point, bound):
+        cost = feasible.get(int(point['vg']), float('inf'))
+        return cost < bound, dict(cost=cost)
+    axes = dict(vg=np.arange(10))
+    full = SweepEngine(axes, evaluate, bound=10.0)
+    adaptive = SweepEngine(axes, evaluate, bound=10.0, strategy='adaptive', factor=3)
+    assert adaptive.run() == full.run() == dict(cost=1.5)
+    assert adaptive.best_point == dict(vg=5)
+
+
+def test_adaptive_sweep_2d_fallback_designs_whole_grid():
+    def evaluate(point, bound):
+        cost = {(1, 2): 3.0, (2, 1): 1.0}.get((int(point['x']), int(point['y'])), float('inf'))
+        return cost < bound, dict(cost=cost)
+    engine = SweepEngine(dict(x=np.arange(6), y=np.arange(6)), evaluate, bound=10.0,
+                         strategy='adaptive', factor=3)
+    assert engine.run() == dict(cost=1.0)
+    assert engine.best_point == dict(x=2, y=1)
+    assert engine.stats['skipped'] == 0